@@ -3,13 +3,15 @@ from core.engine import Piece, PrecomputingMoves, LegalMoveGenerator, Board#, NL
 from core.engine.clock import Clock
 from core.engine.game_manager import GameManager
 from core.engine.ai.alphabeta import Dfs, AlphaBetaAgent
-from core.engine.ai.selfplay_rl import AlphaZeroAgent
-from core.engine.ai.mixed_agent import AlphaBetaZeroAgent
+from core.engine.ai.ponder import Ponderer
+from core.engine.ai.opening_book import OpeningBook
 from core.engine.ai.slef import TrainingDataCollector
 from core.utils import BoardUtility
 from core.engine.config import UIConfig
 from core.utils import time_benchmark
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait
+from time import perf_counter
 
 class Button:
     def __init__(self, x, y, image):
@@ -33,7 +35,7 @@ class Button:
 
 
 class UI:
-    def __init__(self, board: Board, agent: str="ab"):
+    def __init__(self, board: Board, agent: str="ab", ponder: bool=False):
         self.window = pygame.display.set_mode((UIConfig.WIDTH, UIConfig.HEIGHT), pygame.RESIZABLE)
         pygame.display.set_caption("AlphaBing Demo")
         self.board = board
@@ -75,13 +77,28 @@ class UI:
         # self.search = time_benchmark(Dfs.search)
         # self.agent = AlphaBetaZeroAgent()
         self.select_agent(agent)
+        # Keeps the AI searching during the human's turn, replacing the agent's own move choice
+        self.ponderer = Ponderer(agent.lower()) if ponder else None
+        # AI moves are computed by a single worker, so the window stays responsive meanwhile.
+        # A single worker also means a cancelled search finishes before the next one starts
+        self.ai_executor = ThreadPoolExecutor(max_workers=1)
+        self.ai_future = None
+        self.ai_search_start = 0
 
     def select_agent(self, agent_str: str):
         assert agent_str, "Agent must be str"
+        # The agents using the network are imported here, so tensorflow is only loaded when they're selected
         match agent_str.lower():
             case "ab": self.agent = AlphaBetaAgent()
-            case "az": self.agent = AlphaZeroAgent()
-            case "abz": self.agent = AlphaBetaZeroAgent()
+            case "az":
+                from core.engine.ai.selfplay_rl import AlphaZeroAgent
+                self.agent = AlphaZeroAgent()
+            case "abz":
+                from core.engine.ai.mixed_agent import AlphaBetaZeroAgent
+                self.agent = AlphaBetaZeroAgent()
+            case "hab":
+                from core.engine.ai.hybrid_search import HybridAlphaBetaAgent
+                self.agent = HybridAlphaBetaAgent()
 
     def render_piece(self, color: int, piece_type: int, coords):
         self.window.blit(self.PIECES_IMGS[color * 7 + piece_type], coords)
@@ -135,6 +152,30 @@ class UI:
             for player in range(2):
                 self.render_remaining_time(player)
 
+    def get_search_info(self) -> str:
+        """
+        :return: depth and nodes of the running search, if the agent exposes them
+        """
+        if self.ponderer and self.ponderer.agent != "az":
+            search_class = self.ponderer.search_class
+            return f"depth {search_class.completed_depth} || nodes {search_class.nodes}"
+        search_class = getattr(self.agent, "search_class", None)
+        if search_class:
+            return f"depth {search_class.completed_depth} || nodes {search_class.nodes}"
+        if isinstance(self.agent, AlphaBetaAgent):
+            searched, total = self.agent.get_progress()
+            return f"depth {Dfs.search_depth} || moves {searched}/{total}"
+        mcts = getattr(self.agent, "mcts", None)
+        if mcts:
+            return f"depth {mcts.max_depth} || nodes {len(mcts.Ns)}"
+        return ""
+
+    def render_thinking(self):
+        if not self.ai_future:
+            return
+        text = f"thinking {perf_counter() - self.ai_search_start:.1f}s {self.get_search_info()}"
+        self.render_text(text, UIConfig.GREY, UIConfig.THINKING_TEXT_POS, False)
+
     def render_move_str(self):
         self.render_text(self.move_str, UIConfig.GREY, UIConfig.MOVE_STR_POS, True)
 
@@ -281,7 +322,7 @@ class UI:
         print(self.fen)
         # print(len(self.board.repetition_history))
         self.zobrist_off = (UIConfig.WIDTH - len(bin(self.board.zobrist_key)) * UIConfig.FONT_WIDTH_SMALL) / 2
-        LegalMoveGenerator.load_moves()
+        LegalMoveGenerator.load_moves(self.board)
         GameManager.check_game_state()
 
     def update_move_str(self, move):
@@ -350,7 +391,7 @@ class UI:
             UIConfig.MOVE_SFX.play()
 
     def selection(self, mouse_pos):
-        if self.is_animating_move: return
+        if self.is_animating_move or self.ai_future: return
         # Account for the OFFSETS the board's (0,0) coordinate is replaced by on the window
         file, rank = BoardUtility.get_board_pos(mouse_pos, UIConfig.UNIT, *UIConfig.OFFSETS)
         square = self.board.get_square(file, rank)
@@ -359,7 +400,7 @@ class UI:
 
 
     def make_human_move(self):
-        if self.is_animating_move: return
+        if self.is_animating_move or self.ai_future: return
         mouse_pos = pygame.mouse.get_pos()
         file, rank = BoardUtility.get_board_pos(mouse_pos, UIConfig.UNIT, *UIConfig.OFFSETS)
         target_square = rank * 9 + file
@@ -378,10 +419,12 @@ class UI:
         if not self.board.game_history or self.is_animating_move:
             return
         GameManager.reset_mate()
+        self.cancel_AI_move()
+        if self.ponderer:
+            self.ponderer.stop()
         self.board.reverse_move()
         self.reset_values()
         self.drop_update()
-        LegalMoveGenerator.load_moves()
 
     def shift_piece(self, piece: tuple, x: int, y: int, dx: int, dy: int):
         self.render_piece(*piece, (x + dx, y + dy))
@@ -430,10 +473,51 @@ class UI:
         moving_path = list(zip(path_x, path_y))
         return moving_path
 
+    def compute_AI_move(self, board: Board):
+        """
+        Runs on the worker thread with a copy of the board
+        """
+        opening_book = OpeningBook.get_default()
+        book_move = opening_book.probe(board) if opening_book else None
+        if book_move:
+            if self.ponderer:
+                self.ponderer.stop()
+            return book_move
+        if self.ponderer:
+            return self.ponderer.choose_action(board)
+        return self.agent.choose_action(board)
+
+    def cancel_AI_move(self):
+        """
+        Discards the move that is being computed, e.g. when the human takes back moves.
+        The search is aborted and waited for, so the worker is free for the next move
+        """
+        if not self.ai_future:
+            return
+        self.ai_future.cancel()
+        # A search resets its abort flag when it starts, so it's set until the search is done
+        while not self.ai_future.done():
+            if self.ponderer:
+                self.ponderer.abort()
+            else:
+                self.agent.stop()
+            wait([self.ai_future], timeout=.05)
+        self.ai_future = None
+        self.is_ai_turn = False
+
     def make_AI_move(self):
+        """
+        Starts computing the AI's move on the worker thread and, in a later frame, makes it once it's found
+        """
         if not (self.is_ai_turn or self.ai_vs_ai): return
-        # AI_move = self.search(self.board, 250)
-        AI_move = self.agent.choose_action(self.board)
+        if not self.ai_future:
+            self.ai_search_start = perf_counter()
+            self.ai_future = self.ai_executor.submit(self.compute_AI_move, self.board.copy())
+            return
+        if not self.ai_future.done() or self.is_animating_move:
+            return
+        AI_move = self.ai_future.result()
+        self.ai_future = None
         if AI_move == None:
             return
         self.update_move_str(AI_move)
@@ -443,6 +527,8 @@ class UI:
         self.select_square(move_from)
         Clock.run(self.board.moving_color) 
         self.board.make_move(AI_move)
+        if self.ponderer and not self.ai_vs_ai:
+            self.ponderer.start(self.board)
         self.drop_update()
         # Calculate path for shifting-animation
         self.path = self.get_path(move_from, move_to)
@@ -489,6 +575,7 @@ class UI:
         """
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                self.cancel_AI_move()
                 quit()
                         
             # Piece selection
@@ -540,6 +627,7 @@ class UI:
 
         self.render_game_state()
         self.render_move_str
+        self.render_thinking()
 
         self.AI_BUTTON.render(self.window)
         # self.render_zobrist()
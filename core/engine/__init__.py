@@ -2,7 +2,9 @@ from .piece import Piece
 from .zobrist_hashing import ZobristHashing
 from .board import Board
 from .precomputed_move_data import PrecomputingMoves
-from .move_generator import LegalMoveGenerator
+from .bitboard import Bitboard
+from .legality import Legality
+from .move_generator import MoveGenerator, LegalMoveGenerator
 from .tt_entry import TtEntry
 # from .verbal_command_handler import NLPCommandHandler
 # NLPCommandHandler.init()
\ No newline at end of file
@@ -2,4 +2,10 @@ class Agent:
     def choose_action(self):
         raise NotImplementedError()
 
+    def stop(self) -> None:
+        """
+        Makes a choose_action() running on another thread return as soon as possible, its move is meant to be discarded.
+        Searches reset this when they start, so it has to be repeated until choose_action() returned
+        """
+
     
\ No newline at end of file
@@ -1,6 +1,8 @@
+from .config import SearchConfig
 from .piece_square_tables import PieceSquareTable
 from .eval_utility import Evaluation
 from .AI_diagnostics import Diagnostics
 from .move_ordering import order_moves, order_moves_pst
+from .search_stats import SearchStats
 from .search import Dfs
 from .agent import AlphaBetaAgent
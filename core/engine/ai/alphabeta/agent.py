@@ -1,23 +1,52 @@
+import threading
+import multiprocessing as mp
 from core.engine.ai.agent_interface import Agent
-from core.engine import Board
+from core.engine import Board, MoveGenerator
 from .search import Dfs
 from logging import getLogger
 logger = getLogger(__name__)
 
 class AlphaBetaAgent(Agent):
-    @staticmethod
-    def get_eval_table(board: Board, moves=None):
-        return Dfs.multiprocess_search(board, get_evals=True, moves=moves)
+    def __init__(self) -> None:
+        # Set by stop(), ending the running search
+        self.stop_event = threading.Event()
+        # Evaluations of the running search's root moves, shared with the search processes
+        self.move_evals = {}
+        self.num_root_moves = 0
+
+    def get_eval_table(self, board: Board, moves=None, deadline: float=None):
+        """
+        :param moves: root moves in the order they're searched in, generated if None
+        :param deadline: perf_counter() time at which the search stops, moves not searched by then are left out
+        """
+        self.stop_event.clear()
+        # Root moves from an own generator, so the agent can run off the UI thread
+        moves = moves or MoveGenerator(board).load_moves()
+        self.move_evals = mp.Manager().dict()
+        self.num_root_moves = len(moves)
+        return Dfs.multiprocess_search(board, get_evals=True, moves=moves, deadline=deadline, stop_event=self.stop_event,
+                                       move_evals=self.move_evals)
+
+    def get_progress(self) -> tuple:
+        """
+        :return: tuple (number of root moves searched, number of root moves) of the running search
+        """
+        return len(self.move_evals), self.num_root_moves
         # return Dfs.search(board, algorithm="minimax")
 
-    @staticmethod
-    def choose_action(board: Board, eval_table: dict=None):
+    def choose_action(self, board: Board, eval_table: dict=None):
         """
         NOTE: This agent uses multiprocess search. To run single-process search,
         don't use the AlphaBetaAgent class, but Dfs.search instead.
         This class mainly serves as part of the AlphaBetaZeroAgent.
+        :return: best move, None if the search was stopped before any move was searched
         """
-        eval_table = eval_table or AlphaBetaAgent.get_eval_table(board)
+        eval_table = eval_table or self.get_eval_table(board)
+        if not eval_table:
+            return None
         best_move = sorted(eval_table, key=lambda move: eval_table[move]).pop()
         logger.info(f"EVAL: {eval_table[best_move]}")
-        return best_move
\ No newline at end of file
+        return best_move
+
+    def stop(self) -> None:
+        self.stop_event.set()
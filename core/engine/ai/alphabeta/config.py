@@ -0,0 +1,30 @@
+from ..config import BaseConfig
+
+class SearchConfig(BaseConfig):
+    # Null move pruning
+    null_move_pruning = True
+    null_move_reduction = 2
+    null_move_min_depth = 3
+    # Minimum number of rooks, horses and cannons the moving side needs for a null move to be tried.
+    # With fewer attacking pieces left, zugzwang becomes likely and passing the turn would be misleading
+    null_move_min_pieces = 2
+
+    # Late move reductions
+    late_move_reductions = True
+    lmr_full_depth_moves = 4 # Number of moves searched to full depth before reducing
+    lmr_min_depth = 3
+    lmr_reduction = 1
+
+    # Futility pruning
+    futility_pruning = True
+    # Margins indexed by remaining depth, quiet moves are pruned if static eval + margin can't raise alpha
+    futility_margins = (0, 120, 250)
+
+    # Repetitions within the search tree (or with the game before) are scored as draw,
+    # unless one side checked with every move, which loses (see Legality.get_perpetual_checker())
+    repetition_detection = True
+    perpetual_check_detection = True
+
+    # Pondering (see Ponderer)
+    ponder_move_time = 5 # Seconds the pondering alpha-beta agent searches per move
+    transposition_table_size = 2 ** 18
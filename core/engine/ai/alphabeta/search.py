@@ -1,10 +1,18 @@
-from core.engine.move_generator import LegalMoveGenerator
+from core.engine.move_generator import MoveGenerator, LegalMoveGenerator
 from core.engine.board import Board
+from core.engine.piece import Piece
+from core.engine.legality import Legality
 from core.engine.ai.alphabeta.eval_utility import Evaluation
 from core.engine.ai.alphabeta import order_moves, order_moves_pst
 from core.utils.timer import time_benchmark
 from ..config import BaseConfig
+from .config import SearchConfig
+from .transposition_table import TranspositionTable
+from .search_stats import SearchStats
+from ..tablebase import Tablebases
+from time import perf_counter
 import multiprocessing as mp
+import threading
 from concurrent.futures import ProcessPoolExecutor
 from logging import getLogger
 logger = getLogger(__name__)
@@ -15,9 +23,50 @@ class Dfs:
     positive_infinity = 9999
     negative_infinity = -positive_infinity
     search_depth = 4
+    # Upper bound for iterative deepening under time control
+    max_depth = 64
+    # Half-width of the window around the previous iteration's score in iterative deepening
+    aspiration_window = 50
     # Ananlytics
     cutoffs = 0
     evaluated_nodes = 0
+    nodes = 0
+    # Counters and timings of the last search
+    stats = SearchStats()
+    # Principal variation of the last completed iteration and its evaluation
+    principal_variation = []
+    pv_table = {}
+    follow_pv = False
+    best_eval = 0
+    completed_depth = 0
+    # Time control
+    deadline = None
+    # Number of nodes after which the search is aborted like at the deadline
+    node_limit = None
+    abort_search = False
+    # Searches on another thread need their own generator, see fork()
+    move_generator = LegalMoveGenerator
+    # Called as on_iteration(depth, evaluation, nodes, principal_variation) after every completed iteration
+    on_iteration = None
+    # Optional TranspositionTable whose best moves are searched first when a position reoccurs,
+    # e.g. after pondering on it. Only used for move ordering, so the evaluations stay the same
+    transposition_table = None
+    # Optional NetworkEvaluator (see hybrid_search) blending network values into leaf evaluations
+    # and ordering shallow nodes by the network's policy. None searches with the pst only
+    leaf_evaluator = None
+
+    @classmethod
+    def fork(cls):
+        """
+        :return: a subclass with its own move generator and search state, 
+        so it can search in another thread while this one keeps searching
+        """
+        return type(cls.__name__, (cls,), {
+            "move_generator": MoveGenerator(),
+            "pv_table": {},
+            "principal_variation": [],
+            "stats": SearchStats(),
+        })
 
     @staticmethod
     def batch(iterable, batch_size):
@@ -26,63 +75,112 @@ class Dfs:
 
     @classmethod
     @time_benchmark
-    def multiprocess_search(cls, board: Board, batch: bool=True, get_evals=False, moves: list[tuple]=None) -> tuple:
+    def multiprocess_search(cls, board: Board, batch: bool=True, get_evals=False, moves: list[tuple]=None, deadline: float=None,
+                            stop_event: threading.Event=None, move_evals: dict=None) -> tuple:
         """
         Runs a search for board position leveraging multiple processors.
         :return: best move from current position
         :param batch: determines if all cpu cores are leveraged
         :param get_evals: if True, search returns a hash map of moves ordered by their value
+        :param moves: root moves, searched in this order
+        :param deadline: perf_counter() time after which running processes are terminated and no more are started,
+        so the moves not searched by then are missing from the evaluations
+        :param stop_event: ends the search like the deadline once it's set, e.g. by another thread discarding the search
+        :param move_evals: shared dict the evaluations are written to, so other threads can follow the progress
         """
-        # shared dict
-        move_evals = mp.Manager().dict()
-        moves = moves or LegalMoveGenerator.load_moves()
+        # shared dicts
+        manager = mp.Manager()
+        move_evals = manager.dict() if move_evals is None else move_evals
+        # SearchStats of each searched move, merged into cls.stats afterwards
+        move_stats = manager.dict()
+        cls.stats = SearchStats()
+        moves = moves or cls.move_generator.load_moves(board)
         # with ProcessPoolExecutor(max_workers=BaseConfig.max_processes) as executor:
         #     move_evals = {move: executor.submit(cls.search_for_move, move, cls.search_depth, board).result() for move in moves}
         if batch:
-            jobs = [mp.Process(target=cls.search_for_move, args=(move, move_evals, cls.search_depth, board)) for move in moves]
+            jobs = [mp.Process(target=cls.search_for_move, args=(move, move_evals, cls.search_depth, board, move_stats)) for move in moves]
             for processes in cls.batch(jobs, BaseConfig.max_processes):
+                if cls.is_stopped(deadline, stop_event):
+                    break
                 for p in processes: p.start()
-                for p in processes: p.join()
+                cls.join_processes(processes, deadline, stop_event)
         else:
             jobs = []
             for move in moves:
-                p = mp.Process(target=cls.search_for_move, args=(move, move_evals, cls.search_depth, board))
+                p = mp.Process(target=cls.search_for_move, args=(move, move_evals, cls.search_depth, board, move_stats))
                 jobs.append(p)
                 p.start()
-            for process in jobs: process.join()
+            cls.join_processes(jobs, deadline, stop_event)
         # print(sorted(move_evals, key=lambda move: move_evals[move]))
+        # Moves whose processes were terminated are missing from the stats as well
+        cls.stats.count_node(0)
+        for stats in move_stats.values():
+            cls.stats.merge(stats)
+        cls.stats.stop()
 
         if get_evals: return move_evals
+        if not move_evals: return None
         best_move = sorted(move_evals, key=lambda move: move_evals[move]).pop()
         return best_move
 
+    @staticmethod
+    def is_stopped(deadline: float=None, stop_event: threading.Event=None) -> bool:
+        return bool(deadline and perf_counter() >= deadline or stop_event and stop_event.is_set())
+
+    @classmethod
+    def join_processes(cls, processes: list, deadline: float=None, stop_event: threading.Event=None):
+        """
+        Waits for the processes to finish, terminating the ones still running at the deadline or once stop_event is set
+        """
+        for p in processes:
+            # Polling, so that the stop_event is noticed while waiting
+            while p.is_alive() and not cls.is_stopped(deadline, stop_event):
+                p.join(timeout=.05 if stop_event else max(deadline - perf_counter(), 0) if deadline else None)
+            if p.is_alive():
+                p.terminate()
+                p.join()
+
     @classmethod
-    def search_for_move(cls, move: tuple, move_evals: dict, depth: int, board: Board):
+    def search_for_move(cls, move: tuple, move_evals: dict, depth: int, board: Board, move_stats: dict=None):
         """
         :return: best eval from current position for current player
         :param move_evals: dict shared between child processes
+        :param move_stats: dict shared between child processes, the SearchStats of the move's search are added to it
         """
+        cls.stats = SearchStats()
         board.make_move(move, search_state=True)
         evaluation = -cls.alpha_beta_opt(board, depth-1, 1, cls.negative_infinity, cls.positive_infinity, 250)
         board.reverse_move(search_state=True)
+        cls.stats.stop()
+        if move_stats is not None:
+            move_stats[move] = cls.stats
         move_evals[move] = evaluation
 
     @classmethod
     @time_benchmark
-    def search(cls, board: Board, m=250, algorithm="optalphabeta"):
+    def search(cls, board: Board, m=250, algorithm="pvs", time_limit: float=None, max_depth: int=None, node_limit: int=None):
         """
         Starts traversal of board's possible configurations
-        :param algorithm: "minimax", "alphabeta", optalphabeta"
+        :param algorithm: "pvs", "minimax", "alphabeta", optalphabeta"
         :param m: coefficient used in move ordering
+        :param time_limit: seconds after which the "pvs" search returns the best move of the deepest 
+        completed iteration
+        :param max_depth: depth the "pvs" search stops at. Defaults to ``search_depth``,
+        or to ``max_depth`` if the search is limited by time_limit or node_limit
+        :param node_limit: nodes after which the "pvs" search returns like at the time limit
         :return: best move possible
         """
         cls.evaluated_nodes = 0
         cls.cutoffs = 0
+        if algorithm == "pvs":
+            max_depth = max_depth or (cls.max_depth if time_limit or node_limit else cls.search_depth)
+            return cls.iterative_deepening(board, max_depth, m, time_limit=time_limit, node_limit=node_limit)
+        cls.stats = SearchStats()
         best_move = None
         alpha = cls.positive_infinity
         beta = cls.negative_infinity
         best_eval = beta
-        current_pos_moves = order_moves(LegalMoveGenerator.load_moves(board), board, m=m)
+        current_pos_moves = order_moves(cls.move_generator.load_moves(board), board, m=m)
         cls.mate_found = False
         for move in current_pos_moves:
             board.make_move(move, search_state=True)
@@ -98,10 +196,279 @@ class Dfs:
                 best_eval = evaluation
                 best_move = move
             if cls.mate_found:
-                return best_move
+                break
+        cls.stats.stop()
         return best_move
 
 
+    @classmethod
+    def iterative_deepening(cls, board: Board, max_depth: int, m=250, time_limit: float=None, node_limit: int=None):
+        """
+        Searches the position with increasing depth. Each iteration's score is the center
+        of the next iteration's aspiration window and its principal variation is searched first.
+        :param time_limit: seconds after which the search is aborted. The aborted iteration is discarded.
+        :param node_limit: nodes after which the search is aborted, like at the time limit
+        :return: best move found by the deepest completed iteration
+        """
+        cls.nodes = 0
+        cls.stats = SearchStats()
+        Tablebases.load()
+        cls.principal_variation = []
+        cls.completed_depth = 0
+        cls.abort_search = False
+        cls.deadline = perf_counter() + time_limit if time_limit else None
+        cls.node_limit = node_limit
+        if cls.transposition_table:
+            cls.transposition_table.board = board
+        evaluation = 0
+        for depth in range(1, max_depth + 1):
+            evaluation = cls.aspiration_search(board, depth, evaluation, m)
+            if cls.abort_search:
+                break
+            cls.principal_variation = cls.pv_table[0]
+            cls.completed_depth = depth
+            cls.best_eval = evaluation
+            logger.info(f"depth: {depth} || eval: {evaluation} || nodes: {cls.nodes} || pv: {cls.get_pv_notation(board)}")
+            if cls.on_iteration:
+                cls.on_iteration(depth, evaluation, cls.nodes, cls.principal_variation)
+            # Forced mate found, searching deeper won't find a shorter one
+            if abs(evaluation) >= cls.checkmate_value - depth:
+                break
+        cls.stats.stop()
+        logger.debug(f"search stats: {cls.stats.to_dict()}")
+        return cls.principal_variation[0] if cls.principal_variation else None
+
+    @classmethod
+    def aspiration_search(cls, board: Board, depth: int, previous_eval: int, m=250):
+        """
+        Searches the root with a narrow window around the previous iteration's evaluation.
+        If the result falls outside of it, the window is widened on the failing side and 
+        the root is searched again.
+        :return: exact evaluation of the root
+        """
+        window = cls.aspiration_window
+        # The first iteration has no previous evaluation to rely on
+        if depth == 1:
+            alpha, beta = cls.negative_infinity, cls.positive_infinity
+        else:
+            alpha = max(previous_eval - window, cls.negative_infinity)
+            beta = min(previous_eval + window, cls.positive_infinity)
+        while True:
+            cls.follow_pv = True
+            evaluation = cls.pvs(board, depth, 0, alpha, beta, m)
+            if cls.abort_search:
+                return evaluation
+            if evaluation <= alpha and alpha > cls.negative_infinity:
+                alpha = max(alpha - window, cls.negative_infinity)
+            elif evaluation >= beta and beta < cls.positive_infinity:
+                beta = min(beta + window, cls.positive_infinity)
+            else:
+                return evaluation
+            window *= 2
+
+    @classmethod
+    def pvs(cls, board: Board, depth: int, plies: int, alpha: int, beta: int, m=250, allow_null=True):
+        """
+        Principal variation search (NegaScout). Assuming move ordering puts the best move first,
+        it is searched with the full window and every other move with a null window (alpha, alpha + 1),
+        which only proves that it's worse. Moves failing high are re-searched with the full window.
+        Fills ``pv_table[plies]`` with the principal variation from current node.
+
+        Selective pruning (see SearchConfig): null move pruning, late move reductions and futility pruning
+        :param allow_null: False right after a null move, so two null moves never follow each other
+        """
+        cls.pv_table[plies] = []
+        stats = cls.stats
+        if not depth:
+            cls.evaluated_nodes += 1
+            stats.evaluated_nodes += 1
+            t0 = perf_counter()
+            evaluation = cls.leaf_evaluator.evaluate(board) if cls.leaf_evaluator else Evaluation.pst_shef(board)
+            stats.evaluation_time += perf_counter() - t0
+            return evaluation
+        cls.nodes += 1
+        stats.count_node(plies)
+        # Checking the clock every 1024 nodes
+        if cls.deadline and not cls.nodes & 1023 and perf_counter() > cls.deadline:
+            cls.abort_search = True
+        if cls.node_limit and cls.nodes > cls.node_limit:
+            cls.abort_search = True
+        if cls.abort_search:
+            return 0
+        if plies and SearchConfig.repetition_detection:
+            distance = board.get_repetition_distance()
+            if distance:
+                return cls.get_repetition_score(board, distance, plies)
+        # Positions with few enough pieces are looked up instead of searched
+        if plies and Tablebases.max_pieces:
+            value = Tablebases.probe(board)
+            if value is not None:
+                stats.tablebase_hits += 1
+                return cls.get_tablebase_score(value, plies)
+
+        t0 = perf_counter()
+        moves = cls.move_generator.load_moves(board)
+        stats.move_generation_time += perf_counter() - t0
+        in_check = cls.move_generator.checks
+        # Check- or Stalemate, meaning game is lost
+        # NOTE: Unlike international chess, Xiangqi sees stalemate as equivalent to losing the game
+        status = board.get_terminal_status(len(moves))
+        if status != -1:
+            if status:
+                # Prefer mates closer to the root
+                return -cls.checkmate_value + plies
+            return cls.draw
+
+        is_pv_node = beta - alpha > 1
+        # Null move pruning: if passing the turn still fails high, a real move most likely would too
+        if (SearchConfig.null_move_pruning 
+            and allow_null
+            and not is_pv_node 
+            and not in_check
+            and depth >= SearchConfig.null_move_min_depth
+            and abs(beta) < cls.checkmate_value - cls.max_depth
+            and cls.count_attacking_pieces(board) >= SearchConfig.null_move_min_pieces):
+            board.make_null_move()
+            evaluation = -cls.pvs(board, depth - 1 - SearchConfig.null_move_reduction, plies + 1, -beta, -beta + 1, m, allow_null=False)
+            board.reverse_null_move()
+            if evaluation >= beta:
+                return beta
+
+        # Futility pruning: close to the leaves, quiet moves can't make up for a static eval far below alpha
+        is_futile = False
+        if (SearchConfig.futility_pruning
+            and not is_pv_node
+            and not in_check
+            and depth < len(SearchConfig.futility_margins)
+            and abs(alpha) < cls.checkmate_value - cls.max_depth):
+            t0 = perf_counter()
+            is_futile = Evaluation.pst_shef(board) + SearchConfig.futility_margins[depth] <= alpha
+            stats.evaluation_time += perf_counter() - t0
+
+        t0 = perf_counter()
+        moves = order_moves(moves, board, m=m)
+        if cls.leaf_evaluator and plies < cls.leaf_evaluator.config.policy_plies:
+            moves = cls.leaf_evaluator.order_moves(board, moves)
+        if cls.follow_pv:
+            cls.order_pv_move(moves, plies)
+        if cls.transposition_table and not cls.follow_pv:
+            stats.tt_probes += 1
+            hash_move = cls.transposition_table.get_move(legal_moves=moves)
+            if hash_move:
+                stats.tt_hits += 1
+                moves.remove(hash_move)
+                moves.insert(0, hash_move)
+        stats.ordering_time += perf_counter() - t0
+        # The leaves below are evaluated by the network together in one batch
+        if cls.leaf_evaluator and depth == 1 and not is_futile:
+            t0 = perf_counter()
+            cls.leaf_evaluator.prefetch(board, moves, alpha, beta)
+            stats.evaluation_time += perf_counter() - t0
+
+        best_move = None
+        for i, move in enumerate(moves):
+            is_quiet = not board.squares[move[1]]
+            if i and is_quiet and is_futile:
+                continue
+            board.make_move(move, search_state=True)
+            if not i:
+                evaluation = -cls.pvs(board, depth - 1, plies + 1, -beta, -alpha, m)
+                # Only the first move of a node on the principal variation lies on it too
+                cls.follow_pv = False
+            else:
+                # Late move reductions: quiet moves ordered late are unlikely to be good, so search them shallower
+                reduction = 0
+                if (SearchConfig.late_move_reductions
+                    and is_quiet 
+                    and not in_check
+                    and i >= SearchConfig.lmr_full_depth_moves 
+                    and depth >= SearchConfig.lmr_min_depth):
+                    reduction = SearchConfig.lmr_reduction
+                evaluation = -cls.pvs(board, depth - 1 - reduction, plies + 1, -alpha - 1, -alpha, m)
+                # Reduced search failed high, so it has to be verified with full depth
+                if reduction and evaluation > alpha:
+                    evaluation = -cls.pvs(board, depth - 1, plies + 1, -alpha - 1, -alpha, m)
+                # Null window search failed high, so the move might be better than the first one
+                if alpha < evaluation < beta:
+                    evaluation = -cls.pvs(board, depth - 1, plies + 1, -beta, -alpha, m)
+            board.reverse_move(search_state=True)
+
+            if cls.abort_search:
+                return 0
+            if evaluation >= beta:
+                stats.count_cutoff(i)
+                if cls.transposition_table:
+                    cls.transposition_table.store_pos(depth, beta, TranspositionTable.lower_bound, move)
+                return beta
+            if evaluation > alpha:
+                alpha = evaluation
+                best_move = move
+                cls.pv_table[plies] = [move] + cls.pv_table[plies + 1]
+        if cls.transposition_table and best_move:
+            cls.transposition_table.store_pos(depth, alpha, TranspositionTable.exact_eval, best_move)
+        return alpha
+
+    @staticmethod
+    def count_attacking_pieces(board: Board):
+        """
+        :return: number of rooks, horses and cannons of the moving side
+        """
+        piece_lists = board.piece_lists[board.moving_color]
+        return len(piece_lists[Piece.rook]) + len(piece_lists[Piece.horse]) + len(piece_lists[Piece.cannon])
+
+    @classmethod
+    def order_pv_move(cls, moves: list[tuple], plies: int):
+        """
+        Moves the previous iteration's principal variation move of depth ``plies`` to the front.
+        If there is none, the search has left the principal variation.
+        """
+        if plies < len(cls.principal_variation):
+            pv_move = cls.principal_variation[plies]
+            if pv_move in moves:
+                moves.remove(pv_move)
+                moves.insert(0, pv_move)
+                return
+        cls.follow_pv = False
+
+    @classmethod
+    def get_pv_notation(cls, board: Board, pv: list[tuple]=None):
+        """
+        :return: the principal variation ``pv`` (by default the one of the last search) 
+        as string of move notations
+        """
+        pv = cls.principal_variation if pv is None else pv
+        notations = []
+        for move in pv:
+            notations.append(board.get_move_notation(move))
+            board.make_move(move, search_state=True)
+        for _ in pv:
+            board.reverse_move(search_state=True)
+        return " ".join(notations)
+
+    @classmethod
+    def get_repetition_score(cls, board: Board, distance: int, plies: int) -> int:
+        """
+        :param distance: number of plies since the position occurred last
+        :return: draw value, or a mate value if one side checked with every move since
+        """
+        if SearchConfig.perpetual_check_detection:
+            checker = Legality.get_perpetual_checker(board, distance)
+            if checker is not None:
+                return -cls.checkmate_value + plies if checker == board.moving_color else cls.checkmate_value - plies
+        return cls.draw
+
+    @classmethod
+    def get_tablebase_score(cls, value: int, plies: int) -> int:
+        """
+        :param value: tablebase value, plies to mate + 1 if the side to move wins, negated if it loses
+        :return: mate value counted from the root
+        """
+        if value > 0:
+            return cls.checkmate_value - plies - value + 1
+        if value < 0:
+            return -cls.checkmate_value + plies - value - 1
+        return cls.draw
+
     @classmethod
     def alpha_beta_opt(cls, board: Board, depth: int, plies: int, alpha: int, beta: int, m):
         """
@@ -112,17 +479,19 @@ class Dfs:
             # print(f"Not quiet: {board.load_fen_from_board()}")
             # return cls.quiescence(board, alpha, beta)
             cls.evaluated_nodes += 1
+            cls.stats.evaluated_nodes += 1
             return Evaluation.pst_shef(board)
 
-        # if plies > 0:
-        #     if board.is_repetition():
-        #         return 0
+        if plies > 0 and SearchConfig.repetition_detection:
+            distance = board.get_repetition_distance()
+            if distance:
+                return cls.get_repetition_score(board, distance, plies)
             # alpha = max(alpha, -cls.checkmate_value + plies)
             # beta = min(beta, cls.checkmate_value - plies)
             # if alpha >= beta:
             #     return alpha
 
-        moves = order_moves(LegalMoveGenerator.load_moves(board), board, m=m)
+        moves = order_moves(cls.move_generator.load_moves(board), board, m=m)
         # Check- or Stalemate, meaning game is lost
         # NOTE: Unlike international chess, Xiangqi sees stalemate as equivalent to losing the game
         num_moves = len(moves)
@@ -136,7 +505,8 @@ class Dfs:
             # if terminal state but not mate, must be draw
             return cls.draw
 
-        for move in moves:
+        cls.stats.count_node(plies)
+        for i, move in enumerate(moves):
             # traversing down the tree
             board.make_move(move, search_state=True)
             evaluation = -cls.alpha_beta_opt(board, depth - 1, plies + 1, -beta, -alpha, m)
@@ -145,7 +515,8 @@ class Dfs:
             # Move is even better than best eval before,
             # opponent won't choose this move anyway so PRUNE YESSIR
             if evaluation >= beta:
-                # cls.cutoffs += 1
+                cls.cutoffs += 1
+                cls.stats.count_cutoff(i)
                 return beta # Return -alpha of opponent, which will be turned to alpha in depth - 1
             # Keep track of best move for moving color
             alpha = max(evaluation, alpha)
@@ -169,19 +540,19 @@ class Dfs:
         #     return beta
         # alpha = max(eval, alpha)
 
-        moves = order_moves_pst(LegalMoveGenerator.load_moves(board=board, generate_quiets=False), board)
+        moves = order_moves_pst(cls.move_generator.load_moves(board=board, generate_quiets=False), board)
         num_moves = len(moves)
         print(num_moves)
         # Reached quiet position
         if not num_moves:
             # print(f"quiet: {board.load_fen_from_board()}")
             print("QUIET")
-            # All possible moves
-            num_moves = LegalMoveGenerator.load_moves(board)
+            # Only the existence of a legal move matters here, so full generation is avoided
+            num_moves = int(Legality.has_legal_move(board))
             # Check- or Stalemate, meaning game is lost
             # NOTE: Unlike international chess, Xiangqi sees stalemate as equivalent to losing the game
             if board.is_terminal_state(num_moves):
-                status = board.get_terminal_status(len(moves))
+                status = board.get_terminal_status(num_moves)
                 if status:
                     return -cls.checkmate_value
                 if status == 0: 
@@ -219,7 +590,7 @@ class Dfs:
             cls.evaluated_nodes += 1
             return Evaluation.pst_shef(board)
         
-        moves = LegalMoveGenerator.load_moves()
+        moves = cls.move_generator.load_moves(board)
         
         # Check- or Stalemate, meaning game is lost
         # NOTE: Unlike international chess, Xiangqi sees stalemate as equivalent to losing the game
@@ -244,7 +615,7 @@ class Dfs:
             cls.evaluated_nodes += 1
             return Evaluation.pst_shef(board)
 
-        moves = LegalMoveGenerator.load_moves()
+        moves = cls.move_generator.load_moves(board)
         # Check- or Stalemate, meaning game is lost
         # NOTE: Unlike international chess, Xiangqi sees stalemate as equivalent to losing the game
         if not len(moves):
@@ -267,7 +638,7 @@ class Dfs:
         alpha = cls.positive_infinity
         beta = cls.negative_infinity
         best_eval = beta
-        current_pos_moves = order_moves(LegalMoveGenerator.load_moves(), board)
+        current_pos_moves = order_moves(cls.move_generator.load_moves(board), board)
         cls.abort_search = False
         for move in current_pos_moves:
             if cls.abort_search:
@@ -0,0 +1,103 @@
+import csv
+import json
+from time import perf_counter
+
+class SearchStats:
+    """
+    Counters and timings of a single search, filled by Dfs while it searches. Only integer increments
+    and a few perf_counter() calls per node are added, so it can stay on all the time. \n
+    The timings of move generation, evaluation and ordering are exclusive, recursion isn't included.
+    Only pvs measures them, the multiprocess search merges the counters of its processes (see merge()).
+    """
+    def __init__(self) -> None:
+        self.start_time = perf_counter()
+        self.total_time = 0
+        # Index i counts the nodes searched i plies below the root
+        self.nodes_per_ply = []
+        self.evaluated_nodes = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tablebase_hits = 0
+        # Hash map of the index of the move in the ordered move list and how often it caused a beta cutoff
+        self.cutoffs_by_move_index = {}
+        self.move_generation_time = 0
+        self.evaluation_time = 0
+        self.ordering_time = 0
+
+    def count_node(self, plies: int) -> None:
+        if plies >= len(self.nodes_per_ply):
+            self.nodes_per_ply.extend([0] * (plies + 1 - len(self.nodes_per_ply)))
+        self.nodes_per_ply[plies] += 1
+
+    def count_cutoff(self, move_index: int) -> None:
+        self.cutoffs_by_move_index[move_index] = self.cutoffs_by_move_index.get(move_index, 0) + 1
+
+    def merge(self, other) -> None:
+        """
+        Adds the counters and timings of another search's stats, e.g. of a root move searched in another process
+        """
+        for plies, nodes in enumerate(other.nodes_per_ply):
+            if plies >= len(self.nodes_per_ply):
+                self.nodes_per_ply.append(0)
+            self.nodes_per_ply[plies] += nodes
+        for move_index, cutoffs in other.cutoffs_by_move_index.items():
+            self.cutoffs_by_move_index[move_index] = self.cutoffs_by_move_index.get(move_index, 0) + cutoffs
+        for counter in ("evaluated_nodes", "tt_probes", "tt_hits", "tablebase_hits",
+                        "move_generation_time", "evaluation_time", "ordering_time"):
+            setattr(self, counter, getattr(self, counter) + getattr(other, counter))
+
+    def stop(self) -> None:
+        self.total_time = perf_counter() - self.start_time
+
+    def get_first_move_cutoff_rate(self) -> float:
+        """
+        :return: share of beta cutoffs caused by the first move, a measure for the quality of move ordering
+        """
+        cutoffs = sum(self.cutoffs_by_move_index.values())
+        return self.cutoffs_by_move_index.get(0, 0) / cutoffs if cutoffs else 0
+
+    def to_dict(self) -> dict:
+        nodes = sum(self.nodes_per_ply)
+        return {
+            "nodes": nodes,
+            "nodes_per_ply": self.nodes_per_ply,
+            "evaluated_nodes": self.evaluated_nodes,
+            "tt_probes": self.tt_probes,
+            "tt_hits": self.tt_hits,
+            "tablebase_hits": self.tablebase_hits,
+            "cutoffs_by_move_index": self.cutoffs_by_move_index,
+            "first_move_cutoff_rate": self.get_first_move_cutoff_rate(),
+            "move_generation_time": self.move_generation_time,
+            "evaluation_time": self.evaluation_time,
+            "ordering_time": self.ordering_time,
+            "total_time": self.total_time,
+            "nps": nodes / self.total_time if self.total_time else 0,
+        }
+
+    def to_json(self, filepath: str=None) -> str:
+        """
+        :param filepath: if given, the JSON is written to this file too
+        :return: the stats as JSON string
+        """
+        data = json.dumps(self.to_dict(), indent=2)
+        if filepath:
+            with open(filepath, "w") as f:
+                f.write(data)
+        return data
+
+    def to_csv(self, filepath: str, append: bool=True) -> None:
+        """
+        Writes the stats as one (metric, key, value) row per counter, per-ply and
+        per-move-index counters using the ply or move index as key
+        :param append: add the rows to an existing file, e.g. to collect the stats of several searches
+        """
+        with open(filepath, "a" if append else "w", newline="") as f:
+            writer = csv.writer(f)
+            for metric, value in self.to_dict().items():
+                if isinstance(value, list):
+                    value = dict(enumerate(value))
+                if isinstance(value, dict):
+                    for key, sub_value in sorted(value.items()):
+                        writer.writerow([metric, key, sub_value])
+                else:
+                    writer.writerow([metric, "", value])
@@ -1,4 +1,4 @@
-from core.engine import ZobristHashing, TtEntry
+from core.engine import ZobristHashing, TtEntry, Legality
 
 class TranspositionTable:
     """
@@ -52,6 +52,20 @@ class TranspositionTable:
 
         return self.invalid
 
-    def get_move(self):
-        return self.table[self.index(self.board.zobrist_key)][self.move]
+    def get_move(self, legal_moves: list=None):
+        """
+        :param legal_moves: the legal moves of the current position if already generated, 
+        otherwise the stored move is tested with Legality
+        :return: the stored move of the current position if it is legal, None otherwise.
+        Guards against index and key collisions without generating all moves
+        """
+        key = self.board.zobrist_key
+        entry = self.table.get(self.index(key), None)
+        if not entry or key != entry[self.key] or not entry[self.move]:
+            return self.invalid
+        if legal_moves is not None:
+            return entry[self.move] if entry[self.move] in legal_moves else self.invalid
+        if not Legality.is_legal(self.board, entry[self.move]):
+            return self.invalid
+        return entry[self.move]
 
@@ -5,3 +5,43 @@ class BaseConfig:
     new_model_checkpoint = "checkpoint_new.h5"
     old_model_checkpoint = "checkpoint_old.h5"
     max_processes = cpu_count()
+
+class BookConfig(BaseConfig):
+    use_book = True
+    book_filepath = "core/engine/ai/opening_book.npy"
+    # Number of plies from the start of the game the book is used for
+    max_plies = 10
+    # Weights of moves from games (see OpeningBook.build_from_games), by the outcome for the side making them
+    win_weight = 2
+    draw_weight = 1
+    loss_weight = 0
+    # Building from alpha-beta search (see OpeningBook.build_from_search), a tree of search_width ** search_plies lines
+    search_plies = 4
+    search_width = 3
+    search_depth = 4
+
+class TablebaseConfig(BaseConfig):
+    use_tablebases = True
+    folder = "core/engine/ai/tablebases"
+    # Material configurations built by ``main.py --build-tablebases``, red pieces before black ones,
+    # in the order of the piece types (see Tablebase)
+    materials = ["KR_KAA", "KPH_K"]
+
+class MixedAgentConfig(BaseConfig):
+    # Seconds per move shared by the alpha-beta and the MCTS search of AlphaBetaZeroAgent, which run side by side
+    move_time = 30
+
+class HybridSearchConfig(BaseConfig):
+    # Seconds the hybrid alpha-beta agent searches per move
+    move_time = 10
+    # Moves of nodes closer to the root than this are ordered by the network's policy
+    policy_plies = 2
+    # Share of the network value in leaf evaluations (blended with Evaluation.pst_shef), 1 replaces the pst
+    network_weight = .5
+    # Network values (-1 to 1) are multiplied by this to be comparable to pst evaluations
+    value_scale = 500
+    # The leaves of a frontier node are valued by the network only if its pst evaluation
+    # is within this margin of the window, elsewhere the network wouldn't change the outcome
+    frontier_margin = 200
+    # Cached network evaluations, the cache is cleared when full
+    cache_size = 2 ** 18
@@ -35,6 +35,8 @@ def compute_elo(player_elo: int, opponent_elo: int, z: float):
 class Evaluator:
     def __init__(self, board):
         self.board = board
+        # Installs the summary writer of the evaluation as the default writer
+        EvaluationConfig.get_eval_writer()
 
     def nnet_vs_random(self, board: Board=None, component_logger: logging.Logger=None):
         logger = component_logger or logger
@@ -185,7 +187,7 @@ class Evaluator:
         win_rate = self.compute_win_rate(outcomes)
         updated_elo = self.update_elo(outcomes, new_elo, old_elo)
         
-        # with EvaluationConfig.eval_writer.as_default(step=)
+        # with EvaluationConfig.get_eval_writer().as_default(step=)
         self.save_eval(win_rate, EvaluationConfig.win_rate_filename)
         self.save_eval(updated_elo, EvaluationConfig.elo_rating_filename)
 
@@ -0,0 +1,118 @@
+from time import perf_counter
+from core.engine import Board, PrecomputingMoves
+from core.engine.ai.agent_interface import Agent
+from core.engine.ai.alphabeta import Dfs, Evaluation
+from core.engine.ai.config import HybridSearchConfig
+from logging import getLogger
+logger = getLogger(__name__)
+
+class NetworkEvaluator:
+    """
+    Lets the alpha-beta search use the network (see Dfs.leaf_evaluator). \n
+    Single predictions are too slow to value every leaf, so the leaves are valued in batches: at a frontier node
+    (one ply above the leaves), the positions after all its moves are predicted in one call and cached by their
+    zobrist key, and the leaves look their values up. Only frontier nodes whose pst evaluation is close to the
+    search window are batched, the other leaves keep the pst evaluation. \n
+    Nodes close to the root are few, so they're predicted one by one to order their moves by the policy.
+    """
+    def __init__(self, nnet=None, config=HybridSearchConfig) -> None:
+        """
+        :param nnet: CNN, the current model's checkpoint is loaded if None
+        """
+        if nnet is None:
+            from core.engine.ai.selfplay_rl import CNN
+            nnet = CNN.load_nnet()
+        self.nnet = nnet
+        self.config = config
+        # Hash maps of zobrist keys and the network value (scaled to pst units) or policy of the position
+        self.values = {}
+        self.priors = {}
+        # Analytics
+        self.num_batches = 0
+        self.num_predictions = 0
+        self.inference_time = 0
+
+    def predict(self, bitboards: list) -> tuple:
+        """
+        :return: policies and values of the positions, values scaled by value_scale
+        """
+        if len(self.values) + len(bitboards) > self.config.cache_size:
+            self.values.clear()
+            self.priors.clear()
+        t0 = perf_counter()
+        policies, values = self.nnet.predict_batch(bitboards)
+        self.inference_time += perf_counter() - t0
+        self.num_batches += 1
+        self.num_predictions += len(bitboards)
+        return policies, values[:, 0] * self.config.value_scale
+
+    def evaluate(self, board: Board) -> int:
+        """
+        :return: evaluation of the leaf for the moving side, blended with the network value if it was predicted
+        """
+        evaluation = Evaluation.pst_shef(board)
+        value = self.values.get(board.zobrist_key)
+        if value is None:
+            return evaluation
+        return round((1 - self.config.network_weight) * evaluation + self.config.network_weight * value)
+
+    def prefetch(self, board: Board, moves: list[tuple], alpha: int, beta: int) -> None:
+        """
+        Predicts the positions after ``moves`` in one batch, unless they're cached already or
+        the pst evaluation of the frontier node is too far outside of the window (alpha, beta)
+        """
+        margin = self.config.frontier_margin
+        if not alpha - margin <= Evaluation.pst_shef(board) <= beta + margin:
+            return
+        keys, bitboards = [], []
+        for move in moves:
+            board.make_move(move, search_state=True)
+            if board.zobrist_key not in self.values:
+                keys.append(board.zobrist_key)
+                bitboards.append(board.piecelist_to_bitboard())
+            board.reverse_move(search_state=True)
+        if not keys:
+            return
+        _, values = self.predict(bitboards)
+        self.values.update(zip(keys, values.tolist()))
+
+    def order_moves(self, board: Board, moves: list[tuple]) -> list[tuple]:
+        """
+        :return: the moves sorted by the network's policy, ties keep their order
+        """
+        s = board.zobrist_key
+        if s not in self.priors:
+            policies, values = self.predict([board.piecelist_to_bitboard()])
+            self.priors[s] = policies[0]
+            self.values[s] = float(values[0])
+        prior = self.priors[s]
+        # The policy is indexed from the moving side's perspective
+        flip = board.moving_side
+        return sorted(moves, key=lambda move: prior[PrecomputingMoves.move_index_hash[board.flip_move(move) if flip else move]], reverse=True)
+
+    def get_stats(self) -> dict:
+        return {
+            "batches": self.num_batches,
+            "predictions": self.num_predictions,
+            "average_batch_size": self.num_predictions / self.num_batches if self.num_batches else 0,
+            "inference_time": self.inference_time,
+        }
+
+
+class HybridAlphaBetaAgent(Agent):
+    """
+    Alpha-beta search (pvs with iterative deepening) using the network for move ordering and leaf evaluation
+    """
+    def __init__(self, nnet=None, move_time: float=HybridSearchConfig.move_time) -> None:
+        self.search_class = Dfs.fork()
+        self.search_class.leaf_evaluator = NetworkEvaluator(nnet)
+        self.move_time = move_time
+
+    def choose_action(self, board: Board):
+        move = self.search_class.search(board, algorithm="pvs", time_limit=self.move_time)
+        logger.info(f"hybrid search || depth: {self.search_class.completed_depth} || nodes: {self.search_class.nodes} || "
+                    f"network: {self.search_class.leaf_evaluator.get_stats()}")
+        return move
+
+    def stop(self) -> None:
+        self.search_class.abort_search = True
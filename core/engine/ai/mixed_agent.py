@@ -1,47 +1,80 @@
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
 from .agent_interface import Agent
 from .alphabeta.agent import AlphaBetaAgent
 from .selfplay_rl.agent import AlphaZeroAgent
 from .alphabeta.piece_square_tables import PieceSquareTable
-from core.engine import Board, LegalMoveGenerator, PrecomputingMoves
+from .config import MixedAgentConfig
+from core.engine import Board, MoveGenerator, PrecomputingMoves
+from logging import getLogger
+logger = getLogger(__name__)
 
 class AlphaBetaZeroAgent(Agent):
     """
-    A combination of AlphaBeta and AlphaZero
+    A combination of AlphaBeta and AlphaZero. \n
+    Both searches run at the same time under a shared time budget: the alpha-beta processes are driven from
+    a background thread while MCTS simulates on the calling one. The network's priors of the root order
+    the moves alpha-beta searches, so the moves MCTS favours are evaluated first when the deadline hits.
     """
-    def __init__(self, above_max=-100):
+    def __init__(self, above_max=-100, move_time: float=MixedAgentConfig.move_time):
         """
         The Alpha-Beta-Zero Agent.
-        :param above_max: value added to the maximum value of the pst, 
+        :param above_max: value added to the maximum value of the pst,
         controlling weight of AlphaZero evaluation
+        :param move_time: seconds both searches share per move
         """
         self.aba = AlphaBetaAgent()
         self.aza = AlphaZeroAgent()
         self.m = PieceSquareTable.max_value + above_max
+        self.move_time = move_time
+        # Own generator, so the agent can run off the UI thread
+        self.move_generator = MoveGenerator()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    @staticmethod
+    def get_action_index(board: Board, move: tuple) -> int:
+        """
+        :return: index of the move in the action space, which is seen from the moving side's perspective
+        """
+        return PrecomputingMoves.move_index_hash[board.flip_move(move) if board.moving_side else move]
 
     def choose_action(self, board: Board):
-        moves = LegalMoveGenerator.load_moves(board)
+        start = perf_counter()
+        deadline = start + self.move_time
+        moves = self.move_generator.load_moves(board)
 
-        aba_eval_table = self.aba.get_eval_table(board, moves)
-        aba_action = self.aba.choose_action(board, aba_eval_table)
+        priors = self.aza.mcts.get_root_priors(board)
+        moves = sorted(moves, key=lambda move: priors[self.get_action_index(board, move)], reverse=True)
+        # The alpha-beta processes are forked from a copy, as MCTS keeps making moves on the board meanwhile
+        aba_future = self.executor.submit(self.aba.get_eval_table, board.copy(), moves, deadline)
+
+        visit_counts = self.aza.get_mcts_pi(board, deadline=deadline)
+        # Without any root visit (e.g. the simulations were cut short by a kept subtree) the priors decide
+        if not visit_counts.any():
+            visit_counts = priors
+        aza_probs = self.aza.mcts.get_pi(visit_counts)
+        aza_action = self.aza.choose_action(board, self.aza.mcts.apply_tau(visit_counts, tau=0))
 
-        aza_probs = self.aza.get_mcts_pi(board)
-        aza_action = self.aza.choose_action(board, aza_probs)
+        aba_eval_table = dict(aba_future.result())
+        logger.info(f"searched {len(aba_eval_table)} of {len(moves)} moves in {perf_counter() - start:.2f}s")
+        if not aba_eval_table:
+            return aza_action
+        aba_action = self.aba.choose_action(board, aba_eval_table)
         if aza_action == aba_action:
             return aba_action
-        
-        if board.opponent_side:
-            aba_action = board.flip_move(aba_action)
-            aza_action = board.flip_move(aza_action)
-            
-        aba_action_space_index = PrecomputingMoves.move_index_hash[aba_action]
-        aba_value = aza_probs[aba_action_space_index] * self.m + aba_eval_table[aba_action]
-        
-        aza_action_space_index = PrecomputingMoves.move_index_hash[aza_action]
-        aza_value = aza_probs[aza_action_space_index] * self.m + aba_eval_table[aza_action]
-        
-        print(f"AlphaBeta Action: {aba_action}")
-        print(f"AlphaBeta value: {aba_value}")
-        print(f"AlphaZero Action: {aza_action}")        
-        print(f"AlphaZero value: {aza_value}")
+
+        # Moves alpha-beta had no time for count as bad as the worst one it searched
+        worst_eval = min(aba_eval_table.values())
+        aba_value = aza_probs[self.get_action_index(board, aba_action)] * self.m + aba_eval_table[aba_action]
+        aza_value = aza_probs[self.get_action_index(board, aza_action)] * self.m + aba_eval_table.get(aza_action, worst_eval)
+
+        logger.info(f"AlphaBeta Action: {aba_action}")
+        logger.info(f"AlphaBeta value: {aba_value}")
+        logger.info(f"AlphaZero Action: {aza_action}")
+        logger.info(f"AlphaZero value: {aza_value}")
 
         return aza_action if aza_value > aba_value else aba_action
+
+    def stop(self) -> None:
+        self.aba.stop()
+        self.aza.stop()
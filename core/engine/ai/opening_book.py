@@ -0,0 +1,185 @@
+import os
+import numpy as np
+from random import choices
+from core.engine import Board, ZobristHashing, Legality, MoveGenerator
+from core.engine.ai.config import BookConfig
+from logging import getLogger
+logger = getLogger(__name__)
+
+class OpeningBook:
+    """
+    Moves for known positions, so agents can skip searching in the first plies. \n
+    Stored as array of (zobrist key, move, weight) records sorted by key, which is memory-mapped when loaded,
+    so a position is found by binary search without reading the whole file. Keys and moves are stored from
+    red's perspective (red at the bottom), boards with red at the top are flipped when probing.
+    """
+    record_dtype = np.dtype([("key", np.uint64), ("move", np.uint16), ("weight", np.uint32)])
+    default_book = None
+
+    def __init__(self, records: np.ndarray) -> None:
+        """
+        :param records: array of record_dtype, sorted by key
+        """
+        self.records = records
+        self.keys = records["key"]
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @classmethod
+    def load(cls, filepath: str=None):
+        """
+        :param filepath: defaults to BookConfig.book_filepath
+        :return: the memory-mapped book, None if the file doesn't exist
+        """
+        filepath = filepath or BookConfig.book_filepath
+        if not os.path.isfile(filepath):
+            return None
+        return cls(np.load(filepath, mmap_mode="r"))
+
+    @classmethod
+    def get_default(cls):
+        """
+        :return: the book at BookConfig.book_filepath, loaded on first use. None if there is none or
+        it's disabled (BookConfig.use_book)
+        """
+        if not BookConfig.use_book:
+            return None
+        if cls.default_book is None:
+            cls.default_book = cls.load() or False
+            if cls.default_book:
+                logger.info(f"loaded opening book with {len(cls.default_book)} moves")
+        return cls.default_book or None
+
+    def save(self, filepath: str=None) -> None:
+        filepath = filepath or BookConfig.book_filepath
+        folder = os.path.dirname(filepath)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        # np.save() appends .npy otherwise
+        with open(filepath, "wb") as f:
+            np.save(f, np.asarray(self.records))
+
+    @staticmethod
+    def get_key(board: Board) -> int:
+        """
+        :return: zobrist key of the position seen from red's side
+        """
+        if not board.is_red_up:
+            return board.zobrist_key
+        empty = ZobristHashing.empty_index
+        piece_indices = [piece[0] * ZobristHashing.num_pieces + piece[1] if piece else empty for piece in reversed(board.squares)]
+        return int(ZobristHashing.digest_squares(piece_indices, [board.moving_color])[0])
+
+    @staticmethod
+    def encode_move(board: Board, move: tuple) -> int:
+        if board.is_red_up:
+            move = Board.flip_move(move)
+        return move[0] * 90 + move[1]
+
+    @staticmethod
+    def decode_move(board: Board, code: int) -> tuple:
+        move = divmod(int(code), 90)
+        return Board.flip_move(move) if board.is_red_up else move
+
+    def get_moves(self, board: Board) -> dict:
+        """
+        :return: hash map of the book moves in the position and their weights
+        """
+        key = np.uint64(self.get_key(board))
+        start, end = np.searchsorted(self.keys, key, "left"), np.searchsorted(self.keys, key, "right")
+        return {self.decode_move(board, record["move"]): int(record["weight"]) for record in self.records[start:end]}
+
+    def probe(self, board: Board, best: bool=False):
+        """
+        :param best: choose the move with the highest weight instead of choosing randomly proportional to the weights
+        :return: a legal book move, None if the position isn't in the book or beyond BookConfig.max_plies
+        """
+        if len(board.game_history) >= BookConfig.max_plies:
+            return None
+        # Key collisions could return moves of another position
+        moves = {move: weight for move, weight in self.get_moves(board).items() if Legality.is_legal(board, move)}
+        if not moves:
+            return None
+        if best:
+            return max(moves, key=moves.get)
+        return choices(list(moves), weights=list(moves.values()))[0]
+
+    @classmethod
+    def from_weights(cls, weights: dict):
+        """
+        :param weights: hash map of (key, encoded move) and their weight, entries with weight 0 are dropped
+        """
+        records = np.array([(key, move, weight) for (key, move), weight in weights.items() if weight > 0], dtype=cls.record_dtype)
+        records.sort(order=["key", "weight"])
+        return cls(records)
+
+    @classmethod
+    def build_from_games(cls, games: list, max_plies: int=BookConfig.max_plies):
+        """
+        Counts the moves of the first max_plies plies of finished games, weighted by their outcome for
+        the side that made them (BookConfig.win_weight, draw_weight, loss_weight)
+        :param games: list of (fen, play_as_red, moves, winner) tuples, winner is the color or None for draws.
+        See Pipeline.execute_episode()
+        """
+        weights = {}
+        for fen, play_as_red, moves, winner in games:
+            board = Board(fen, play_as_red)
+            for move in moves[:max_plies]:
+                if winner is None:
+                    weight = BookConfig.draw_weight
+                else:
+                    weight = BookConfig.win_weight if winner == board.moving_color else BookConfig.loss_weight
+                record = (cls.get_key(board), cls.encode_move(board, move))
+                weights[record] = weights.get(record, 0) + weight
+                board.make_move(move)
+        return cls.from_weights(weights)
+
+    @classmethod
+    def build_from_search(cls, fen: str, max_plies: int=BookConfig.search_plies, depth: int=BookConfig.search_depth,
+                          width: int=BookConfig.search_width):
+        """
+        Searches every position reached by following the ``width`` best moves of each position for ``max_plies``
+        plies and stores its best move, so the book holds one move per position
+        :param fen: root position, red at the bottom
+        :param width: number of moves followed per position, the best move and the next moves of the move ordering
+        """
+        from core.engine.ai.alphabeta import Dfs, order_moves
+        search_class = Dfs.fork()
+        search_class.search_depth = depth
+        move_generator = MoveGenerator()
+        weights = {}
+        frontier = [[]]
+        for plies in range(max_plies):
+            next_frontier = []
+            for line in frontier:
+                board = Board(fen)
+                for move in line:
+                    board.make_move(move)
+                moves = move_generator.load_moves(board)
+                if not moves:
+                    continue
+                best_move = search_class.search(board, algorithm="pvs")
+                weights[(cls.get_key(board), cls.encode_move(board, best_move))] = 1
+                other_moves = [move for move in order_moves(moves, board) if move != best_move]
+                next_frontier.extend(line + [move] for move in [best_move] + other_moves[:width - 1])
+            logger.info(f"opening book: {len(weights)} positions searched up to ply {plies + 1}")
+            frontier = next_frontier
+        return cls.from_weights(weights)
+
+def build_opening_book(source: str) -> OpeningBook:
+    """
+    Builds the book for ``main.py --build-book`` and saves it to BookConfig.book_filepath
+    :param source: "search" for alpha-beta searches from the initial position, "selfplay" for the saved self-play games
+    """
+    from core.utils import BoardUtility
+    if source == "selfplay":
+        from core.engine.ai.selfplay_rl.selfplay import Pipeline
+        games = Pipeline.load_games()
+        logger.info(f"building opening book from {len(games)} self-play games")
+        opening_book = OpeningBook.build_from_games(games)
+    else:
+        opening_book = OpeningBook.build_from_search(BoardUtility.get_inital_fen(True, True))
+    opening_book.save()
+    logger.info(f"saved opening book with {len(opening_book)} moves to {BookConfig.book_filepath}")
+    return opening_book
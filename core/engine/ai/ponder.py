@@ -0,0 +1,141 @@
+import threading
+from time import perf_counter
+from core.engine import Board, Legality
+from core.engine.ai.alphabeta import Dfs, SearchConfig
+from core.engine.ai.alphabeta.transposition_table import TranspositionTable
+from logging import getLogger
+logger = getLogger(__name__)
+
+class Ponderer:
+    """
+    Keeps the agent searching on a background thread while the opponent thinks. \n
+    Alpha-beta ("ab") searches the reply its last principal variation expected, filling its own transposition
+    table. If the opponent plays that reply (ponder hit), the running search only gets the rest of the move time,
+    and is stopped right away if that's already used up. \n
+    MCTS ("az") keeps growing the tree below all the opponent's replies, the subtree of the reply
+    actually played is then kept by MCTS.reset(), so its simulations count towards the next move. \n
+    Pondering happens on a copy of the board, so the caller is free to change its own board meanwhile.
+    """
+    def __init__(self, agent: str="ab", time_limit: float=SearchConfig.ponder_move_time) -> None:
+        """
+        :param time_limit: seconds the alpha-beta search spends per move
+        """
+        self.agent = agent
+        self.time_limit = time_limit
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.ponder_board = None
+        # The pondering search makes moves on its board, so its key is saved before
+        self.ponder_key = None
+        self.ponder_start = 0
+        self.expected_reply = None
+        self.ponder_hits = 0
+        self.ponder_misses = 0
+        if agent == "az":
+            from core.engine.ai.selfplay_rl import AlphaZeroAgent
+            self.alpha_zero_agent = AlphaZeroAgent()
+        else:
+            self.search_class = Dfs.fork()
+            self.search_class.transposition_table = TranspositionTable(None, size=SearchConfig.transposition_table_size)
+
+    def is_pondering(self) -> bool:
+        return bool(self.thread) and self.thread.is_alive()
+
+    def choose_action(self, board: Board):
+        """
+        Ends pondering and returns the move to play in ``board``, blocking until it's found
+        """
+        if self.agent == "az":
+            return self.choose_mcts_action(board)
+        return self.choose_alpha_beta_action(board)
+
+    def choose_alpha_beta_action(self, board: Board):
+        move = None
+        # The pondering search might have finished already, e.g. after finding a mate
+        is_hit = bool(self.thread) and self.ponder_key == board.zobrist_key
+        if is_hit:
+            self.ponder_hits += 1
+            # The time spent pondering on the right position counts towards the move time.
+            # Set repeatedly, as a search that only just started resets both
+            deadline = self.ponder_start + self.time_limit
+            while self.thread.is_alive():
+                if perf_counter() >= deadline:
+                    self.search_class.abort_search = True
+                else:
+                    self.search_class.deadline = deadline
+                self.thread.join(timeout=.05)
+            self.thread = None
+            if self.search_class.principal_variation:
+                move = self.search_class.principal_variation[0]
+            logger.info(f"ponder hit || depth: {self.search_class.completed_depth} || nodes: {self.search_class.nodes}")
+        else:
+            if self.thread:
+                self.ponder_misses += 1
+            self.stop()
+        if not move:
+            move = self.search_class.search(board, algorithm="pvs", time_limit=self.time_limit)
+        pv = self.search_class.principal_variation
+        self.expected_reply = pv[1] if len(pv) > 1 and pv[0] == move else None
+        return move
+
+    def choose_mcts_action(self, board: Board):
+        self.stop()
+        mcts = self.alpha_zero_agent.mcts
+        if board.zobrist_key in mcts.subtree:
+            self.ponder_hits += 1
+        else:
+            # Nothing of the old tree is reusable, starting over
+            mcts.subtree = {board.zobrist_key: []}
+        mcts.reset(board.zobrist_key)
+        return self.alpha_zero_agent.choose_action(board)
+
+    def start(self, board: Board) -> None:
+        """
+        Starts pondering, to be called after the agent's move was made on ``board``
+        """
+        self.stop()
+        self.ponder_board = board.copy()
+        if self.agent == "az":
+            target = self.ponder_mcts
+        else:
+            if not self.expected_reply or not Legality.is_legal(self.ponder_board, self.expected_reply):
+                return
+            self.ponder_board.make_move(self.expected_reply)
+            target = self.ponder_alpha_beta
+        self.stop_event.clear()
+        self.ponder_key = self.ponder_board.zobrist_key
+        self.ponder_start = perf_counter()
+        self.thread = threading.Thread(target=target, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """
+        Aborts pondering without using its result, e.g. when moves are taken back
+        """
+        if not self.thread:
+            return
+        self.stop_event.set()
+        while self.thread.is_alive():
+            if self.agent != "az":
+                self.search_class.abort_search = True
+            self.thread.join(timeout=.05)
+        self.thread = None
+
+    def abort(self) -> None:
+        """
+        Makes a choose_action() running on another thread return as soon as possible, see Agent.stop()
+        """
+        if self.agent == "az":
+            self.alpha_zero_agent.stop()
+        else:
+            self.search_class.abort_search = True
+
+    def ponder_alpha_beta(self) -> None:
+        # No time limit, the search runs until it's stopped or the opponent's move is known
+        self.search_class.iterative_deepening(self.ponder_board, Dfs.max_depth)
+
+    def ponder_mcts(self) -> None:
+        mcts = self.alpha_zero_agent.mcts
+        bitboards = list(self.ponder_board.piecelist_to_bitboard())
+        while not self.stop_event.is_set():
+            mcts.search(self.ponder_board, is_root=True, bitboards=bitboards)
@@ -1,7 +1,9 @@
 import math
 import numpy as np
-from core.engine import Board, LegalMoveGenerator, PrecomputingMoves
+from time import perf_counter
+from core.engine import Board, MoveGenerator, PrecomputingMoves
 from core.engine.ai.selfplay_rl import CNN, PlayConfig
+from core.engine.ai.tablebase import Tablebases
 from core.utils import time_benchmark
 from typing import Iterable
 from logging import getLogger
@@ -38,6 +40,8 @@ class OldMCTS():
     def __init__(self, nnet: CNN, config=PlayConfig):
         self.nnet = nnet
         self.config = config
+        # Own generator, so that several trees can be searched side by side (e.g. when evaluating two networks)
+        self.move_generator = MoveGenerator()
         self.reset()
 
     def reset(self):
@@ -72,7 +76,7 @@ class OldMCTS():
 
         # NOTE: the term 'action' is synonymous with 'move' in this method for congruence with the paper
         s = board.zobrist_key
-        moves = moves or LegalMoveGenerator.load_moves(board)
+        moves = moves or self.move_generator.load_moves(board)
 
         # Check if position was already statically evaluated
         if s not in self.Es:
@@ -91,7 +95,7 @@ class OldMCTS():
             p, v = self.nnet.predict(state_planes)
             self.Ps[s] = p[0] # CNN output is two-dimensional
 
-            valids = LegalMoveGenerator.bitvector_legal_moves(legal_moves=moves) # make this binary maybe?
+            valids = self.move_generator.bitvector_legal_moves(legal_moves=moves) # make this binary maybe?
             # masking invalid moves
             self.Ps[s] = self.Ps[s] * valids
             sum_Ps = np.sum(self.Ps[s])
@@ -249,6 +253,8 @@ class MCTS(OldMCTS):
     def __init__(self, nnet: CNN, config=PlayConfig):
         self.nnet = nnet
         self.config = config
+        # Own generator, so that several trees can be searched side by side (e.g. when evaluating two networks)
+        self.move_generator = MoveGenerator()
 
         # W Values aren't stored because they are only of temporary use in each interation
         self.Qsa = {}  # stores Q values for s,a (as defined in the paper)
@@ -258,12 +264,16 @@ class MCTS(OldMCTS):
 
         self.Es = {}  # stores each state s where the terminal code has been evaluated
         self.Vs = {}  # stores legal moves for board s
+        self.Ts = {}  # stores the tablebase value (win 1, draw 0, loss -1) of s, None if s isn't in a tablebase
+        Tablebases.load()
         
         # Just for reset optimization
         self.subtree = {} # stores all reached sub-states from each state at depth 1
         self.saved_sims = 0
 
         self.max_depth = 0
+        # Set to end get_visit_counts() early, e.g. from another thread
+        self.abort_search = False
 
     def reset(self, moved_to: int):
         """
@@ -280,6 +290,7 @@ class MCTS(OldMCTS):
         self.Ps = {s: self.Ps[s] for s in subtree_to_keep} 
         self.Es = {s: self.Es[s] for s in subtree_to_keep} 
         self.Vs = {s: self.Vs[s] for s in subtree_to_keep} 
+        self.Ts = {s: self.Ts[s] for s in subtree_to_keep if s in self.Ts}
     
         self.subtree = {moved_to: subtree_to_keep}
 
@@ -311,7 +322,7 @@ class MCTS(OldMCTS):
         self.max_depth = max(self.max_depth, depth)
         # NOTE: the term 'action' is synonymous with 'move' in this method for congruence with the paper
         s = board.zobrist_key
-        moves = moves or LegalMoveGenerator.load_moves(board)
+        moves = moves or self.move_generator.load_moves(board)
 
         if not is_root:
             self.subtree[subtree_root] = self.subtree.get(subtree_root, []) + [s]
@@ -324,6 +335,13 @@ class MCTS(OldMCTS):
         if self.Es[s] != -1:
             return -self.Es[s]
 
+        # Positions in a tablebase are valued exactly instead of by the network, cutting off their subtree
+        if not is_root:
+            if s not in self.Ts:
+                self.Ts[s] = Tablebases.probe_wdl(board) if Tablebases.max_pieces else None
+            if self.Ts[s] is not None:
+                return -self.Ts[s]
+
         if board.moving_side: moves = board.flip_moves(moves)
 
         # Check if position was expanded
@@ -333,7 +351,7 @@ class MCTS(OldMCTS):
             p, v = self.nnet.predict(state_planes)
             self.Ps[s] = p[0] # CNN output is two-dimensional
 
-            valids = LegalMoveGenerator.bitvector_legal_moves(legal_moves=moves) # make this binary maybe?
+            valids = self.move_generator.bitvector_legal_moves(legal_moves=moves) # make this binary maybe?
             # masking invalid moves
             self.Ps[s] = self.Ps[s] * valids
             sum_Ps = np.sum(self.Ps[s])
@@ -404,7 +422,7 @@ class MCTS(OldMCTS):
         return -v
 
     @time_benchmark
-    def get_visit_counts(self, board: Board, bitboards: list, moves=None):
+    def get_visit_counts(self, board: Board, bitboards: list, moves=None, deadline: float=None):
         """
         Performs a number of MCTS simulations with root state of current ``board``.
         :return: The visit counts at depth 1 used to calculate π and to apply exploration
@@ -416,12 +434,29 @@ class MCTS(OldMCTS):
         network learns the improved probabilities of MCTS, it cannot be trained using π with 
         tau applied (inconsistent and inefficient for training), therefore both probabilities
         have to be calculated.
+        :param deadline: perf_counter() time after which no more simulations are started. The root is visited
+        at least once anyway (also if abort_search is set), so there's always a move to choose
         """
+        s = board.zobrist_key
+        self.abort_search = False
         for i in range(self.config.simulations_per_move - self.saved_sims):
+            if (self.abort_search or deadline and perf_counter() >= deadline) and self.Ns.get(s):
+                logger.info(f"search stopped after {i} simulations")
+                break
             # logger.info(f"starting simulation n. {i}")
             self.search(board, is_root=True, bitboards=bitboards, moves=moves)
 
-        s = board.zobrist_key
         # storing the visit counts
         visit_counts = np.array([self.Nsa[(s, a)] if (s, a) in self.Nsa else 0 for a in PrecomputingMoves.action_space_range])
         return visit_counts
+
+    def get_root_priors(self, board: Board, bitboards: list=None) -> np.ndarray:
+        """
+        Expands the root with one simulation, unless a kept subtree expanded it already
+        :return: the network's policy for the position of ``board``, masked to its legal moves. 
+        Indexed by the action space from the moving side's perspective, like π
+        """
+        s = board.zobrist_key
+        if s not in self.Ps:
+            self.search(board, is_root=True, bitboards=bitboards)
+        return self.Ps[s]
@@ -1,5 +1,6 @@
-from .config import ModelConfig, PlayConfig, TrainingConfig, EvaluationConfig
+from .config import ModelConfig, FastModelConfig, PlayConfig, FastPlayConfig, TrainingConfig, EvaluationConfig, LiteModelConfig, DistillationConfig
 from .nnet import CNN
+from .lite_model import LiteModel
 from .MCTS import MCTS
 from .selfplay import Pipeline
 from .agent import AlphaZeroAgent
\ No newline at end of file
@@ -1,4 +1,4 @@
-from . import MCTS, CNN
+from . import MCTS, CNN, LiteModel, ModelConfig, FastModelConfig, PlayConfig, FastPlayConfig
 from core.engine import Board
 from core.engine.ai.agent_interface import Agent
 
@@ -8,15 +8,24 @@ class AlphaZeroAgent(Agent):
     handles playing and training
     """
     def __init__(self) -> None:
-        nnet = CNN()
-        self.mcts = MCTS(nnet)
+        if ModelConfig.get_play_config() is FastModelConfig:
+            # An untrained fast network would play randomly, so it has to be distilled first
+            try:
+                nnet = CNN.load_nnet(config=FastModelConfig, save_model_if_no_file=False)
+            except FileNotFoundError as e:
+                raise FileNotFoundError(f"{e}, distill the fast network with main.py --distill first") from e
+            self.mcts = MCTS(nnet, config=FastPlayConfig)
+        else:
+            nnet = LiteModel.load_nnet() or CNN()
+            self.mcts = MCTS(nnet, config=PlayConfig)
     
-    def get_mcts_pi(self, board: Board):
+    def get_mcts_pi(self, board: Board, deadline: float=None):
         """
         Get the MCTS probability distribution for current state of ``board``
+        :param deadline: perf_counter() time after which MCTS stops simulating
         """
         bitboards = list(board.piecelist_to_bitboard())
-        pi = self.mcts.get_visit_counts(board, bitboards=bitboards)
+        pi = self.mcts.get_visit_counts(board, bitboards=bitboards, deadline=deadline)
         return pi
 
     def choose_action(self, board: Board, pi=[]):
@@ -31,4 +40,7 @@ class AlphaZeroAgent(Agent):
         self.mcts.reset(board.zobrist_key)
         # print(f"{self.mcts.subtree=}, {len(self.mcts.subtree[board.zobrist_key])=}")
         board.reverse_move()
-        return action
\ No newline at end of file
+        return action
+
+    def stop(self) -> None:
+        self.mcts.abort_search = True
\ No newline at end of file
@@ -1,7 +1,5 @@
 from core.engine import PrecomputingMoves
 import os
-import tensorflow as tf
-import keras
 from datetime import datetime
 from ..config import BaseConfig
 
@@ -16,6 +14,27 @@ class ModelConfig(BaseConfig):
     l2_reg_const = 1e-4
     value_fc_layer_size = 256
     distributed = False
+    # Network the AlphaZero agent plays with: "full" or "fast" (FastModelConfig)
+    play_model = "full"
+
+    @staticmethod
+    def get_play_config():
+        """
+        :return: config of the network selected by ModelConfig.play_model
+        """
+        return FastModelConfig if ModelConfig.play_model == "fast" else ModelConfig
+
+
+class FastModelConfig(ModelConfig):
+    """
+    A much smaller network distilled from the full one (see distillation), which allows
+    many more simulations per second on CPUs
+    """
+    num_filters = 64
+    num_res_layers = 2
+    value_fc_layer_size = 64
+    new_model_checkpoint = "checkpoint_fast.h5"
+    old_model_checkpoint = "checkpoint_fast_old.h5"
     
 
 class PlayConfig(BaseConfig):
@@ -33,13 +52,70 @@ class PlayConfig(BaseConfig):
     training_iterations = 10
     steps_per_save = 2
     max_training_data = 5000 # Max number of training examples
+    max_saved_games = 5000 # Max number of games kept for the opening book, the oldest ones are dropped
 
     examples_filename = "examples"
+    games_filename = "games"
+    # Play the moves of the opening book (see BookConfig) without simulations
+    use_opening_book = False
+
+
+class FastPlayConfig(PlayConfig):
+    """
+    MCTS settings of the fast network (FastModelConfig), which gets more simulations
+    to play with about the same time per move as the full network
+    """
+    simulations_per_move = 100
+
+
+class DistillationConfig(BaseConfig):
+    # Share of the teacher's outputs in the student's targets, the rest are the examples' MCTS policy and outcome
+    policy_teacher_weight = .8
+    value_teacher_weight = .5
+    # Softens the teacher's policy (p ** (1 / temperature)), so the student learns the ranking of the other moves too
+    temperature = 2
+    learning_rate = .01
+    epochs = 10
+    batch_size = 256
+    # Training examples the student isn't trained on, used as validation data
+    held_out_samples = 512
+    # Match of the student against the teacher after training (see distillation.play_match()).
+    # The student plays with FastPlayConfig, as it's meant to play with the same time per move
+    match_games = 10
+
+
+class LiteModelConfig(BaseConfig):
+    # Post-training quantization of the exported model: "int8" (calibrated with training examples), "float16" or None.
+    # It's the default of --export-lite, the model loaded and re-exported by self-play is the most recently exported one
+    quantization = "int8"
+    quantizations = ("int8", "float16", None)
+    # Self-play and the AlphaZero agent predict with the exported model, as long as it's not older than the checkpoint
+    use_lite_model = False
+    # Training examples used to calibrate the int8 ranges and held out to compare the models (disjoint)
+    calibration_samples = 256
+    held_out_samples = 512
+    # Every self-play process runs its own interpreter, so one thread each keeps the cores busy without contention
+    num_threads = 1
+
+    @classmethod
+    def get_filepath(cls, quantization: str=None) -> str:
+        return os.path.join(cls.checkpoint_location, f"model_{quantization or 'float32'}.tflite")
 
 
 class TensorboardBaseConfig:
+    """
+    The callback and writer are created on first use, so importing the configs neither loads
+    tensorflow nor creates log directories
+    """
     tensorboard_logdir = os.path.join(BaseConfig.checkpoint_location, "logs/scalars", datetime.now().strftime("%Y%m%d-%H%M%S"))
-    tensorboard_callback = keras.callbacks.TensorBoard(log_dir=tensorboard_logdir)
+    tensorboard_callback = None
+
+    @classmethod
+    def get_tensorboard_callback(cls):
+        if not TensorboardBaseConfig.tensorboard_callback:
+            import keras
+            TensorboardBaseConfig.tensorboard_callback = keras.callbacks.TensorBoard(log_dir=cls.tensorboard_logdir)
+        return TensorboardBaseConfig.tensorboard_callback
 
 class TrainingConfig(BaseConfig, TensorboardBaseConfig):
     initial_lr = .01
@@ -57,5 +133,15 @@ class EvaluationConfig(BaseConfig, TensorboardBaseConfig):
     elo_rating_filename = "elo"
     win_rate_filename = "win_rate"
     baseline_rating = 200 # Elo of random agent
-    eval_writer = tf.summary.create_file_writer(TensorboardBaseConfig.tensorboard_logdir + "/eval")
-    eval_writer.set_as_default()
\ No newline at end of file
+    eval_writer = None
+
+    @classmethod
+    def get_eval_writer(cls):
+        """
+        :return: the summary writer of the evaluation, set as default writer when it's created
+        """
+        if not cls.eval_writer:
+            import tensorflow as tf
+            cls.eval_writer = tf.summary.create_file_writer(cls.tensorboard_logdir + "/eval")
+            cls.eval_writer.set_as_default()
+        return cls.eval_writer
@@ -0,0 +1,112 @@
+from . import CNN, MCTS, FastModelConfig, PlayConfig, FastPlayConfig, TrainingConfig, DistillationConfig
+from core.engine import Board, MoveGenerator, Piece
+from core.utils import BoardUtility
+
+import keras.backend
+
+import numpy as np
+import math
+from time import perf_counter
+
+from logging import getLogger
+logger = getLogger(__name__)
+
+def get_targets(teacher: CNN, examples: list) -> tuple:
+    """
+    Blends the teacher's outputs with the examples' labels, see DistillationConfig
+    :param examples: list of [s, pi, z] training examples
+    :return: tuple (bitboards, [policies, values]) to fit the student with
+    """
+    bitboards, pis, outcomes = zip(*examples)
+    x = np.asarray(bitboards, dtype=np.float32)
+    policies, values = teacher.model.predict(x, batch_size=DistillationConfig.batch_size, verbose=False)
+    policies = policies.astype(np.float64) ** (1 / DistillationConfig.temperature)
+    policies /= policies.sum(axis=1, keepdims=True)
+    policy_weight, value_weight = DistillationConfig.policy_teacher_weight, DistillationConfig.value_teacher_weight
+    policy_targets = policy_weight * policies + (1 - policy_weight) * np.asarray(pis)
+    value_targets = value_weight * values[:, 0] + (1 - value_weight) * np.asarray(outcomes, dtype=np.float32)
+    return x, [policy_targets, value_targets]
+
+def distill(teacher: CNN=None, student: CNN=None, examples: list=None) -> CNN:
+    """
+    Trains the student network (FastModelConfig) on the teacher's outputs for the training examples
+    of self-play and saves its checkpoint
+    :param teacher: the current full network by default
+    :param examples: the saved training examples by default
+    :return: the trained student
+    """
+    from .selfplay import Pipeline
+    teacher = teacher or CNN.load_nnet()
+    student = student or CNN(FastModelConfig)
+    examples = examples if examples is not None else Pipeline.load_training_data()
+    assert examples, "distillation needs training examples, run self-play first"
+    # The examples are shuffled when saved, so the last ones are held out
+    num_held_out = min(DistillationConfig.held_out_samples, len(examples) // 10)
+    training_examples, held_out = examples[:len(examples) - num_held_out], examples[len(examples) - num_held_out:]
+
+    logger.info(f"distilling {len(training_examples)} examples into the fast network")
+    keras.backend.set_value(student.opt.learning_rate, DistillationConfig.learning_rate)
+    student.model.fit(
+        *get_targets(teacher, training_examples),
+        validation_data=get_targets(teacher, held_out) if held_out else None,
+        batch_size=DistillationConfig.batch_size,
+        epochs=DistillationConfig.epochs,
+        callbacks=[TrainingConfig.get_tensorboard_callback()],
+        )
+    student.save_checkpoint()
+    return student
+
+def play_match(teacher: CNN, student: CNN, games: int=DistillationConfig.match_games) -> dict:
+    """
+    Lets the networks play each other with MCTS (PlayConfig for the teacher, FastPlayConfig for the student),
+    alternating colors, and measures the simulations per second of each
+    :return: hash map of the student's score (1 per win, .5 per draw), the elo difference it means and the speeds
+    """
+    players = [(teacher, PlayConfig), (student, FastPlayConfig)]
+    simulations, times = [0, 0], [0, 0]
+
+    move_generator = MoveGenerator()
+    score = 0
+    for game in range(games):
+        board = Board(BoardUtility.get_inital_fen(True, True))
+        student_color = Piece.red if game % 2 == 0 else Piece.black
+        while True:
+            moves = move_generator.load_moves(board)
+            status = board.get_terminal_status(len(moves))
+            is_students_turn = board.moving_color == student_color
+            if status != -1:
+                # The side to move lost if it has no moves left, else the game ended in a draw
+                if not status:
+                    score += .5
+                elif not is_students_turn:
+                    score += 1
+                break
+            nnet, config = players[is_students_turn]
+            # A new tree every move, the opponent's move would discard most of it anyway
+            mcts = MCTS(nnet, config=config)
+            t0 = perf_counter()
+            visit_counts = mcts.get_visit_counts(board, bitboards=list(board.piecelist_to_bitboard()))
+            times[is_students_turn] += perf_counter() - t0
+            simulations[is_students_turn] += config.simulations_per_move
+            board.make_move(MCTS.select_action(board, MCTS.apply_tau(visit_counts, tau=0)))
+        logger.info(f"game {game + 1}: student score {score} / {game + 1}")
+
+    # Expected score of the elo model, bounded so that a clean sweep doesn't diverge
+    expected_score = min(max(score / games, .5 / games), 1 - .5 / games)
+    return {
+        "games": games,
+        "student_score": score / games,
+        "elo_difference": -400 * math.log10(1 / expected_score - 1),
+        "teacher_simulations_per_second": simulations[0] / times[0],
+        "student_simulations_per_second": simulations[1] / times[1],
+    }
+
+def run_distillation() -> dict:
+    """
+    Distills the fast network for ``main.py --distill`` and reports its speed and strength against the teacher
+    """
+    teacher = CNN.load_nnet()
+    student = distill(teacher)
+    report = play_match(teacher, student)
+    logger.info(f"fast network vs full network: {report}")
+    return report
@@ -0,0 +1,167 @@
+from . import ModelConfig, LiteModelConfig
+from .nnet import CNN
+
+import tensorflow as tf
+
+import numpy as np
+import os
+from time import perf_counter
+
+from logging import getLogger
+logger = getLogger(__name__)
+
+class LiteModel:
+    """
+    The CNN exported to TensorFlow Lite, optionally quantized after training (see LiteModelConfig). \n
+    Predicts the same way as CNN (predict() for a single position, predict_batch() for many), so it can
+    replace the network in MCTS and NetworkEvaluator. The interpreter runs without keras, which makes
+    the small batches of MCTS a lot cheaper on CPUs.
+    """
+    def __init__(self, model_content: bytes, num_threads: int=LiteModelConfig.num_threads) -> None:
+        self.interpreter = tf.lite.Interpreter(model_content=model_content, num_threads=num_threads)
+        self.input_index = self.interpreter.get_input_details()[0]["index"]
+        # The outputs aren't ordered like the keras model's, the policy is the one with an entry per action
+        outputs = self.interpreter.get_output_details()
+        self.policy_index, self.value_index = (output["index"] for output in sorted(outputs, key=lambda output: -output["shape"][-1]))
+        self.batch_size = 0
+        self.resize(1)
+
+    def resize(self, batch_size: int) -> None:
+        self.interpreter.resize_tensor_input(self.input_index, [batch_size, *ModelConfig.input_shape])
+        self.interpreter.allocate_tensors()
+        self.batch_size = batch_size
+
+    def predict(self, inp):
+        return self.predict_batch(np.expand_dims(inp, axis=0))
+
+    def predict_batch(self, inputs):
+        """
+        :param inputs: array-like of bitboards with shape (n, *ModelConfig.input_shape)
+        :return: list of policies with shape (n, action space) and values with shape (n, 1)
+        """
+        inputs = np.asarray(inputs, dtype=np.float32)
+        if len(inputs) != self.batch_size:
+            self.resize(len(inputs))
+        self.interpreter.set_tensor(self.input_index, inputs)
+        self.interpreter.invoke()
+        return [self.interpreter.get_tensor(self.policy_index), self.interpreter.get_tensor(self.value_index)]
+
+    @staticmethod
+    def convert(nnet: CNN, quantization: str=LiteModelConfig.quantization, calibration_data: list=None) -> bytes:
+        """
+        :param quantization: "int8" quantizes weights and activations to 8-bit integers (inputs and outputs stay float),
+        "float16" halves the weights, None keeps float32
+        :param calibration_data: bitboards of positions the activation ranges of int8 quantization are calibrated with
+        :return: the model as flatbuffer
+        """
+        # The model's input is float16, a float32 signature keeps the interpreter's input the same for every quantization
+        @tf.function(input_signature=[tf.TensorSpec([None, *ModelConfig.input_shape], tf.float32)])
+        def serve(bitboards):
+            return nnet.model(tf.cast(bitboards, nnet.model.input.dtype), training=False)
+
+        converter = tf.lite.TFLiteConverter.from_concrete_functions([serve.get_concrete_function()], nnet.model)
+        if quantization == "int8":
+            assert calibration_data, "int8 quantization needs positions to calibrate with"
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+            converter.representative_dataset = lambda: ([np.asarray(bitboards, dtype=np.float32)[None]] for bitboards in calibration_data)
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        elif quantization == "float16":
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+            converter.target_spec.supported_types = [tf.float16]
+        return converter.convert()
+
+    @classmethod
+    def load(cls, quantization: str=LiteModelConfig.quantization):
+        """
+        :return: the exported model, None if there is none
+        """
+        filepath = LiteModelConfig.get_filepath(quantization)
+        if not os.path.isfile(filepath):
+            return None
+        with open(filepath, "rb") as f:
+            return cls(f.read())
+
+    @staticmethod
+    def get_exported_quantization():
+        """
+        :return: quantization of the most recently exported model, LiteModelConfig.quantization if none was exported
+        """
+        exported = [(os.path.getmtime(LiteModelConfig.get_filepath(quantization)), quantization)
+                    for quantization in LiteModelConfig.quantizations if os.path.isfile(LiteModelConfig.get_filepath(quantization))]
+        if not exported:
+            return LiteModelConfig.quantization
+        return max(exported, key=lambda export: export[0])[1]
+
+    @classmethod
+    def load_nnet(cls):
+        """
+        :return: the most recently exported model if LiteModelConfig.use_lite_model is set, None if it isn't
+        or the model is older than the current checkpoint
+        """
+        if not LiteModelConfig.use_lite_model:
+            return None
+        quantization = cls.get_exported_quantization()
+        filepath = LiteModelConfig.get_filepath(quantization)
+        checkpoint = os.path.join(ModelConfig.checkpoint_location, ModelConfig.new_model_checkpoint)
+        if not os.path.isfile(filepath) or (os.path.isfile(checkpoint) and os.path.getmtime(filepath) < os.path.getmtime(checkpoint)):
+            logger.warning(f"{filepath} is missing or older than the checkpoint, predicting with keras")
+            return None
+        return cls.load(quantization)
+
+    @staticmethod
+    def compare(nnet: CNN, lite_model, examples: list) -> dict:
+        """
+        Compares the exported model with the keras model on held-out training examples
+        :param examples: list of [s, pi, z] training examples
+        :return: hash map of the agreement of the models and their accuracy on the examples' outcomes
+        """
+        bitboards, _, outcomes = zip(*examples)
+        bitboards = np.asarray(bitboards, dtype=np.float32)
+        outcomes = np.asarray(outcomes, dtype=np.float32)
+        policies, values = nnet.predict_batch(bitboards)
+        lite_policies, lite_values = lite_model.predict_batch(bitboards)
+        policies, values, lite_policies, lite_values = (np.asarray(x, dtype=np.float64) for x in (policies, values, lite_policies, lite_values))
+        eps = 1e-9
+        kl_divergence = np.sum(policies * (np.log(policies + eps) - np.log(lite_policies + eps)), axis=1)
+
+        # Latency of single predictions, as made by MCTS
+        timings = []
+        for model in (nnet, lite_model):
+            t0 = perf_counter()
+            for position in bitboards[:100]:
+                model.predict(position)
+            timings.append((perf_counter() - t0) / min(len(bitboards), 100))
+        return {
+            "positions": len(bitboards),
+            "policy_top1_agreement": float(np.mean(policies.argmax(axis=1) == lite_policies.argmax(axis=1))),
+            "policy_kl_divergence": float(np.mean(kl_divergence)),
+            "value_mean_abs_diff": float(np.mean(np.abs(values[:, 0] - lite_values[:, 0]))),
+            "value_mean_abs_error": float(np.mean(np.abs(values[:, 0] - outcomes))),
+            "lite_value_mean_abs_error": float(np.mean(np.abs(lite_values[:, 0] - outcomes))),
+            "seconds_per_prediction": timings[0],
+            "lite_seconds_per_prediction": timings[1],
+        }
+
+def export_lite_model(quantization: str=LiteModelConfig.quantization, nnet: CNN=None) -> dict:
+    """
+    Exports the current checkpoint for ``main.py --export-lite`` to LiteModelConfig.get_filepath(quantization),
+    calibrated with and compared on the saved training examples
+    :return: the comparison (see LiteModel.compare()), empty without training examples
+    """
+    from .selfplay import Pipeline
+    nnet = nnet or CNN.load_nnet()
+    examples = Pipeline.load_training_data()
+    # The examples are shuffled when saved, so the first ones calibrate and the last ones are held out
+    held_out = examples[len(examples) - min(LiteModelConfig.held_out_samples, len(examples) // 2):]
+    calibration_data = [example[0] for example in examples[:min(LiteModelConfig.calibration_samples, len(examples) - len(held_out))]]
+    model_content = LiteModel.convert(nnet, quantization, calibration_data)
+
+    filepath = LiteModelConfig.get_filepath(quantization)
+    with open(filepath, "wb") as f:
+        f.write(model_content)
+    logger.info(f"exported {quantization or 'float32'} model to {filepath} ({len(model_content) / 2 ** 20:.1f} MB)")
+    if not held_out:
+        return {}
+    report = LiteModel.compare(nnet, LiteModel(model_content), held_out)
+    logger.info(f"comparison with the keras model: {report}")
+    return report
@@ -8,7 +8,11 @@ from keras.regularizers import l2
 
 
 class ModelArch:
-    
+    """
+    The AlphaZero model, sized by ``self.config`` (ModelConfig or a subclass like FastModelConfig)
+    """
+    config = ModelConfig
+
     def _conv_layer(self, input, num_filters: int, kernel_size: int, name:str=None, prefix: str=""):
         """
         builds a convolutional layer with given parameters. Applies BatchNorm and ReLu Activation.
@@ -22,7 +26,7 @@ class ModelArch:
             padding="same",
             data_format="channels_first", 
             use_bias=False, 
-            kernel_regularizer=l2(ModelConfig.l2_reg_const), 
+            kernel_regularizer=l2(self.config.l2_reg_const), 
             name=name)(input)
         x = BatchNormalization(axis=1, name=name+"_bn")(x)
         x = Activation("relu", name=name+"_relu")(x)
@@ -32,15 +36,15 @@ class ModelArch:
     def _residual_block(self, input, index: int):
         name = "res" + str(index)
 
-        x = self._conv_layer(input, ModelConfig.num_filters, ModelConfig.kernel_size, prefix=name)
+        x = self._conv_layer(input, self.config.num_filters, self.config.kernel_size, prefix=name)
 
         x = Conv2D(
-            filters=ModelConfig.num_filters, 
-            kernel_size=ModelConfig.kernel_size, 
+            filters=self.config.num_filters, 
+            kernel_size=self.config.kernel_size, 
             padding="same",
             data_format="channels_first", 
             use_bias=False, 
-            kernel_regularizer=l2(ModelConfig.l2_reg_const), 
+            kernel_regularizer=l2(self.config.l2_reg_const), 
             name=name+"_conv2")(x)
 
         x = BatchNormalization(axis=1, name="res"+str(index)+"_bn")(x)
@@ -56,12 +60,12 @@ class ModelArch:
         """
         x = self._conv_layer(input, 1, 1, name="value_conv")
         x = Flatten(name="value_flatten")(x)
-        x = Dense(ModelConfig.value_fc_layer_size, 
-            kernel_regularizer=l2(ModelConfig.l2_reg_const), 
+        x = Dense(self.config.value_fc_layer_size, 
+            kernel_regularizer=l2(self.config.l2_reg_const), 
             activation="relu", 
             name="value_dense")(x)
         x = Dense(1, 
-            kernel_regularizer=l2(ModelConfig.l2_reg_const), 
+            kernel_regularizer=l2(self.config.l2_reg_const), 
             activation="tanh", 
             name="value_out")(x)
         return x
@@ -69,8 +73,8 @@ class ModelArch:
     def _policy_head(self, input):
         x = self._conv_layer(input, 4, 1, name="policy_conv")
         x = Flatten(name="policy_flatten")(x)
-        x = Dense(ModelConfig.policy_output_size, 
-            kernel_regularizer=l2(ModelConfig.l2_reg_const), 
+        x = Dense(self.config.policy_output_size, 
+            kernel_regularizer=l2(self.config.l2_reg_const), 
             activation="softmax", 
             name="policy_out")(x)
         return x
@@ -79,10 +83,10 @@ class ModelArch:
         """
         builds the AlphaZero model
         """
-        in_x = Input(shape=ModelConfig.input_shape, name="input_layer", dtype=tf.float16)
-        x = self._conv_layer(in_x, ModelConfig.num_filters, ModelConfig.input_kernel_size, name="input_conv")
+        in_x = Input(shape=self.config.input_shape, name="input_layer", dtype=tf.float16)
+        x = self._conv_layer(in_x, self.config.num_filters, self.config.input_kernel_size, name="input_conv")
         # Residual Layers
-        for i in range(ModelConfig.num_res_layers):
+        for i in range(self.config.num_res_layers):
             x = self._residual_block(x, i+1)
         
         value_head = self._value_head(x)
@@ -14,7 +14,11 @@ from logging import getLogger
 logger = getLogger(__name__)
 
 class CNN(ModelArch):
-    def __init__(self):
+    def __init__(self, config=ModelConfig):
+        """
+        :param config: ModelConfig or a subclass like FastModelConfig, sizing the model and naming its checkpoints
+        """
+        self.config = config
         self._build()
         self.opt = SGD(learning_rate=TrainingConfig.initial_lr, momentum=TrainingConfig.momentum)
         self.model.compile(optimizer=self.opt, 
@@ -25,6 +29,14 @@ class CNN(ModelArch):
     def predict(self, inp):
         return self.model.predict(self.bitboard_to_input(inp), verbose=False)
 
+    def predict_batch(self, inputs):
+        """
+        Predicts many positions in a single call, which is much cheaper than a predict() per position
+        :param inputs: array-like of bitboards with shape (n, *ModelConfig.input_shape)
+        :return: list of policies with shape (n, action space) and values with shape (n, 1)
+        """
+        return self.model.predict_on_batch(np.asarray(inputs, dtype=np.float32))
+
     @staticmethod
     def bitboard_to_input(bitboards, axis=0):
         """
@@ -60,7 +72,7 @@ class CNN(ModelArch):
             y=y_train, 
             batch_size=TrainingConfig.batch_size, 
             epochs=TrainingConfig.epochs,
-            callbacks=[TrainingConfig.tensorboard_callback],
+            callbacks=[TrainingConfig.get_tensorboard_callback()],
             )
 
     def update_lr(self, iterations: int):
@@ -86,10 +98,12 @@ class CNN(ModelArch):
             logger.info("Done!")
         new_network.save_checkpoint()
 
-    def save_checkpoint(self, folder=ModelConfig.checkpoint_location, filename=ModelConfig.new_model_checkpoint):
+    def save_checkpoint(self, folder=ModelConfig.checkpoint_location, filename=None):
         """
         Saves checkpoint of current model
+        :param filename: defaults to the config's new_model_checkpoint
         """
+        filename = filename or self.config.new_model_checkpoint
         # change file type / extension
         if not filename.endswith(".h5"):
             filename = filename.split(".")
@@ -103,10 +117,12 @@ class CNN(ModelArch):
         logger.info("Saving checkpoint...")
         self.model.save_weights(filepath)
 
-    def load_checkpoint(self, folder=ModelConfig.checkpoint_location, filename=ModelConfig.new_model_checkpoint, save_model_if_no_file=True):
+    def load_checkpoint(self, folder=ModelConfig.checkpoint_location, filename=None, save_model_if_no_file=True):
         """
         Loads a checkpoint file and updates weights of current model
+        :param filename: defaults to the config's new_model_checkpoint
         """
+        filename = filename or self.config.new_model_checkpoint
         # change file type / extension
         if not filename.endswith(".h5"):
             filename = filename.split(".")
@@ -123,13 +139,15 @@ class CNN(ModelArch):
         logger.info("Done loading!")
 
     @staticmethod
-    def load_nnet(current_model=True):
+    def load_nnet(current_model=True, config=ModelConfig, save_model_if_no_file=True):
         """
         :return: The model from the checkpoint file specified in 
+        :param config: ModelConfig or a subclass like FastModelConfig
+        :param save_model_if_no_file: see load_checkpoint()
         """
-        nnet_filename = ModelConfig.new_model_checkpoint if current_model else ModelConfig.old_model_checkpoint
-        nnet = CNN()
-        nnet.load_checkpoint(filename=nnet_filename)
+        nnet_filename = config.new_model_checkpoint if current_model else config.old_model_checkpoint
+        nnet = CNN(config)
+        nnet.load_checkpoint(filename=nnet_filename, save_model_if_no_file=save_model_if_no_file)
         return nnet
 
     def visualize(self, filepath="assets/imgs/ML"):
@@ -1,8 +1,11 @@
 
 import os
 from manager import config
-from . import CNN, MCTS, PlayConfig, TrainingConfig
+from . import CNN, LiteModel, LiteModelConfig, MCTS, PlayConfig, TrainingConfig
+from .lite_model import export_lite_model
 from core.engine import Board, LegalMoveGenerator
+from core.engine.ai.opening_book import OpeningBook
+from core.engine.ai.config import BookConfig
 from core.utils import time_benchmark
 from random import shuffle
 
@@ -59,6 +62,9 @@ class Pipeline:
         training example is extended by the outcome z of that game from the sample's side's perspective.
 
         Final Form of each example: (s, π, z)
+
+        :return: tuple (training examples, game), the game as (fen, play_as_red, moves, winner) tuple
+        with the winner's color or None for a draw
         
         This function can be run in parallel (on multiple processes). In each process, it loads the
         tensorflow graph and starts a separate session.
@@ -69,12 +75,25 @@ class Pipeline:
 
         # Initialize the current tf graph for each process and start a separate session (defining the
         # session explicitly isn't required in tf 2.x thanks to eager execution)
-        nnet = CNN.load_nnet()
+        nnet = LiteModel.load_nnet() or CNN.load_nnet()
         mcts = MCTS(nnet)
+        opening_book = OpeningBook.get_default() if PlayConfig.use_opening_book else None
+        game = (self.board.load_fen_from_board(), not self.board.is_red_up, [], None)
 
         training_data = []
         plies, tau = 0, 1
         while True:
+            # Book moves are played without simulations and without adding training examples
+            book_move = opening_book.probe(self.board) if opening_book else None
+            if book_move:
+                self.board.make_move(book_move)
+                game[2].append(book_move)
+                plies += 1
+                # No search ran, so there's no subtree to keep
+                mcts = MCTS(nnet)
+                moves = LegalMoveGenerator.load_moves(self.board)
+                continue
+
             # Can use self.board because each process creates its own instance of the Pipeline class
             # each with its own memory allocated for board object
             bb = list(self.board.piecelist_to_bitboard())
@@ -99,6 +118,7 @@ class Pipeline:
             move = MCTS.select_action(self.board, pi)
 
             self.board.make_move(move)
+            game[2].append(move)
             plies += 1
 
             logger.info(f"{plies=} | {move=}")
@@ -110,8 +130,10 @@ class Pipeline:
             status = self.board.get_terminal_status(len(moves))
             if status == -1: continue
             logger.info("self-play episode ended")
+            # The side to move lost if it has no moves left, else the game ended in a draw
+            game = (*game[:3], None if moves else self.board.opponent_color)
             # negative outcome for every example where the side was current (mated) moving side
-            return [[ex[0], ex[1], 1 - 2 * ex[2] == self.board.moving_side] for ex in training_data]
+            return [[ex[0], ex[1], 1 - 2 * ex[2] == self.board.moving_side] for ex in training_data], game
 
     @staticmethod
     def batch(iterable, batch_size: int):
@@ -175,8 +197,9 @@ class Pipeline:
                 results = [future.result() for future in as_completed(futures)]
                 
                 
-            for res in results:
+            for res, game in results:
                 iteration_training_data.extend(res)
+            self.save_games([game for _, game in results])
 
             shuffle(iteration_training_data)
             self.save_training_data(iteration_training_data)
@@ -186,6 +209,9 @@ class Pipeline:
             if not is_first_iteration:
                 nnet = future.result()
                 CNN.update_checkpoint_versions(nnet)
+                # Self-play only uses the exported model if it's as new as the checkpoint, so the quantization in use is re-exported
+                if LiteModelConfig.use_lite_model:
+                    export_lite_model(LiteModel.get_exported_quantization(), nnet=nnet)
             
             if config.evaluate:
                 self.evaluator.evaluate_worker(is_first_iteration)
@@ -201,6 +227,28 @@ class Pipeline:
             Pickler(f).dump(training_data)
         logger.info("Done!")
 
+    @staticmethod
+    def save_games(games: list, folder=TrainingConfig.checkpoint_location, filename=PlayConfig.games_filename):
+        """
+        Appends the games to the ones saved before, they're used to build the opening book (see OpeningBook.build_from_games()).
+        Only the book's first BookConfig.max_plies moves of each game and the last PlayConfig.max_saved_games games are kept
+        :param games: list of (fen, play_as_red, moves, winner) tuples
+        """
+        games = [(fen, play_as_red, moves[:BookConfig.max_plies], winner) for fen, play_as_red, moves, winner in games]
+        games = (Pipeline.load_games(folder, filename) + games)[-PlayConfig.max_saved_games:]
+        if not os.path.exists(folder):
+            os.mkdir(folder)
+        with open(os.path.join(folder, filename), "wb+") as f:
+            Pickler(f).dump(games)
+
+    @staticmethod
+    def load_games(folder=TrainingConfig.checkpoint_location, filename=PlayConfig.games_filename):
+        filepath = os.path.join(folder, filename)
+        if not os.path.isfile(filepath):
+            return []
+        with open(filepath, "rb") as f:
+            return Unpickler(f).load()
+
     @staticmethod
     def load_training_data(folder=TrainingConfig.checkpoint_location, filename=PlayConfig.examples_filename):
         filepath = os.path.join(folder, filename)
@@ -0,0 +1,286 @@
+import os
+import numpy as np
+from array import array
+from core.engine import Board, Piece, Legality, MoveGenerator
+from core.engine.ai.config import TablebaseConfig
+from logging import getLogger
+logger = getLogger(__name__)
+
+# Squares each piece can ever stand on with red at the bottom, indexed by color and piece type
+RED_KING_SQUARES = [66, 67, 68, 75, 76, 77, 84, 85, 86]
+RED_ADVISOR_SQUARES = [66, 68, 76, 84, 86]
+RED_ELEPHANT_SQUARES = [47, 51, 63, 67, 71, 83, 87]
+# Behind the river (ranks 5 and 6) only on the files they start on, anywhere once they crossed it
+RED_PAWN_SQUARES = list(range(45)) + [45, 47, 49, 51, 53, 54, 56, 58, 60, 62]
+RED_SQUARES = [RED_KING_SQUARES, RED_ELEPHANT_SQUARES, RED_ADVISOR_SQUARES, list(range(90)),
+               RED_PAWN_SQUARES, list(range(90)), list(range(90))]
+PIECE_SQUARES = [
+    [sorted(89 - square for square in squares) for squares in RED_SQUARES],
+    RED_SQUARES,
+]
+
+class Tablebase:
+    """
+    Exact values of every position of one material configuration, found by retrograde analysis. \n
+    The configuration is named by the letters of the red pieces and of the black pieces, e.g. "KR_KAA"
+    for king and rook against king and two advisors, each side ordered by piece type (Piece.king ... Piece.horse).
+    Positions are indexed by the square of every piece (only the squares it can reach) and the side to move,
+    seen with red at the bottom. \n
+    Values are stored as int16 from the perspective of the side to move: 0 for draws, plies to mate + 1 if it wins
+    and -(plies to mate + 1) if it loses, e.g. -1 if it's mated already.
+    Repetition rules and Board.max_plies aren't taken into account.
+    """
+    def __init__(self, name: str, values: np.ndarray=None) -> None:
+        self.name = name
+        red, black = name.split("_")
+        self.slots = [(Piece.red, Piece.letters.index(letter.lower())) for letter in red]
+        self.slots += [(Piece.black, Piece.letters.index(letter.lower())) for letter in black]
+        self.num_red = len(red)
+        self.slot_squares = [PIECE_SQUARES[color][piece_type] for color, piece_type in self.slots]
+        # Index of every square in the slot's list of squares, -1 if the piece can't stand on it
+        self.square_indices = []
+        for squares in self.slot_squares:
+            square_index = [-1] * 90
+            for i, square in enumerate(squares):
+                square_index[square] = i
+            self.square_indices.append(square_index)
+        self.size = 2
+        for squares in self.slot_squares:
+            self.size *= len(squares)
+        self.values = values
+
+    @property
+    def num_pieces(self) -> int:
+        return len(self.slots)
+
+    def get_index(self, squares: list, moving_color: int) -> int:
+        """
+        :param squares: square of the piece of every slot
+        """
+        index = 0
+        for square, square_index, slot_squares in zip(squares, self.square_indices, self.slot_squares):
+            index = index * len(slot_squares) + square_index[square]
+        return index * 2 + moving_color
+
+    def get_position(self, index: int):
+        """
+        :return: tuple (square of every slot, moving color)
+        """
+        index, moving_color = divmod(index, 2)
+        squares = []
+        for slot_squares in reversed(self.slot_squares):
+            index, square_index = divmod(index, len(slot_squares))
+            squares.append(slot_squares[square_index])
+        return squares[::-1], moving_color
+
+    def get_sub_name(self, slot: int) -> str:
+        """
+        :return: name of the configuration left after the piece of the slot is captured
+        """
+        letters = [Piece.letters[piece_type].upper() for _, piece_type in self.slots]
+        del letters[slot]
+        num_red = self.num_red - (slot < self.num_red)
+        return "".join(letters[:num_red]) + "_" + "".join(letters[num_red:])
+
+    def probe(self, squares: list, moving_color: int) -> int:
+        return int(self.values[self.get_index(squares, moving_color)])
+
+    @classmethod
+    def generate(cls, name: str, sub_tables: dict):
+        """
+        Retrograde analysis: every position's legal moves are generated once (MoveGenerator) to link it to its
+        successors, which turned around are the reverse moves. Starting from the mated positions, values are then
+        propagated backwards, ply by ply: a predecessor of a lost position is won, a position whose successors are
+        all won is lost. Captures lead into the sub_tables. What's left unresolved is a draw
+        :param sub_tables: hash map of the names of all configurations reachable by a capture and their tables
+        """
+        table = cls(name)
+        size = table.size
+        values = np.zeros(size, dtype=np.int16)
+        # Non-capture successors not resolved yet
+        remaining = np.zeros(size, dtype=np.int32)
+        # Longest distance to mate if all successors turn out to be won by the opponent
+        max_loss = np.zeros(size, dtype=np.int32)
+        can_lose = np.ones(size, dtype=bool)
+        edge_parents, edge_children = array("q"), array("q")
+        # Hash map of plies to mate and the positions found to be won (True) or lost (False) in that many plies
+        buckets = {}
+
+        board = Board("9/9/9/9/9/9/9/9/9/9 w - - 0 1")
+        move_generator = MoveGenerator()
+        placed = [None] * table.num_pieces
+        for index in range(size):
+            squares, moving_color = table.get_position(index)
+            if len(set(squares)) < len(squares):
+                continue
+            # Only the pieces that changed squares are moved, mostly the last one
+            for slot, square in enumerate(placed):
+                if square is not None and square != squares[slot]:
+                    board.remove_piece(square)
+            for slot, square in enumerate(squares):
+                if square != placed[slot]:
+                    board.put_piece(square, *table.slots[slot])
+            placed = squares
+            board.set_moving_color(moving_color)
+            # The side that just moved can't be left in check
+            if Legality.is_in_check(board, 1 - moving_color):
+                continue
+            moves = move_generator.load_moves(board)
+            if not moves:
+                buckets.setdefault(0, []).append((index, False))
+                continue
+            slot_of = {square: slot for slot, square in enumerate(squares)}
+            for moved_from, moved_to in moves:
+                child_squares = squares[:]
+                child_squares[slot_of[moved_from]] = moved_to
+                captured_slot = slot_of.get(moved_to)
+                if captured_slot is None:
+                    edge_parents.append(index)
+                    edge_children.append(table.get_index(child_squares, 1 - moving_color))
+                    remaining[index] += 1
+                    continue
+                del child_squares[captured_slot]
+                value = sub_tables[table.get_sub_name(captured_slot)].probe(child_squares, 1 - moving_color)
+                if value < 0:
+                    buckets.setdefault(-value, []).append((index, True))
+                    can_lose[index] = False
+                elif value > 0:
+                    max_loss[index] = max(max_loss[index], value)
+                else:
+                    can_lose[index] = False
+            if not remaining[index] and can_lose[index]:
+                buckets.setdefault(int(max_loss[index]), []).append((index, False))
+
+        # Reverse moves: the parents of every position, grouped by child
+        edge_parents, edge_children = np.frombuffer(edge_parents, dtype=np.int64), np.frombuffer(edge_children, dtype=np.int64)
+        order = np.argsort(edge_children, kind="stable")
+        parents = edge_parents[order].tolist()
+        starts = np.searchsorted(edge_children[order], np.arange(size + 1)).tolist()
+
+        plies = 0
+        while buckets:
+            for index, is_win in buckets.pop(plies, []):
+                if values[index]:
+                    continue
+                values[index] = plies + 1 if is_win else -plies - 1
+                for parent in parents[starts[index]:starts[index + 1]]:
+                    if values[parent]:
+                        continue
+                    if not is_win:
+                        buckets.setdefault(plies + 1, []).append((parent, True))
+                        can_lose[parent] = False
+                        continue
+                    remaining[parent] -= 1
+                    max_loss[parent] = max(max_loss[parent], plies + 1)
+                    if not remaining[parent] and can_lose[parent]:
+                        buckets.setdefault(int(max_loss[parent]), []).append((parent, False))
+            plies += 1
+        table.values = values
+        return table
+
+
+class Tablebases:
+    """
+    The tablebases loaded from TablebaseConfig.folder (memory-mapped), probed by Dfs and MCTS
+    to cut off the search below positions with few pieces
+    """
+    tables = {}
+    # Most pieces of a loaded configuration, positions with more pieces aren't probed
+    max_pieces = 0
+    is_loaded = False
+
+    @classmethod
+    def load(cls, folder: str=None) -> None:
+        """
+        Loads all tablebases of the folder (TablebaseConfig.folder by default), only once
+        """
+        if cls.is_loaded:
+            return
+        cls.is_loaded = True
+        folder = folder or TablebaseConfig.folder
+        if not TablebaseConfig.use_tablebases or not os.path.isdir(folder):
+            return
+        for filename in sorted(os.listdir(folder)):
+            name, extension = os.path.splitext(filename)
+            if extension == ".npy":
+                cls.add(Tablebase(name, np.load(os.path.join(folder, filename), mmap_mode="r")))
+        logger.info(f"loaded tablebases {', '.join(cls.tables)}")
+
+    @classmethod
+    def add(cls, table: Tablebase) -> None:
+        cls.tables[table.name] = table
+        cls.max_pieces = max(cls.max_pieces, table.num_pieces)
+
+    @staticmethod
+    def get_material(board: Board, color: int) -> tuple:
+        """
+        :return: tuple (letters, squares seen with red at the bottom) of the color's pieces, ordered by piece type
+        """
+        letters, squares = "", []
+        for piece_type, piece_list in enumerate(board.piece_lists[color]):
+            letters += Piece.letters[piece_type].upper() * len(piece_list)
+            squares += [89 - square for square in piece_list] if board.is_red_up else piece_list
+        return letters, squares
+
+    @classmethod
+    def probe(cls, board: Board):
+        """
+        :return: value of the position for the side to move (see Tablebase), None if there's no tablebase for it
+        """
+        if (board.color_bitboards[0] | board.color_bitboards[1]).bit_count() > cls.max_pieces:
+            return None
+        red, red_squares = cls.get_material(board, Piece.red)
+        black, black_squares = cls.get_material(board, Piece.black)
+        table = cls.tables.get(f"{red}_{black}")
+        if table:
+            return table.probe(red_squares + black_squares, board.moving_color)
+        # The same configuration with colors swapped: the board is turned around
+        table = cls.tables.get(f"{black}_{red}")
+        if table:
+            return table.probe([89 - square for square in black_squares + red_squares], 1 - board.moving_color)
+        return None
+
+    @classmethod
+    def probe_wdl(cls, board: Board):
+        """
+        :return: 1 if the side to move wins, -1 if it loses, 0 for a draw, None if there's no tablebase for it
+        """
+        value = cls.probe(board)
+        return None if value is None else (value > 0) - (value < 0)
+
+    @classmethod
+    def build(cls, name: str, folder: str=None) -> Tablebase:
+        """
+        Generates the tablebase and all tablebases reachable by captures, unless they're saved already,
+        and saves them to the folder (TablebaseConfig.folder by default)
+        """
+        folder = folder or TablebaseConfig.folder
+        filepath = os.path.join(folder, name + ".npy")
+        if os.path.isfile(filepath):
+            table = Tablebase(name, np.load(filepath, mmap_mode="r"))
+            cls.add(table)
+            return table
+        table = Tablebase(name)
+        sub_tables = {}
+        for slot, (_, piece_type) in enumerate(table.slots):
+            if piece_type != Piece.king:
+                sub_name = table.get_sub_name(slot)
+                sub_tables[sub_name] = sub_tables.get(sub_name) or cls.build(sub_name, folder)
+        logger.info(f"generating tablebase {name} ({table.size} positions)")
+        table = Tablebase.generate(name, sub_tables)
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        np.save(filepath, table.values)
+        cls.add(table)
+        return table
+
+def build_tablebases(materials: list=None) -> None:
+    """
+    Builds the tablebases for ``main.py --build-tablebases``
+    :param materials: names of the configurations, TablebaseConfig.materials by default
+    """
+    for name in materials or TablebaseConfig.materials:
+        table = Tablebases.build(name)
+        values = np.asarray(table.values)
+        logger.info(f"{name}: {np.count_nonzero(values > 0)} won, {np.count_nonzero(values < 0)} lost, "
+                    f"longest mate {int(np.abs(values).max()) - 1} plies")
@@ -0,0 +1,123 @@
+from core.engine.piece import Piece
+from core.engine.board import Board
+from core.engine.precomputed_move_data import PrecomputingMoves
+
+class Bitboard:
+    """
+    Attack generation on 90-bit integers, bit i standing for square i (rank * 9 + file), using the
+    piece and color bitboards kept by the board. All pieces of a set are handled at once by shifting
+    the whole set: 9 bits moves it one rank, 1 bit one file, masking out the squares wrapped around the edges. \n
+    Sides are indexed like in PrecomputingMoves, 0 for the top and 1 for the bottom side.
+    """
+    board_mask = (1 << 90) - 1
+    files = [sum(1 << rank * 9 + file for rank in range(10)) for file in range(9)]
+    ranks = [0b111111111 << rank * 9 for rank in range(10)]
+    # Squares that can't be reached by moving one file to the right or left respectively
+    not_file_0 = board_mask ^ files[0]
+    not_file_8 = board_mask ^ files[8]
+    palaces = [sum(1 << rank * 9 + file for rank in ranks_ for file in range(3, 6)) for ranks_ in (range(3), range(7, 10))]
+    halves = [sum(ranks[:5]), sum(ranks[5:])]
+
+    @staticmethod
+    def get_squares(bitboard: int) -> list:
+        """
+        :return: list of the squares set in the bitboard in ascending order
+        """
+        squares = []
+        while bitboard:
+            lowest_bit = bitboard & -bitboard
+            squares.append(lowest_bit.bit_length() - 1)
+            bitboard ^= lowest_bit
+        return squares
+
+    @classmethod
+    def horse_attacks(cls, horses: int, occupied: int) -> int:
+        """
+        :return: bitboard of the squares attacked by the horses, a horse jump being blocked if its leg,
+        the square orthogonally next to the horse, is occupied
+        """
+        legs = horses >> 9 & ~occupied
+        attacks = legs >> 10 & cls.not_file_8 | legs >> 8 & cls.not_file_0
+        legs = horses << 9 & cls.board_mask & ~occupied
+        attacks |= (legs << 8 & cls.not_file_8 | legs << 10 & cls.not_file_0) & cls.board_mask
+        legs = horses << 1 & cls.not_file_0 & ~occupied
+        attacks |= (legs >> 8 | legs << 10 & cls.board_mask) & cls.not_file_0
+        legs = horses >> 1 & cls.not_file_8 & ~occupied
+        attacks |= (legs >> 10 | legs << 8 & cls.board_mask) & cls.not_file_8
+        return attacks
+
+    @classmethod
+    def elephant_attacks(cls, elephants: int, occupied: int, side: int) -> int:
+        """
+        :return: bitboard of the squares attacked by the elephants, which can't cross the river
+        and are blocked if their eye, the square diagonally next to them, is occupied
+        """
+        eyes = elephants >> 8 & cls.not_file_0 & ~occupied
+        attacks = eyes >> 8 & cls.not_file_0
+        eyes = elephants >> 10 & cls.not_file_8 & ~occupied
+        attacks |= eyes >> 10 & cls.not_file_8
+        eyes = elephants << 10 & cls.not_file_0 & ~occupied
+        attacks |= eyes << 10 & cls.not_file_0
+        eyes = elephants << 8 & cls.not_file_8 & ~occupied
+        attacks |= eyes << 8 & cls.not_file_8
+        return attacks & cls.halves[side]
+
+    @classmethod
+    def advisor_attacks(cls, advisors: int, side: int) -> int:
+        """
+        :return: bitboard of the squares attacked by the advisors, moving diagonally within the palace
+        """
+        attacks = (advisors >> 8 | advisors << 10) & cls.not_file_0 | (advisors >> 10 | advisors << 8) & cls.not_file_8
+        return attacks & cls.palaces[side]
+
+    @classmethod
+    def king_attacks(cls, kings: int, side: int) -> int:
+        """
+        :return: bitboard of the squares attacked by the kings, moving orthogonally within the palace
+        """
+        attacks = kings >> 9 | kings << 9 | kings << 1 & cls.not_file_0 | kings >> 1 & cls.not_file_8
+        return attacks & cls.palaces[side]
+
+    @classmethod
+    def pawn_attacks(cls, pawns: int, side: int) -> int:
+        """
+        :return: bitboard of the squares attacked by the pawns, moving forward and,
+        once they crossed the river, sideways
+        """
+        # The bottom side moves towards rank 0
+        attacks = pawns >> 9 if side else pawns << 9 & cls.board_mask
+        crossed_river = pawns & cls.halves[1 - side]
+        attacks |= crossed_river << 1 & cls.not_file_0 | crossed_river >> 1 & cls.not_file_8
+        return attacks
+
+    @classmethod
+    def is_attacked(cls, board: Board, square: int, color: int) -> bool:
+        """
+        :param color: color of the attacking pieces
+        :return: bool if any piece of the given color attacks the square, kings only attacking along files
+        (flying general). NOTE: pins aren't taken into account, the attacking piece may be pinned itself
+        """
+        pieces = board.piece_bitboards[color]
+        side = board.moving_side if color == board.moving_color else board.opponent_side
+        occupied = board.color_bitboards[0] | board.color_bitboards[1]
+        square_bit = 1 << square
+        if cls.horse_attacks(pieces[Piece.horse], occupied) & square_bit:
+            return True
+        if cls.pawn_attacks(pieces[Piece.pawn], side) & square_bit:
+            return True
+        # Going outwards from the square along its file and rank
+        file, rank = square % 9, square // 9
+        file_slides = PrecomputingMoves.file_slides[rank][board.file_occupancy[file] | 1 << rank]
+        rank_slides = PrecomputingMoves.rank_slides[file][board.rank_occupancy[rank] | 1 << file]
+        for dir_idx, _, first_offset, second_offset in file_slides + rank_slides:
+            if first_offset is None:
+                continue
+            first_piece = board.squares[square + first_offset]
+            if Piece.is_piece(first_piece, color, Piece.rook):
+                return True
+            # Kings can only face each other on a file
+            if not dir_idx % 2 and Piece.is_piece(first_piece, color, Piece.king):
+                return True
+            if second_offset is not None and Piece.is_piece(board.squares[square + second_offset], color, Piece.cannon):
+                return True
+        return False
@@ -2,6 +2,7 @@ from core.engine.piece import Piece
 from core.engine.zobrist_hashing import ZobristHashing
 import numpy as np
 from collections import deque
+from copy import deepcopy
 from logging import getLogger
 logger = getLogger(__name__)
 
@@ -22,6 +23,13 @@ class Board:
         # which color moves first - boolean "is_red_first" or "is_red" can be used interchangeably 
         # with int "color_to_start" or "color" because the colors are represented as ints in [0, 1]
         self.fullmoves, self.plies = 0, 0
+        # Occupancy masks of every rank (bit i set if file i is occupied) and file (bit i set if rank i is occupied)
+        self.rank_occupancy = [0] * 10
+        self.file_occupancy = [0] * 9
+        # 90-bit integers with bit i set if square i is occupied by the color's (piece type's) pieces, 
+        # used for attack generation (see Bitboard). Unlike self.bitboards, they're kept up to date
+        self.piece_bitboards = [[0] * 7 for _ in range(2)]
+        self.color_bitboards = [0, 0]
         # basic setup
         is_red_first = self.load_board_from_fen(FEN)
         # Bitboards 2x7x10x9 (each side, number of pieces, board dims)
@@ -42,8 +50,14 @@ class Board:
         # so multiple moves can be reversed consecutively, coming in really handy in dfs
         self.game_history = deque() # Stack(:previous square, :target square :captured piece)
         # DON'T EVER DO THIS IT TOOK ME AN HOUR TO FIX: self.piece_list = [[set()] * 7] * 2 
-        self.zobrist_key = ZobristHashing.digest(self.moving_side, self.piece_lists)
+        self.zobrist_key = ZobristHashing.digest(self.moving_color, self.piece_lists)
         self.repetition_history = {self.zobrist_key: 1}
+        # Zobrist keys of all previous positions, aligned with game_history (null moves included)
+        self.key_history = []
+        # Number of plies since the last capture, forward pawn move or null move. None of them can be reversed,
+        # so repetitions are only searched for within these plies
+        self.reversible_plies = 0
+        self.reversible_plies_history = deque()
 
     @staticmethod
     def get_file_and_rank(square: int):
@@ -91,6 +105,10 @@ class Board:
                 self.piece_lists[color][piece_type].append(rank * 9 + file)
                 # self.squares[rank * 9 + file] = (is_red + 1) * 8 + piece_type
                 self.squares[rank * 9 + file] = (color, piece_type)
+                self.rank_occupancy[rank] |= 1 << file
+                self.file_occupancy[file] |= 1 << rank
+                self.piece_bitboards[color][piece_type] |= 1 << rank * 9 + file
+                self.color_bitboards[color] |= 1 << rank * 9 + file
                 file += 1
             if char.isdigit():
                 file += int(char)
@@ -113,8 +131,9 @@ class Board:
                 letter = Piece.letters[color * 7 + piece_type]
                 config += letter
             file, rank = self.get_file_and_rank(i)
-            if empty_files_in_rank == 9:
-                config += "9"
+            # Empty squares at the end of a rank
+            if file == 8 and empty_files_in_rank:
+                config += str(empty_files_in_rank)
                 empty_files_in_rank = 0
             if rank < 9 and file == 8:
                 config += "/"
@@ -123,6 +142,44 @@ class Board:
         fen = " ".join([config, color, "- -", str(self.plies), str(self.fullmoves)])
         return fen
 
+    def copy(self):
+        """
+        :return: an independent copy of the board including its history, 
+        e.g. to search it on another thread while this one keeps changing
+        """
+        return deepcopy(self)
+
+    def put_piece(self, square: int, color: int, piece_type: int) -> None:
+        """
+        Places a piece on an empty square outside of the game, e.g. to set up positions without parsing a FEN.
+        Doesn't touch the game history
+        """
+        self.squares[square] = (color, piece_type)
+        self.piece_lists[color][piece_type].append(square)
+        self.piece_bitboards[color][piece_type] |= 1 << square
+        self.color_bitboards[color] |= 1 << square
+        self.rank_occupancy[square // 9] |= 1 << square % 9
+        self.file_occupancy[square % 9] |= 1 << square // 9
+        self.zobrist_key ^= ZobristHashing.table[color][piece_type][square]
+
+    def remove_piece(self, square: int) -> None:
+        """
+        Counterpart of put_piece()
+        """
+        color, piece_type = self.squares[square]
+        self.squares[square] = 0
+        self.piece_lists[color][piece_type].remove(square)
+        self.piece_bitboards[color][piece_type] ^= 1 << square
+        self.color_bitboards[color] ^= 1 << square
+        self.rank_occupancy[square // 9] ^= 1 << square % 9
+        self.file_occupancy[square % 9] ^= 1 << square // 9
+        self.zobrist_key ^= ZobristHashing.table[color][piece_type][square]
+
+    def set_moving_color(self, color: int) -> None:
+        if color != self.moving_color:
+            self.switch_moving_color()
+            self.zobrist_key ^= ZobristHashing.side_key
+
     def get_piece_list(self, color: int, piece_type: int):
         return self.piece_lists[color][piece_type - 1]
     
@@ -175,11 +232,11 @@ class Board:
         """
         if captured_piece:
             cap_piece_type = Piece.get_type(captured_piece)
-            self.zobrist_key ^= ZobristHashing.table[self.opponent_side][cap_piece_type][moved_to]
-        self.zobrist_key ^= ZobristHashing.table[self.moving_side][moved_piece_type][moved_from]
-        self.zobrist_key ^= ZobristHashing.table[self.moving_side][moved_piece_type][moved_to]
-        self.zobrist_key ^= self.opponent_side
-        self.zobrist_key ^= self.moving_side
+            self.zobrist_key ^= ZobristHashing.table[self.opponent_color][cap_piece_type][moved_to]
+        self.zobrist_key ^= ZobristHashing.table[self.moving_color][moved_piece_type][moved_from]
+        self.zobrist_key ^= ZobristHashing.table[self.moving_color][moved_piece_type][moved_to]
+        # Called in between switching colors, so the side to move changes either way
+        self.zobrist_key ^= ZobristHashing.side_key
 
     @staticmethod
     def flip_move(move):
@@ -229,7 +286,21 @@ class Board:
         return (mirrored_start, mirrored_target)
 
     def is_repetition(self):
-        return self.zobrist_key in self.repetition_history
+        return bool(self.get_repetition_distance())
+
+    def get_repetition_distance(self) -> int:
+        """
+        Compares the zobrist key to the keys of the positions since the last irreversible move,
+        only those with the same side to move
+        :return: number of plies since the current position occurred last, 0 if it didn't
+        """
+        key_history = self.key_history
+        zobrist_key = self.zobrist_key
+        # A position can't repeat within less than 4 plies
+        for distance in range(4, self.reversible_plies + 1, 2):
+            if key_history[-distance] == zobrist_key:
+                return distance
+        return 0
     
     def make_move(self, move: tuple, search_state=False):
         moved_from, moved_to = move
@@ -239,13 +310,23 @@ class Board:
         self.piece_lists[self.moving_color][piece_type].remove(moved_from)
         self.piece_lists[self.moving_color][piece_type].append(moved_to)
         
+        move_bits = 1 << moved_from | 1 << moved_to
+        self.piece_bitboards[self.moving_color][piece_type] ^= move_bits
+        self.color_bitboards[self.moving_color] ^= move_bits
+        
         captured_piece = self.squares[moved_to]
         if captured_piece:
             captured_type = Piece.get_type_no_check(captured_piece)
             self.piece_lists[self.opponent_color][captured_type].remove(moved_to)
+            self.piece_bitboards[self.opponent_color][captured_type] ^= 1 << moved_to
+            self.color_bitboards[self.opponent_color] ^= 1 << moved_to
 
         if self.moving_color == Piece.black:
             self.fullmoves += 1
+        self.reversible_plies_history.append(self.reversible_plies)
+        # Pawns can't move back, but once across the river their sideways moves can be undone
+        is_pawn_advance = piece_type == Piece.pawn and moved_from // 9 != moved_to // 9
+        self.reversible_plies = 0 if captured_piece or is_pawn_advance else self.reversible_plies + 1
         if piece_type == Piece.pawn:
             self.plies_history.append(self.plies)
             self.plies = 0
@@ -254,9 +335,15 @@ class Board:
         # Adding current game state to history
         current_game_state = (*move, captured_piece)
         self.game_history.append(current_game_state)
+        self.key_history.append(self.zobrist_key)
         # Updating the board
         self.squares[moved_to] = moved_piece
         self.squares[moved_from] = 0
+        self.rank_occupancy[moved_from // 9] ^= 1 << moved_from % 9
+        self.file_occupancy[moved_from % 9] ^= 1 << moved_from // 9
+        if not captured_piece:
+            self.rank_occupancy[moved_to // 9] ^= 1 << moved_to % 9
+            self.file_occupancy[moved_to % 9] ^= 1 << moved_to // 9
 
         # Update zobrist key
         self.lazo_update(piece_type, captured_piece, *move)
@@ -273,6 +360,8 @@ class Board:
     def reverse_move(self, search_state=False):
         # Accessing the previous game state data
         previous_square, moved_to, captured_piece = self.game_history.pop()
+        self.key_history.pop()
+        self.reversible_plies = self.reversible_plies_history.pop()
 
         moved_piece = self.squares[moved_to]
         piece_type = Piece.get_type_no_check(moved_piece)
@@ -281,12 +370,23 @@ class Board:
         self.piece_lists[self.opponent_color][piece_type].remove(moved_to)  
         self.piece_lists[self.opponent_color][piece_type].append(previous_square)
 
+        move_bits = 1 << previous_square | 1 << moved_to
+        self.piece_bitboards[self.opponent_color][piece_type] ^= move_bits
+        self.color_bitboards[self.opponent_color] ^= move_bits
+
         if captured_piece:
             captured_type = Piece.get_type_no_check(captured_piece)
             self.piece_lists[self.moving_color][captured_type].append(moved_to)
+            self.piece_bitboards[self.moving_color][captured_type] ^= 1 << moved_to
+            self.color_bitboards[self.moving_color] ^= 1 << moved_to
 
         self.squares[previous_square] = moved_piece
         self.squares[moved_to] = captured_piece
+        self.rank_occupancy[previous_square // 9] ^= 1 << previous_square % 9
+        self.file_occupancy[previous_square % 9] ^= 1 << previous_square // 9
+        if not captured_piece:
+            self.rank_occupancy[moved_to // 9] ^= 1 << moved_to % 9
+            self.file_occupancy[moved_to % 9] ^= 1 << moved_to // 9
 
         # Switch back to previous moving color
         self.switch_moving_color()
@@ -305,6 +405,26 @@ class Board:
         #     return 
         # print(self.zobrist_key)
 
+    def make_null_move(self):
+        """
+        Passes the turn to the opponent without moving any piece. Used for null move pruning.
+        """
+        # None keeps game_history aligned with key_history, as every ply has an entry in both
+        self.game_history.append(None)
+        self.key_history.append(self.zobrist_key)
+        # Positions before and after a null move aren't repetitions of each other
+        self.reversible_plies_history.append(self.reversible_plies)
+        self.reversible_plies = 0
+        self.switch_moving_color()
+        self.zobrist_key ^= ZobristHashing.side_key
+
+    def reverse_null_move(self):
+        self.game_history.pop()
+        self.key_history.pop()
+        self.reversible_plies = self.reversible_plies_history.pop()
+        self.switch_moving_color()
+        self.zobrist_key ^= ZobristHashing.side_key
+
     def get_previous_configs(self, depth: int):
         depth = min(len(self.game_history), depth)
         print(f"depth: {depth}")
@@ -55,6 +55,7 @@ class UIConfig:
     TIMER_TEXT_X = OFFSET_X + UNIT * 9.5
     TIMER_TEXT_Y = [HEIGHT / 2 - FONT_SIZE_LARGE, HEIGHT / 2]
     MOVE_STR_POS = (WIDTH // 20) * 2
+    THINKING_TEXT_POS = (TIMER_TEXT_X, HEIGHT / 2 + FONT_SIZE_LARGE * 2)
     
     # SFX
     MOVE_SFX = pygame.mixer.Sound("assets/sfx/move.wav")
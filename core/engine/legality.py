@@ -0,0 +1,125 @@
+from core.engine.piece import Piece
+from core.engine.board import Board
+from core.engine.precomputed_move_data import PrecomputingMoves
+from core.engine.bitboard import Bitboard
+
+class Legality:
+    """
+    Answers single questions about a position, like whether the moving side is in check or whether one
+    move is legal, by testing attacks on the king directly instead of generating all legal moves. \n
+    Pseudo-legal moves are made on the board and taken back again, so the board must not be used concurrently.
+    """
+
+    @staticmethod
+    def is_in_check(board: Board, color: int=None) -> bool:
+        """
+        :param color: color of the king to test, defaults to the moving color
+        :return: bool if the king of the given color is attacked, which includes facing the opponent king
+        """
+        color = board.moving_color if color is None else color
+        king_square = board.piece_lists[color][Piece.king][0]
+        return Bitboard.is_attacked(board, king_square, 1 - color)
+
+    @staticmethod
+    def reaches(board: Board, square: int, target_square: int) -> bool:
+        """
+        :return: bool if the piece on square can move to target_square disregarding checks and pins,
+        the target being either empty or occupied by an opponent piece
+        """
+        piece = board.squares[square]
+        target_piece = board.squares[target_square]
+        if not piece:
+            return False
+        color = Piece.get_color_no_check(piece)
+        if Piece.is_color(target_piece, color):
+            return False
+        side = board.moving_side if color == board.moving_color else board.opponent_side
+        piece_type = Piece.get_type_no_check(piece)
+        target_bit = 1 << target_square
+        if piece_type in (Piece.rook, Piece.cannon):
+            file, rank = square % 9, square // 9
+            for dir_idx, empty_offsets, first_offset, second_offset in (
+                    PrecomputingMoves.file_slides[rank][board.file_occupancy[file]]
+                    + PrecomputingMoves.rank_slides[file][board.rank_occupancy[rank]]):
+                capture_offset = first_offset if piece_type == Piece.rook else second_offset
+                if target_square - square in empty_offsets or target_square - square == capture_offset:
+                    return True
+            return False
+
+        match piece_type:
+            case Piece.king:
+                attacks = Bitboard.king_attacks(1 << square, side)
+            case Piece.advisor:
+                attacks = Bitboard.advisor_attacks(1 << square, side)
+            case Piece.elephant:
+                occupied = board.color_bitboards[0] | board.color_bitboards[1]
+                attacks = Bitboard.elephant_attacks(1 << square, occupied, side)
+            case Piece.horse:
+                occupied = board.color_bitboards[0] | board.color_bitboards[1]
+                attacks = Bitboard.horse_attacks(1 << square, occupied)
+            case _:
+                attacks = Bitboard.pawn_attacks(1 << square, side)
+        return bool(attacks & target_bit)
+
+    @classmethod
+    def is_legal(cls, board: Board, move: tuple) -> bool:
+        """
+        :param move: tuple (from square, to square)
+        :return: bool if the move is legal for the moving side in the current position
+        """
+        moved_from, moved_to = move
+        if not (0 <= moved_from < 90 and 0 <= moved_to < 90):
+            return False
+        if not Piece.is_color(board.squares[moved_from], board.moving_color):
+            return False
+        if not cls.reaches(board, moved_from, moved_to):
+            return False
+        board.make_move(move, search_state=True)
+        # The side that just moved mustn't have left its own king attacked
+        in_check = cls.is_in_check(board, board.opponent_color)
+        board.reverse_move(search_state=True)
+        return not in_check
+
+    @classmethod
+    def get_legal_targets(cls, board: Board, square: int) -> list:
+        """
+        :return: list of the squares the piece on square can legally move to
+        """
+        if not Piece.is_color(board.squares[square], board.moving_color):
+            return []
+        return [target_square for target_square in PrecomputingMoves.get_targets_for(square, board)
+                if cls.is_legal(board, (square, target_square))]
+
+    @classmethod
+    def has_legal_move(cls, board: Board) -> bool:
+        """
+        :return: bool if the moving side has any legal move, stopping at the first one found.
+        In Xiangqi the side without legal moves loses, whether it's in check or not
+        """
+        for piece_list in board.piece_lists[board.moving_color]:
+            for square in list(piece_list):
+                for target_square in PrecomputingMoves.get_targets_for(square, board):
+                    if cls.is_legal(board, (square, target_square)):
+                        return True
+        return False
+
+    @classmethod
+    def get_perpetual_checker(cls, board: Board, distance: int):
+        """
+        Takes back the last ``distance`` plies, which lead from the current position to itself
+        (see Board.get_repetition_distance()), to find out whether one side gave check with every move
+        :return: color of the side checking perpetually, which loses in Xiangqi, None if neither (or both) did
+        """
+        moves = []
+        # Whether each color was in check after every move of its opponent
+        is_checked = [True, True]
+        for _ in range(distance):
+            is_checked[board.moving_color] &= cls.is_in_check(board)
+            moves.append(board.game_history[-1][:2])
+            board.reverse_move(search_state=True)
+        for move in reversed(moves):
+            board.make_move(move, search_state=True)
+        if is_checked[0] == is_checked[1]:
+            return None
+        # The side being checked isn't the one checking
+        return int(is_checked[0])
@@ -1,87 +1,110 @@
 from core.engine.piece import Piece
 from core.engine.board import Board
 from core.engine.precomputed_move_data import PrecomputingMoves
-from typing import Iterable
+from core.engine.bitboard import Bitboard
+from core.engine.legality import Legality
 import numpy as np
 
 # The code doesn't look well designed as there seem to be lots of repetitions, but reusing the same code is difficult, 
 # as the order of operations for maximum performance vary from every piece's behavior
 # Also, no defaultdicts were used because it significantly reduces performance
-class LegalMoveGenerator:
+class MoveGenerator:
     """
     Generates legal moves from pseudo-legal-move-maps. \n
     call load_moves() to receive a list of all legal moves for the current state of the game.
+    Every instance keeps its own board and attack data, so searches running in separate threads
+    or on separate boards need a generator each (see LegalMoveGenerator for the shared one).
     """
     PrecomputingMoves.init()
     dir_offsets = PrecomputingMoves.dir_offsets
     dist_to_edge = PrecomputingMoves.dist_to_edge
-    moves = []
-
-    @classmethod
-    def init_board(cls, board: Board):
-        cls.board = board
-
-    @classmethod
-    def load_moves(cls, board: Board=None, generate_quiets=True) -> list:
+    # Reuse the attack data of the position two plies ago if the moves since didn't affect it
+    incremental_attack_data = True
+    # Recompute reused attack data from scratch and raise if the two differ
+    verify_attack_data = False
+    # Pieces attacking along files and ranks and pieces only attacking squares close to them
+    line_attackers = (Piece.rook, Piece.cannon, Piece.king)
+    close_attackers = (Piece.horse, Piece.pawn)
+
+    def __init__(self, board: Board=None) -> None:
+        self.board = board
+        self.generate_quiets = True
+        self.moves = []
+        # Hash map of plies and the attack data computed at that ply [zobrist key, generate_quiets, dependent squares, attack data]
+        self.attack_frames = {}
+        self.init_attack_data()
+
+    def init_board(self, board: Board):
+        self.board = board
+
+    def load_moves(self, board: Board=None, generate_quiets=True) -> list:
         """
         :return: a list of tuples containing the start and end indices of all possible moves
         """
-        cls.board = board or cls.board
-        cls.generate_quiets = generate_quiets
-        cls.moves = []
-        cls.init()
-        cls.calculate_attack_data()
-        cls.generate_rook_moves()
-        cls.generate_cannon_moves()
-        cls.generate_pawn_moves()
-        cls.generate_horse_moves()
-        cls.generate_advisor_moves()
-        cls.generate_elephant_moves()
-        cls.generate_king_moves()
-        return cls.moves
+        self.board = board or self.board
+        self.generate_quiets = generate_quiets
+        self.moves = []
+        self.init()
+        self.load_attack_data()
+        self.generate_rook_moves()
+        self.generate_cannon_moves()
+        self.generate_pawn_moves()
+        self.generate_horse_moves()
+        self.generate_advisor_moves()
+        self.generate_elephant_moves()
+        self.generate_king_moves()
+        return self.moves
     
-    @classmethod
-    def init(cls):
+    def init(self):
         """
         Initializes data used for move generation
         """
         try:
-            cls.moving_king = cls.board.piece_lists[cls.board.moving_color][Piece.king][0]
-            cls.opponent_king = cls.board.piece_lists[cls.board.opponent_color][Piece.king][0]
+            self.moving_king = self.board.piece_lists[self.board.moving_color][Piece.king][0]
+            self.opponent_king = self.board.piece_lists[self.board.opponent_color][Piece.king][0]
         except IndexError:
             print("---- invalid move detected: King was captured ----")
-            print(cls.board.load_fen_from_board())
-            cls.board.get_previous_configs(6)
-
-        cls.moves = []
-        cls.attack_map = set()
-        # Squares that would serve as screen for a threatening cannon
-        cls.illegal_squares = set()
-        cls.pinned_squares = set()
+            print(self.board.load_fen_from_board())
+            self.board.get_previous_configs(6)
+
+        self.moves = []
+
+    def init_attack_data(self):
+        """
+        Initializes the checks, pins and attacked squares, filled by calculate_attack_data()
+        """
+        self.attack_map = set()
+        self.pinned_squares = set()
+        # Pins imposed by a rook or the flying general, which a pinned cannon can't jump over to capture
+        self.orthogonal_pins = set()
+        # Friendly pieces blocking the leg of a horse that would otherwise check, mapped to the horse's square
+        # or None if the piece blocks more than one horse
+        self.horse_pins = {}
         # Number of checks
-        cls.checks = 0
+        self.checks = 0
         # Used for tracking the number of checks a square would block if moved to
-        cls.block_check_hash = {}
+        self.block_check_hash = {}
         # Square used to denote a checking cannon if existing
-        cls.checking_cannon_square = None
+        self.checking_cannon_square = None
+        # Squares from the checking cannon to the king (inclusive)
+        self.cannon_check_ray = set()
         # squares occupied by friendly pieces that are part of two pieces blocking a cannon check that can't
         # capture the other piece of double block as it would rearrange the double block into single screen, resulting in check
-        cls.double_screens = set()
+        self.double_screens = set()
         # Sqaure of friendly piece that serves as screen for a checking cannon, 
         # whose movement away from check-ray would resolve th check
-        cls.cause_cannon_defect = None
+        self.cause_cannon_defect = None
 
-    @classmethod
-    def bitvector_legal_moves(cls, legal_moves=None, flip_moves=False, action_space_vector=PrecomputingMoves.action_space_vector):
+    def bitvector_legal_moves(self, legal_moves=None, flip_moves=False, action_space_vector=PrecomputingMoves.action_space_vector):
         """
         :param moves: a list of tuples containing the start and end indices of all possible moves, if None,
-        cls.moves is used
+        self.moves is used
         :param action_space_vector: the action space vector
         :return: an array of len(action_space_vector) bits representing whether the move at that index
         in action_pace_vector is valid
         """
-        legal_moves = legal_moves or cls.load_moves()
-        # if flip_moves: legal_moves = cls.board.flip_moves(legal_moves)
+        legal_moves = legal_moves or self.load_moves()
+        # if flip_moves: legal_moves = self.board.flip_moves(legal_moves)
         legal_moves = set(legal_moves)
         return np.array([move in legal_moves for move in action_space_vector])
         # ^^^ quicker than vvv
@@ -90,46 +113,50 @@ class LegalMoveGenerator:
         # np.put(bitvector, legal_idx, 1)
         # return bitvector
 
-    @classmethod
-    def blocks_all_checks(cls, current_square, target_square, confusion_value=0):
+    def blocks_all_checks(self, current_square, target_square):
+        num_checks_blocked = self.block_check_hash.get(target_square, 0)
         # If the piece is a screen for opponent cannon and moves out of the way,
         # it prevents the cannon check, thus counting as a blocked check
-        disables_cannon = current_square == cls.cause_cannon_defect
-        num_checks_blocked = cls.block_check_hash.get(target_square, 0) + disables_cannon
-        captures_other_double_screen = current_square in cls.double_screens and target_square in cls.double_screens
-        return num_checks_blocked == cls.checks + confusion_value and not captures_other_double_screen
+        if current_square == self.cause_cannon_defect:
+            if target_square not in self.cannon_check_ray:
+                num_checks_blocked += 1
+            # Moving the screen along the check ray neither disables nor blocks the check. Capturing
+            # the checking cannon resolves it, which is already counted in block_check_hash
+            elif target_square != self.checking_cannon_square:
+                num_checks_blocked -= 1
+        captures_other_double_screen = current_square in self.double_screens and target_square in self.double_screens
+        return num_checks_blocked == self.checks and not captures_other_double_screen
+
 
+    def is_pinned(self, square):
+        return square in self.pinned_squares
 
-    @classmethod
-    def is_pinned(cls, square):
-        return square in cls.pinned_squares
+    def captures_pinning_horse(self, current_square, target_square):
+        """
+        :return: bool if the move captures the only horse pinning the piece, which is the one
+        move a piece blocking a horse's leg can make without exposing the king
+        """
+        if self.horse_pins.get(current_square) != target_square:
+            return False
+        return current_square not in self.orthogonal_pins and current_square not in self.double_screens
     
 
-    @classmethod
-    def moves_along_ray(cls, king_square: int, current_square: int, dir_idx: int):
+    def moves_along_ray(self, king_square: int, current_square: int, dir_idx: int):
         """
         :return: bool if move keeps a piece along the ray between two squares \n
         NOTE: only to be used for orthogonally moving pieces.
         """
-        target_square = current_square + cls.dir_offsets[dir_idx]
-        points = king_square, current_square, target_square
-        return cls.on_same_ray(points)
-
-    @staticmethod
-    def on_same_ray(points: Iterable):
-        # cols = map(lambda p: p % 9, points)
-        # rows = map(lambda p: p // 9, points)
-        cols = [p % 9 for p in points]
-        rows = [p // 9 for p in points]
-        return len(set(cols)) == 1 or len(set(rows)) == 1
+        # Odd direction indices move along the rank, even ones along the file
+        if dir_idx % 2:
+            return king_square // 9 == current_square // 9
+        return king_square % 9 == current_square % 9
 
-    @classmethod
-    def get_orth_dir_idx(cls, square_1, square_2):
+    def get_orth_dir_idx(self, square_1, square_2):
         """
         :return: precise direction index 0 to 4 between two squares from square_1's perspective
         """
-        file_1, rank_1 = cls.board.get_file_and_rank(square_1)
-        file_2, rank_2 = cls.board.get_file_and_rank(square_2)
+        file_1, rank_1 = self.board.get_file_and_rank(square_1)
+        file_2, rank_2 = self.board.get_file_and_rank(square_2)
         d_file = file_2 - file_1
         d_rank = rank_2 - rank_1
         if d_file and d_rank or not d_file and not d_rank:
@@ -137,208 +164,217 @@ class LegalMoveGenerator:
         # On same file
         if not d_file and d_rank:
             d_rank_norm = d_rank // abs(d_rank)
-            return cls.dir_offsets.index(d_rank_norm * 9)
+            return self.dir_offsets.index(d_rank_norm * 9)
         # On same rank
         d_file_norm = d_file // abs(d_file)
-        return cls.dir_offsets.index(d_file_norm)
+        return self.dir_offsets.index(d_file_norm)
 
-    @classmethod
-    def estimate_dir_idx(cls, square_1, square_2):
+    def estimate_dir_idx(self, square_1, square_2):
         """
         :return: roughly estimated direction index 0 to 4 between two squares from square_1's perspective
         NOTE: Not used right now
         """
-        file_1, rank_1 = cls.board.get_file_and_rank(square_1)
-        file_2, rank_2 = cls.board.get_file_and_rank(square_2)
+        file_1, rank_1 = self.board.get_file_and_rank(square_1)
+        file_2, rank_2 = self.board.get_file_and_rank(square_2)
         d_file = file_2 - file_1
         d_rank = rank_2 - rank_1
         # On same file
         if abs(d_file) < abs(d_rank):
             d_rank_norm = d_rank // abs(d_rank)
-            return cls.dir_offsets.index(d_rank_norm * 9),
+            return self.dir_offsets.index(d_rank_norm * 9),
         # On same rank
         if abs(d_rank) < abs(d_file):
             d_file_norm = d_file // abs(d_file)
-            return cls.dir_offsets.index(d_file_norm),
+            return self.dir_offsets.index(d_file_norm),
             
-        return cls.dir_offsets.index(d_rank // abs(d_rank) * 9), cls.dir_offsets.index(d_file // abs(d_file))
+        return self.dir_offsets.index(d_rank // abs(d_rank) * 9), self.dir_offsets.index(d_file // abs(d_file))
 
-    @staticmethod
-    def get_slope(cls, square_1, square_2):
+    def get_slope(self, square_1, square_2):
         """
         NOTE: Not used right now
         """
-        file_1, rank_1 = cls.board.get_file_and_rank(square_1)
-        file_2, rank_2 = cls.board.get_file_and_rank(square_2)
+        file_1, rank_1 = self.board.get_file_and_rank(square_1)
+        file_2, rank_2 = self.board.get_file_and_rank(square_2)
         return (file_2 - file_1) / (rank_2 - rank_1)
 
 
-    @classmethod
-    def generate_king_moves(cls) -> None:
-        current_square = cls.moving_king
+    def generate_king_moves(self) -> None:
+        current_square = self.moving_king
 
-        target_squares = PrecomputingMoves.king_mm[cls.board.moving_side][current_square]
+        target_squares = PrecomputingMoves.king_mm[self.board.moving_side][current_square]
         for target_square in target_squares:
-            target_piece = cls.board.squares[target_square]
-            if not target_piece and not cls.generate_quiets:
+            target_piece = self.board.squares[target_square]
+            if not target_piece and not self.generate_quiets:
                 continue
-            if Piece.is_color(target_piece, cls.board.moving_color):
+            if Piece.is_color(target_piece, self.board.moving_color):
                 continue
-            if target_square in cls.attack_map:
+            if target_square in self.attack_map:
                 continue
-            cls.moves.append((current_square, target_square))
+            self.moves.append((current_square, target_square))
             
 
-    @classmethod
-    def generate_rook_moves(cls) -> None:
+    def generate_rook_moves(self) -> None:
         """
-        extends Legal_move_generator.moves with legal rook moves
+        extends MoveGenerator.moves with legal rook moves
         """
-        for current_square in cls.board.piece_lists[cls.board.moving_color][Piece.rook]:
-            is_pinned = cls.is_pinned(current_square)
-            if cls.checks and is_pinned:
+        for current_square in self.board.piece_lists[self.board.moving_color][Piece.rook]:
+            is_pinned = self.is_pinned(current_square)
+            if self.checks and is_pinned:
                 continue
-            cause_cannon_defect = current_square == cls.cause_cannon_defect
 
-            rook_mm = PrecomputingMoves.orthogonal_mm[current_square]
-            # Going through chosen direction indices
-            for dir_idx, squares_in_dir in rook_mm.items():
-                if is_pinned and not cls.moves_along_ray(cls.moving_king, current_square, dir_idx):
-                    # print("AINT MOVIN", current_square)
+            file_slides, rank_slides = self.get_slides(current_square)
+            # Going through the directions in order of their direction indices
+            for dir_idx, empty_offsets, blocker_offset, _ in (file_slides[0], rank_slides[0], file_slides[1], rank_slides[1]):
+                if is_pinned and not self.moves_along_ray(self.moving_king, current_square, dir_idx):
+                    # A rook blocking a horse's leg can still capture the horse next to it
+                    if not empty_offsets and blocker_offset is not None:
+                        if self.captures_pinning_horse(current_square, current_square + blocker_offset):
+                            self.moves.append((current_square, current_square + blocker_offset))
                     continue
-                target_piece = False
-                # "Walking" in direction using direction offsets
-                for target_square in squares_in_dir:
-                    target_piece = cls.board.squares[target_square]
-                    # If target_piece is friendly, go to next direction
-                    if Piece.is_color(target_piece, cls.board.moving_color):
-                        break
-
-                    # Because all squares between the rook and cannon (inclusive) are in block_check_hash and
-                    # current square is cause_cannon_defect, the number of checks blocked would be 2, not 1
-                    # so it skips moves between cannon and rook, but would also skip the capture of checking cannon
-                    # Thus, if rook is screen for checking cannon and captures it, increment the number of checks by 1
-                    # => condition 2 == 1 becomes 2 == 2
-                    captures_checking_cannon = cause_cannon_defect and cls.checking_cannon_square == target_square
-                    blocks_all_checks = cls.blocks_all_checks(current_square, target_square, captures_checking_cannon)
-                    
-                    # If it's quiescene search and move isn't a capture, continue
-                    if not cls.generate_quiets and not target_piece:
-                        continue
+                # NOTE: a blocking move doesn't end the direction, as both the leg and the square
+                # of a checking horse can lie along the same ray
+                if self.generate_quiets:
+                    for offset in empty_offsets:
+                        target_square = current_square + offset
+                        if self.blocks_all_checks(current_square, target_square):
+                            self.moves.append((current_square, target_square))
+                if blocker_offset is None:
+                    continue
+                target_square = current_square + blocker_offset
+                # If target_piece is friendly, go to next direction
+                if Piece.is_color(self.board.squares[target_square], self.board.moving_color):
+                    continue
+                if self.blocks_all_checks(current_square, target_square):    
+                    self.moves.append((current_square, target_square))
 
-                    if blocks_all_checks:    
-                        cls.moves.append((current_square, target_square))
-                        
-                    # If piece on target square and not friendly, go to next direction
-                    if target_piece:
-                        break
-                    # If this move blocks check, other moves can't, unless it moves the piece away from cannon check ray
-                    if blocks_all_checks and cls.checks and not cause_cannon_defect:
-                        break
+    def get_slides(self, square: int) -> tuple:
+        """
+        :return: the slides along the square's file and rank for the current occupancy, see PrecomputingMoves.get_line_slides()
+        """
+        file, rank = square % 9, square // 9
+        return (PrecomputingMoves.file_slides[rank][self.board.file_occupancy[file]], 
+                PrecomputingMoves.rank_slides[file][self.board.rank_occupancy[rank]])
 
-    @classmethod
-    def generate_pawn_moves(cls) -> None:
+    def generate_pawn_moves(self) -> None:
         """
-        extends Legal_move_generator.moves with legal pawn moves
+        extends MoveGenerator.moves with legal pawn moves
         """
         # Looping over friendly pawns
-        for current_square in cls.board.piece_lists[cls.board.moving_color][Piece.pawn]:
-            is_pinned = cls.is_pinned(current_square)
-            if cls.checks and is_pinned:
-                break
-            cause_cannon_defect = current_square == cls.cause_cannon_defect
+        for current_square in self.board.piece_lists[self.board.moving_color][Piece.pawn]:
+            is_pinned = self.is_pinned(current_square)
+            if self.checks and is_pinned:
+                continue
+            cause_cannon_defect = current_square == self.cause_cannon_defect
+            if self.generate_quiets:
+                target_squares = PrecomputingMoves.pawn_mm[self.board.moving_side][current_square]
+            else:
+                target_squares = self.get_capture_squares(Bitboard.pawn_attacks(1 << current_square, self.board.moving_side))
 
-            for target_square in PrecomputingMoves.pawn_mm[cls.board.moving_side][current_square]:
-                target_piece = cls.board.squares[target_square]
-                if Piece.is_color(target_piece, cls.board.moving_color):
+            for target_square in target_squares:
+                target_piece = self.board.squares[target_square]
+                if Piece.is_color(target_piece, self.board.moving_color):
                     continue
 
-                dir_idx = cls.dir_offsets.index(target_square - current_square)
-                if is_pinned and not cls.moves_along_ray(cls.moving_king, current_square, dir_idx):
+                dir_idx = self.dir_offsets.index(target_square - current_square)
+                if is_pinned and not self.moves_along_ray(self.moving_king, current_square, dir_idx):
+                    if self.captures_pinning_horse(current_square, target_square):
+                        self.moves.append((current_square, target_square))
                     continue
-                # Because all squares between the pawn and cannon (inclusive) are in block_check_hash and
-                # current square is cause_cannon_defect, the number of checks blocked would be 2, not 1
-                # so it skips moves between cannon and pawn, but would also skip the capture of checking cannon
-                # Thus, if pawn is screen for checking cannon and captures it, increment the number of checks by 1
-                # => condition 2 == 1 becomes 2 == 2
-                captures_checking_cannon = cause_cannon_defect and cls.checking_cannon_square == target_square
-                blocks_all_checks = cls.blocks_all_checks(current_square, target_square, captures_checking_cannon)
+                blocks_all_checks = self.blocks_all_checks(current_square, target_square)
                 if not blocks_all_checks:
                     continue
                 # This guard clause is rarely True, so put it last to avoid unnecessary checks
-                if not cls.generate_quiets and not target_piece:
+                if not self.generate_quiets and not target_piece:
                     continue
         
-                cls.moves.append((current_square, target_square))
+                self.moves.append((current_square, target_square))
                 # If this move blocks check, other moves can't, unless it moves the piece away from cannon check ray
-                if blocks_all_checks and cls.checks and not cause_cannon_defect:
+                if blocks_all_checks and self.checks and not cause_cannon_defect:
                     break
     
-    @classmethod
-    def get_elephant_block(cls, elephant, target_square):
-        d_file, d_rank = cls.board.get_dists(target_square, elephant)
+    def get_occupied(self) -> int:
+        """
+        :return: bitboard of all occupied squares
+        """
+        return self.board.color_bitboards[0] | self.board.color_bitboards[1]
+
+    def get_capture_squares(self, attacks: int) -> list:
+        """
+        :param attacks: bitboard of the squares attacked by a friendly piece
+        :return: list of the attacked squares occupied by opponent pieces, used when only captures are generated
+        """
+        return Bitboard.get_squares(attacks & self.board.color_bitboards[self.board.opponent_color])
+
+    def get_elephant_block(self, elephant, target_square):
+        d_file, d_rank = self.board.get_dists(target_square, elephant)
         block = elephant + d_rank // 2 * 9 + d_file // 2 
         return block
 
-    @classmethod
-    def generate_elephant_moves(cls) -> None:
+    def generate_elephant_moves(self) -> None:
         """
-        extends Legal_move_generator.moves with legal elephant moves
+        extends MoveGenerator.moves with legal elephant moves
         """
-        for current_square in cls.board.piece_lists[cls.board.moving_color][Piece.elephant]:
-            if cls.is_pinned(current_square):
+        for current_square in self.board.piece_lists[self.board.moving_color][Piece.elephant]:
+            if self.is_pinned(current_square):
                 continue
-            cause_cannon_defect = current_square == cls.cause_cannon_defect
+            cause_cannon_defect = current_square == self.cause_cannon_defect
+            if self.generate_quiets:
+                target_squares = PrecomputingMoves.elephant_mm[self.board.moving_side][current_square]
+            else:
+                attacks = Bitboard.elephant_attacks(1 << current_square, self.get_occupied(), self.board.moving_side)
+                target_squares = self.get_capture_squares(attacks)
             
-            for target_square in PrecomputingMoves.elephant_mm[cls.board.moving_side][current_square]:
-                target_piece = cls.board.squares[target_square]
-                if Piece.is_color(target_piece, cls.board.moving_color):
+            for target_square in target_squares:
+                target_piece = self.board.squares[target_square]
+                if Piece.is_color(target_piece, self.board.moving_color):
                     continue
                 
-                blocking_square = cls.get_elephant_block(current_square, target_square)
-                if cls.board.squares[blocking_square]:
+                blocking_square = self.get_elephant_block(current_square, target_square)
+                if self.board.squares[blocking_square]:
                     continue
                 
-                blocks_all_checks = cls.blocks_all_checks(current_square, target_square)
+                blocks_all_checks = self.blocks_all_checks(current_square, target_square)
                 if not blocks_all_checks:
                     continue
                 # If it's quiescene search and move isn't a capture, continue
-                if not cls.generate_quiets and not target_piece:
+                if not self.generate_quiets and not target_piece:
                     continue
-                cls.moves.append((current_square, target_square))
+                self.moves.append((current_square, target_square))
 
                 # If this move blocks check, other moves can't, unless it moves the piece away from cannon check ray
-                if blocks_all_checks and cls.checks and not cause_cannon_defect:
+                if blocks_all_checks and self.checks and not cause_cannon_defect:
                     break
 
-    @classmethod
-    def generate_advisor_moves(cls) -> None:
+    def generate_advisor_moves(self) -> None:
         """
-        extends Legal_move_generator.moves with legal advisor moves
+        extends MoveGenerator.moves with legal advisor moves
         """
-        for current_square in cls.board.piece_lists[cls.board.moving_color][Piece.advisor]:
-            if cls.is_pinned(current_square):
+        for current_square in self.board.piece_lists[self.board.moving_color][Piece.advisor]:
+            if self.is_pinned(current_square):
                 continue
-            cause_cannon_defect = current_square == cls.cause_cannon_defect
-            target_squares = PrecomputingMoves.advisor_mm[cls.board.moving_side][current_square]
+            cause_cannon_defect = current_square == self.cause_cannon_defect
+            if self.generate_quiets:
+                target_squares = PrecomputingMoves.advisor_mm[self.board.moving_side][current_square]
+            else:
+                target_squares = self.get_capture_squares(Bitboard.advisor_attacks(1 << current_square, self.board.moving_side))
 
             for target_square in target_squares:
-                target_piece = cls.board.squares[target_square]
-                if Piece.is_color(target_piece, cls.board.moving_color):
+                target_piece = self.board.squares[target_square]
+                if Piece.is_color(target_piece, self.board.moving_color):
                     continue
 
-                blocks_all_checks = cls.blocks_all_checks(current_square, target_square)
+                blocks_all_checks = self.blocks_all_checks(current_square, target_square)
                 if not blocks_all_checks:
                     continue
 
                 # If it's quiescene search and move isn't a capture, continue
-                if not cls.generate_quiets and not target_piece:
+                if not self.generate_quiets and not target_piece:
                     continue
 
-                cls.moves.append((current_square, target_square))
+                self.moves.append((current_square, target_square))
                 
                  # If this move blocks check, other moves can't, unless it moves the piece away from cannon check ray
-                if blocks_all_checks and cls.checks and not cause_cannon_defect:
+                if blocks_all_checks and self.checks and not cause_cannon_defect:
                     break
 
     @staticmethod
@@ -350,93 +386,74 @@ class LegalMoveGenerator:
             return current_square + d_rank // 2 * 9
         return current_square + d_file // 2
 
-    @classmethod
-    def generate_horse_moves(cls) -> None:
+    def generate_horse_moves(self) -> None:
         """
-        extends Legal_move_generator.moves with legal horse moves
+        extends MoveGenerator.moves with legal horse moves
         """
-        for current_square in cls.board.piece_lists[cls.board.moving_color][Piece.horse]:
-            if cls.is_pinned(current_square):
+        for current_square in self.board.piece_lists[self.board.moving_color][Piece.horse]:
+            if self.is_pinned(current_square):
                 continue
+            if self.generate_quiets:
+                target_squares = PrecomputingMoves.horse_mm[current_square]
+            else:
+                target_squares = self.get_capture_squares(Bitboard.horse_attacks(1 << current_square, self.get_occupied()))
 
-            for target_square in PrecomputingMoves.horse_mm[current_square]:
-                target_piece = cls.board.squares[target_square]
+            for target_square in target_squares:
+                target_piece = self.board.squares[target_square]
                 # If it's quiescene search and move isn't a capture, continue
-                if Piece.is_color(target_piece, cls.board.moving_color):
+                if Piece.is_color(target_piece, self.board.moving_color):
                     continue
-                blocking_square = cls.get_horse_block(current_square, target_square)
-                if cls.board.squares[blocking_square]:
+                blocking_square = self.get_horse_block(current_square, target_square)
+                if self.board.squares[blocking_square]:
                     continue
 
                 # If there's a check (or multiple)
                 # Only proceed if num of checks the moves blocks is equivalent to total num of checks
-                blocks_all_checks = cls.blocks_all_checks(current_square, target_square)
+                blocks_all_checks = self.blocks_all_checks(current_square, target_square)
                 if not blocks_all_checks:
                     continue
-                if not cls.generate_quiets and not target_piece:
+                if not self.generate_quiets and not target_piece:
                     continue
-                cls.moves.append((current_square, target_square))
+                self.moves.append((current_square, target_square))
                 
-    @classmethod
-    def generate_cannon_moves(cls) -> None:
+    def generate_cannon_moves(self) -> None:
         """
-        extends Legal_move_generator.moves with legal cannon moves
+        extends MoveGenerator.moves with legal cannon moves
         """
-        for current_square in cls.board.piece_lists[cls.board.moving_color][Piece.cannon]:
-            is_pinned = cls.is_pinned(current_square)
-            if cls.checks and is_pinned:
+        for current_square in self.board.piece_lists[self.board.moving_color][Piece.cannon]:
+            is_pinned = self.is_pinned(current_square)
+            if self.checks and is_pinned:
                 continue
-            cause_cannon_defect = current_square == cls.cause_cannon_defect
-            cannon_attack_map = PrecomputingMoves.orthogonal_mm[current_square]
-            is_double_screen = current_square in cls.double_screens
-            for dir_idx, targets_in_dir in cannon_attack_map.items():
-                if is_pinned and not cls.moves_along_ray(cls.moving_king, current_square, dir_idx):
+            is_double_screen = current_square in self.double_screens
+            file_slides, rank_slides = self.get_slides(current_square)
+            # Going through the directions in order of their direction indices
+            for dir_idx, empty_offsets, screen_offset, target_offset in (file_slides[0], rank_slides[0], file_slides[1], rank_slides[1]):
+                if is_pinned and not self.moves_along_ray(self.moving_king, current_square, dir_idx):
                     continue
-
-                in_attack_mode = False
-                target_piece = False
-                # "Walking" in direction using direction offsets
-                for target_square in targets_in_dir:
-
-                    if cls.board.squares[target_square] and not in_attack_mode:
-                        # If cannon is pinned by opponent rook, it can't capture by using the pinning 
-                        # rook or the friendly king as screen, as it would place king in check
-                        if is_pinned and not is_double_screen:
-                            break
-                        # Cannon is the first screen between the opponent cannon and friendly king, making it 
-                        # illegal to use opponent cannon as screen. Since the opponent cannon would be the first
-                        # piece to come across as attack mode is off, we know that if it's in double screens, 
-                        # it must be the first one
-                        if Piece.is_piece(cls.board.squares[target_square], cls.board.opponent_color, Piece.cannon) and is_double_screen:
-                            break
-                        in_attack_mode = True
-                        continue
-
-                    if in_attack_mode:
-                        target_piece = cls.board.squares[target_square]
-                        # if target square is empty, continue
-                        if not target_piece:
-                            continue
-                        # If target_piece is friendly, go to next direction
-                        if Piece.is_color_no_check(target_piece, cls.board.moving_color):
-                            break
-                    
-                    blocks_all_checks = cls.blocks_all_checks(current_square, target_square)
-                    if not blocks_all_checks:
-                        if target_piece:
-                            break
-                        continue
-                    
-                    # If it's quiescene search and move isn't a capture, continue
-                    if not cls.generate_quiets and not target_piece:
-                        continue
-                    cls.moves.append((current_square, target_square))
-                    
-                    # Move was a capture, can't move further in this direction 
-                    if target_piece:
-                        break
-                    if blocks_all_checks and cls.checks and not cause_cannon_defect:
-                        break
+                if self.generate_quiets:
+                    for offset in empty_offsets:
+                        target_square = current_square + offset
+                        if self.blocks_all_checks(current_square, target_square):
+                            self.moves.append((current_square, target_square))
+                if target_offset is None:
+                    continue
+                # If cannon is pinned by opponent rook, it can't capture by using the pinning 
+                # rook or the friendly king as screen, as it would place king in check
+                # This also holds if it's part of a double screen at the same time
+                if is_pinned and (not is_double_screen or current_square in self.orthogonal_pins):
+                    continue
+                # Cannon is the first screen between the opponent cannon and friendly king, making it 
+                # illegal to use opponent cannon as screen. Since the opponent cannon would be the first
+                # piece to come across as attack mode is off, we know that if it's in double screens, 
+                # it must be the first one
+                if is_double_screen and Piece.is_piece(self.board.squares[current_square + screen_offset], self.board.opponent_color, Piece.cannon):
+                    continue
+                target_square = current_square + target_offset
+                # If target_piece is friendly, go to next direction
+                if Piece.is_color_no_check(self.board.squares[target_square], self.board.moving_color):
+                    continue
+                if self.blocks_all_checks(current_square, target_square):
+                    self.moves.append((current_square, target_square))
 
 
 
@@ -444,18 +461,17 @@ class LegalMoveGenerator:
 #-------The part below is for calculating pins, checks, double cheks etc.-------
 #-------------------------------------------------------------------------------
 
-    @classmethod
-    def first_two_in_ray(cls, square_1, square_2, dir_idx):
+    def first_two_in_ray(self, square_1, square_2, dir_idx):
         """
         :return: the first square between square_1 and square_2 if the number of squares separating them is 1
         :param square_1: where the ray counting the number of squares starts
         """
         dist = abs(square_1 - square_2) // 9
-        offset = cls.dir_offsets[dir_idx]
+        offset = self.dir_offsets[dir_idx]
         squares = []
         for step in range(dist - 1):
             square = square_1 + offset * (step + 1)
-            piece = cls.board.squares[square]
+            piece = self.board.squares[square]
             if not piece:
                 continue
             # Second piece to come across
@@ -466,36 +482,36 @@ class LegalMoveGenerator:
             
         return squares
 
-    @classmethod
-    def flying_general(cls):
+    def flying_general(self):
         # Opponent king can only pose a threat if it's file's dist to friendly king's file is exactly 1
-        moving_king_file = cls.moving_king % 9
-        opponent_king_file = cls.opponent_king % 9
+        moving_king_file = self.moving_king % 9
+        opponent_king_file = self.opponent_king % 9
         flying_general_threat = abs(moving_king_file - opponent_king_file) < 2
         if not flying_general_threat:
             return
-        moving_king_rank = cls.moving_king // 9 
-        dir_idx = cls.board.moving_side * 2
-        dist_kings = abs(moving_king_rank - cls.opponent_king // 9)
-        offset = cls.dir_offsets[dir_idx]
+        moving_king_rank = self.moving_king // 9 
+        dir_idx = self.board.moving_side * 2
+        dist_kings = abs(moving_king_rank - self.opponent_king // 9)
+        offset = self.dir_offsets[dir_idx]
         block = None
         for step in range(dist_kings):
-            square = cls.opponent_king + offset * (step + 1)
-            piece = cls.board.squares[square]
+            square = self.opponent_king + offset * (step + 1)
+            piece = self.board.squares[square]
 
             if not piece:
                 continue
             # Opponent piece blocks any pins, but can't be captured 
             # by friendly king as opponent king's defending it
-            if Piece.is_color_no_check(piece, cls.board.opponent_color):
+            if Piece.is_color_no_check(piece, self.board.opponent_color):
                 if not block:
-                    cls.attack_map.add(square)
+                    self.attack_map.add(square)
                 return
 
             # Friendly king
             if Piece.is_type_no_check(piece ,Piece.king):
                 # Pin piece
-                cls.pinned_squares.add(block)
+                self.pinned_squares.add(block)
+                self.orthogonal_pins.add(block)
                 return
 
             # Second friendly piece in direction, no pins possible
@@ -507,42 +523,41 @@ class LegalMoveGenerator:
         if block:
             return
         flying_general_square = moving_king_rank * 9 + opponent_king_file
-        cls.attack_map.add(flying_general_square)
+        self.attack_map.add(flying_general_square)
 
         #------------------------------------MISTAKE DOCUMENTATION--------------------------------
         # THIS WAS A GOOD IDEA, EXCEPT FOR THE FACT THAT IT WAS A BAD IDEA.
         # THE VERSION ABOVE IS MUCH FASTER, AS IT INTERRUPTS THE CHECK RAY EARLIER
         
-        # blocking_squares = cls.first_two_in_ray(cls.opponent_king, cls.moving_king, dir_idx)
+        # blocking_squares = self.first_two_in_ray(self.opponent_king, self.moving_king, dir_idx)
         # if blocking_squares == -1:
         #     return
 
         # if blocking_squares:
         #     # Turning list into integer
         #     blocking_squares = blocking_squares.pop()
-        #     blocking_piece = cls.board.squares[blocking_squares]
+        #     blocking_piece = self.board.squares[blocking_squares]
 
         #     # Opponent piece: blocks any pins, but can't be captured 
         #     # by friendly king as opponent king's defending it
-        #     if Piece.is_color(blocking_piece, cls.board.opponent_color):
-        #         cls.attack_map.add(blocking_squares)
+        #     if Piece.is_color(blocking_piece, self.board.opponent_color):
+        #         self.attack_map.add(blocking_squares)
         #         return
         #     # Friendly piece: gets pinned if kings are on same rank
         #     if opponent_king_file == moving_king_file:
-        #         cls.pinned_squares.add(blocking_squares)
+        #         self.pinned_squares.add(blocking_squares)
         #     return
         # # Number of pieces between kings is 0
         # # If there're no pieces between opponent king and opposite edge of board
         # # friendly king can't move to the opponent king's file
-        # moving_king_rank = cls.moving_king // 9 
+        # moving_king_rank = self.moving_king // 9 
         # flying_general_square = moving_king_rank * 9 + opponent_king_file
-        # cls.attack_map.add(flying_general_square)
+        # self.attack_map.add(flying_general_square)
         
-    @classmethod
-    def calculate_horse_attack_data(cls) -> None:
-        opponent_horses = cls.board.piece_lists[cls.board.opponent_color][Piece.horse]
+    def calculate_horse_attack_data(self) -> None:
+        opponent_horses = self.board.piece_lists[self.board.opponent_color][Piece.horse]
         for square in opponent_horses:
-            if cls.board.get_manhattan_dist(square, cls.moving_king) > 4:
+            if self.board.get_manhattan_dist(square, self.moving_king) > 4:
                 continue
             for target_square in PrecomputingMoves.horse_mm[square]:
                 
@@ -550,107 +565,104 @@ class LegalMoveGenerator:
                 # Not adding squares to the attack map if they're occupied by an opponent piece allows 
                 # the king to make pseudo-legal capture to squares that can be attacked by opponent pieces
                 # Bugs like these are really valuable and virtually inevitable in complex applications 
-                # if Piece.is_color(cls.board.squares[target_square], cls.opponent):
+                # if Piece.is_color(self.board.squares[target_square], self.opponent):
                 #     continue
                 # -----------------------------------------------------------------------------------------
 
-                block_square = cls.get_horse_block(square, target_square)
-                block_piece = cls.board.squares[block_square]
-                is_move_check = target_square == cls.moving_king
+                block_square = self.get_horse_block(square, target_square)
+                block_piece = self.board.squares[block_square]
+                is_move_check = target_square == self.moving_king
 
                 # Horse is attacking the target square
                 if not block_piece:
-                    cls.attack_map.add(target_square)
+                    self.attack_map.add(target_square)
                     if is_move_check:
-                        cls.checks += 1
-                        cls.block_check_hash[block_square] = cls.block_check_hash.get(block_square, 0) + 1
-                        cls.block_check_hash[square] = cls.block_check_hash.get(square, 0) + 1
+                        self.checks += 1
+                        self.block_check_hash[block_square] = self.block_check_hash.get(block_square, 0) + 1
+                        self.block_check_hash[square] = self.block_check_hash.get(square, 0) + 1
                     continue
                 # Move is blocked by opponent piece or wouldn't threaten friendly king anyways
-                if Piece.is_color_no_check(block_piece, cls.board.opponent_color) or not is_move_check:
+                if Piece.is_color_no_check(block_piece, self.board.opponent_color) or not is_move_check:
                     continue
                 # If blocked by friendly piece and move would result in check, it's pinned
-                cls.pinned_squares.add(block_square)
+                self.pinned_squares.add(block_square)
+                self.horse_pins[block_square] = None if block_square in self.horse_pins else square
 
-    @classmethod
-    def exclude_king_moves(cls):
-        king_mm = PrecomputingMoves.king_mm[cls.board.moving_side][cls.moving_king]
+    def exclude_king_moves(self):
+        king_mm = PrecomputingMoves.king_mm[self.board.moving_side][self.moving_king]
         # Filtering out squares occupied by friendly pieces
-        king_mm = list(filter(lambda target: not Piece.is_color(cls.board.squares[target], cls.board.moving_color), king_mm))
-        # king_mm = [not Piece.is_color(cls.board.squares[target], cls.board.moving_color) for target in king_mm]
-        if not cls.generate_quiets:
-            king_mm = list(filter(lambda target: cls.board.squares[target], king_mm))
-            # king_mm = [cls.board.squares[target] for target in king_mm]
+        king_mm = list(filter(lambda target: not Piece.is_color(self.board.squares[target], self.board.moving_color), king_mm))
+        # king_mm = [not Piece.is_color(self.board.squares[target], self.board.moving_color) for target in king_mm]
+        if not self.generate_quiets:
+            king_mm = list(filter(lambda target: self.board.squares[target], king_mm))
+            # king_mm = [self.board.squares[target] for target in king_mm]
         # Looping over possible king moves
         for target_square in king_mm:
-            if target_square in cls.attack_map:
+            if target_square in self.attack_map:
                 continue
-            for rook in cls.board.piece_lists[cls.board.opponent_color][Piece.rook]:
-                attack_dir_idx = cls.get_orth_dir_idx(rook, target_square)
+            for rook in self.board.piece_lists[self.board.opponent_color][Piece.rook]:
+                attack_dir_idx = self.get_orth_dir_idx(rook, target_square)
                 # If cannon could threaten king's move, generate attack ray
                 if attack_dir_idx != None:
-                    cls.generate_rook_attack_ray(rook, attack_dir_idx)
+                    self.generate_rook_attack_ray(rook, attack_dir_idx)
 
-        king_mm = list(filter(lambda target: target not in cls.attack_map, king_mm))
-        # king_mm = [target for target in king_mm if target not in cls.attack_map]
+        king_mm = list(filter(lambda target: target not in self.attack_map, king_mm))
+        # king_mm = [target for target in king_mm if target not in self.attack_map]
         for target_square in king_mm:
-            if target_square in cls.attack_map:
+            if target_square in self.attack_map:
                 continue
             # Looping over opponent cannons
-            for cannon in cls.board.piece_lists[cls.board.opponent_color][Piece.cannon]:
-                attack_dir_idx = cls.get_orth_dir_idx(cannon, target_square)
+            for cannon in self.board.piece_lists[self.board.opponent_color][Piece.cannon]:
+                attack_dir_idx = self.get_orth_dir_idx(cannon, target_square)
                 # If cannon could threaten king's move, generate attack ray
                 if attack_dir_idx != None:
-                    cls.generate_cannon_attack_ray(cannon, attack_dir_idx)
+                    self.generate_cannon_attack_ray(cannon, attack_dir_idx)
 
-        cls.generate_pawn_attack_data(king_mm)
+        self.generate_pawn_attack_data(king_mm)
 
         # -----------------------------------MISTAKE DOCUMENTATION-------------------------------------------
-        # for rook in cls.board.piece_lists[cls.board.opponent_color][Piece.rook]:
-        #     dists = cls.board.get_2d_dists(rook, cls.moving_king)
+        # for rook in self.board.piece_lists[self.board.opponent_color][Piece.rook]:
+        #     dists = self.board.get_2d_dists(rook, self.moving_king)
         #     min_dist = min(*dists)
         #     # If minimum distance among the two axes is greater than 1, rook can pose no threat to king
         #     if min_dist > 1:
         #         continue
-        #     for attack_dir_idx in cls.estimate_dir_idx(rook, cls.moving_king):
+        #     for attack_dir_idx in self.estimate_dir_idx(rook, self.moving_king):
         #         # The minimum distance among the two axes is 1
         #         if not min_dist:
         #             # The minimum distance among the two axes is 0
-        #             cls.get_rook_imposed_limits(rook, attack_dir_idx)
-        #         cls.generate_rook_attack_ray(rook, attack_dir_idx)
+        #             self.get_rook_imposed_limits(rook, attack_dir_idx)
+        #         self.generate_rook_attack_ray(rook, attack_dir_idx)
         # -------------------------------------------------------------------------------------------------------
 
-    @classmethod
-    def generate_pawn_attack_data(cls, king_moves):
-        for pawn in cls.board.piece_lists[cls.board.opponent_color][Piece.pawn]:
-            mhd = cls.board.get_manhattan_dist(pawn, cls.moving_king)
+    def generate_pawn_attack_data(self, king_moves):
+        for pawn in self.board.piece_lists[self.board.opponent_color][Piece.pawn]:
+            mhd = self.board.get_manhattan_dist(pawn, self.moving_king)
             if mhd > 2:
                 continue
-            for attacked_square in PrecomputingMoves.pawn_mm[cls.board.opponent_side][pawn]:
+            for attacked_square in PrecomputingMoves.pawn_mm[self.board.opponent_side][pawn]:
             # Pawn is posing a threat to friendly king
                 if attacked_square in king_moves:
-                    cls.attack_map.add(attacked_square)
+                    self.attack_map.add(attacked_square)
                     continue
-                if attacked_square == cls.moving_king:
-                    cls.checks += 1
-                    cls.block_check_hash[pawn] = cls.block_check_hash.get(pawn, 0) + 1
-
-    @classmethod
-    def confine_movement(cls) -> None:
-        for cannon in cls.board.piece_lists[cls.board.opponent_color][Piece.cannon]:
-            attack_dir_idx = cls.get_orth_dir_idx(cannon, cls.moving_king)
+                if attacked_square == self.moving_king:
+                    self.checks += 1
+                    self.block_check_hash[pawn] = self.block_check_hash.get(pawn, 0) + 1
+
+    def confine_movement(self) -> None:
+        for cannon in self.board.piece_lists[self.board.opponent_color][Piece.cannon]:
+            attack_dir_idx = self.get_orth_dir_idx(cannon, self.moving_king)
             # If cannon could threaten king's move, generate attack ray
             if attack_dir_idx != None:
-                cls.get_cannon_imposed_limits(cannon, attack_dir_idx)
-        for rook in cls.board.piece_lists[cls.board.opponent_color][Piece.rook]:
-            attack_dir_idx = cls.get_orth_dir_idx(rook, cls.moving_king)
+                self.get_cannon_imposed_limits(cannon, attack_dir_idx)
+        for rook in self.board.piece_lists[self.board.opponent_color][Piece.rook]:
+            attack_dir_idx = self.get_orth_dir_idx(rook, self.moving_king)
             # If cannon could threaten king's move, generate attack ray
             if attack_dir_idx != None:
-                cls.get_rook_imposed_limits(rook, attack_dir_idx)     
+                self.get_rook_imposed_limits(rook, attack_dir_idx)     
 
 
-    @classmethod
-    def generate_cannon_attack_ray(cls, square, dir_idx):
+    def generate_cannon_attack_ray(self, square, dir_idx):
         """
         generates attack map along ray of given direction from given square
         """
@@ -658,13 +670,13 @@ class LegalMoveGenerator:
         screen = False
         double_block = False
         for attacking_square in attack_ray:
-            piece = cls.board.squares[attacking_square]
+            piece = self.board.squares[attacking_square]
             # attacking square is occupied
             # Cannon is in capture mode
             if screen:
-                cls.attack_map.add(attacking_square)
+                self.attack_map.add(attacking_square)
             if piece:
-                if Piece.is_piece(piece, cls.board.moving_color, Piece.king):
+                if Piece.is_piece(piece, self.board.moving_color, Piece.king):
                     if screen: 
                         continue
                     return
@@ -674,44 +686,42 @@ class LegalMoveGenerator:
             if double_block:
                 return
 
-    @classmethod
-    def generate_rook_attack_ray(cls, square, dir_idx) -> None:
+    def generate_rook_attack_ray(self, square, dir_idx) -> None:
         attack_ray = PrecomputingMoves.orthogonal_mm[square][dir_idx]
         for attacking_square in attack_ray:
-            piece = cls.board.squares[attacking_square]
-            cls.attack_map.add(attacking_square)
+            piece = self.board.squares[attacking_square]
+            self.attack_map.add(attacking_square)
             # Attacking square occupied, break
             if piece:
-                if Piece.is_piece(piece, cls.board.moving_color, Piece.king):
+                if Piece.is_piece(piece, self.board.moving_color, Piece.king):
                     continue
                 break
 
-    @classmethod
-    def get_cannon_imposed_limits(cls, cannon, dir_idx):
+    def get_cannon_imposed_limits(self, cannon, dir_idx):
         """
-        Adds pins and illegal squares to instance variables "pinned_squares" and "illegal_squares" 
+        Adds pins and illegal squares to instance variables "pinned_squares" and "block_check_hash" 
         :param cannon: square occupied by the cannon imposing the limits
         """
-        offset = cls.dir_offsets[dir_idx]
+        offset = self.dir_offsets[dir_idx]
         # A screen is the piece between opponent cannon and the captured piece
         friendly_screens = set()
         screens = set()
         double_block = False
         visited_squares = {cannon}
-        for step in range(cls.dist_to_edge[cannon][dir_idx]):
+        for step in range(self.dist_to_edge[cannon][dir_idx]):
             attacking_square = cannon + offset * (step + 1)
-            piece = cls.board.squares[attacking_square]
+            piece = self.board.squares[attacking_square]
             visited_squares.add(attacking_square)
             # Skip empty squares
             if not piece:
                 continue
 
-            if attacking_square == cls.moving_king:
+            if attacking_square == self.moving_king:
                 opponent_screens = screens - friendly_screens
                 # Double screen, blocking checks but pinning friendly screens
                 if double_block:
                     # Friendly screens can't move away from current ray
-                    cls.pinned_squares |= friendly_screens
+                    self.pinned_squares |= friendly_screens
 
                     # -------------------------MISTAKE DOCUMENTATION----------------------------
                     # This is no viable solution to double screen capturing, because we
@@ -720,34 +730,36 @@ class LegalMoveGenerator:
                     # if not friendly_screens:
                     #     continue
                     # for screen in opponent_screens:
-                    #     cls.block_check_hash[screen] = cls.block_check_hash.get(screen, 0) - 1
+                    #     self.block_check_hash[screen] = self.block_check_hash.get(screen, 0) - 1
                     #----------------------------------------------------------------------------
 
-                    cls.double_screens |= screens
+                    self.double_screens |= screens
                     # King can't capture any opponent screens as it would move him into check
-                    cls.attack_map |= opponent_screens
+                    self.attack_map |= opponent_screens
                     break
                 # Single screen
                 if screens:
-                    cls.checks += 1
+                    self.checks += 1
                     # Fiendly screen / block piece can prevent check by moving away
                     if friendly_screens:
-                        cls.cause_cannon_defect = next(iter(friendly_screens))
-                    cls.checking_cannon_square = cannon
+                        self.cause_cannon_defect = next(iter(friendly_screens))
+                    self.checking_cannon_square = cannon
+                    # Copied, as the loop goes on adding the squares behind the king
+                    self.cannon_check_ray = set(visited_squares)
                     # Can move to any visited square except the screen to prevent check
                     for block_square in visited_squares - screens:
-                        cls.block_check_hash[block_square] = cls.block_check_hash.get(block_square, 0) + 1
+                        self.block_check_hash[block_square] = self.block_check_hash.get(block_square, 0) + 1
                 else:
                     # All squares between king and opponent cannon empty, so mark them as illegal
                     # as moving to any of them would result in a check
                     for block_square in visited_squares - {cannon}:
-                        cls.block_check_hash[block_square] = cls.block_check_hash.get(block_square, 0) - 1
+                        self.block_check_hash[block_square] = self.block_check_hash.get(block_square, 0) - 1
 
             # This is the third piece we come across, thus preventing any checks / pins
             if double_block:
                 break
             # If piece is friendly, we add it to the friendly blocks
-            if Piece.is_color_no_check(piece, cls.board.moving_color):
+            if Piece.is_color_no_check(piece, self.board.moving_color):
                 friendly_screens.add(attacking_square)
 
             # First piece: block
@@ -755,33 +767,33 @@ class LegalMoveGenerator:
             double_block = bool(screens)
             screens.add(attacking_square)
 
-    @classmethod
-    def get_rook_imposed_limits(cls, rook, dir_idx):
-        offset = cls.dir_offsets[dir_idx]
+    def get_rook_imposed_limits(self, rook, dir_idx):
+        offset = self.dir_offsets[dir_idx]
         friendly_block = None
         visited_squares = {rook}
-        for step in range(cls.dist_to_edge[rook][dir_idx]):
+        for step in range(self.dist_to_edge[rook][dir_idx]):
             attacking_square = rook + offset * (step + 1)
-            piece = cls.board.squares[attacking_square]
+            piece = self.board.squares[attacking_square]
             visited_squares.add(attacking_square)
             # Skip empty squares
             if not piece:
                 continue
             # Detects king
-            if attacking_square == cls.moving_king:
+            if attacking_square == self.moving_king:
                 # There's one friendly piece along current direction, pin it 
                 if friendly_block:
-                    cls.pinned_squares.add(friendly_block)
+                    self.pinned_squares.add(friendly_block)
+                    self.orthogonal_pins.add(friendly_block)
                     return
                 # If there're no blocks, it's a check
-                cls.checks += 1
+                self.checks += 1
                 # Can move to any visited square except the block to prevent check
                 for block_square in visited_squares - {friendly_block}:
-                    cls.block_check_hash[block_square] = cls.block_check_hash.get(block_square, 0) + 1
+                    self.block_check_hash[block_square] = self.block_check_hash.get(block_square, 0) + 1
                 return  
 
             # Friendly piece
-            if Piece.is_color_no_check(piece, cls.board.moving_color):
+            if Piece.is_color_no_check(piece, self.board.moving_color):
                 # Second friendly piece along current direction, so no pins possible
                 if friendly_block:
                     return
@@ -790,24 +802,132 @@ class LegalMoveGenerator:
             # Opponent piece, avoiding any checks and pins
             return
 
-    @classmethod
-    def calculate_attack_data(cls) -> None:
-        cls.exclude_king_moves()
-        cls.flying_general()
-        cls.calculate_horse_attack_data()
-        cls.confine_movement()
-        # print("CHECK: ", cls.checks)
-        # print("SQUARES BLOCKING CHECK: ", cls.block_check_hash) 
+    def load_attack_data(self) -> None:
+        """
+        Loads the attack data for the current position, reusing the one computed two plies ago if possible
+        and calculating it from scratch otherwise
+        """
+        if not self.incremental_attack_data:
+            self.calculate_attack_data()
+            return
+        ply = len(self.board.key_history)
+        frame = self.reuse_attack_data(ply)
+        if frame is None:
+            self.calculate_attack_data()
+            # The dependent squares are only determined once the frame is reused
+            self.attack_frames[ply] = [self.board.zobrist_key, self.generate_quiets, None, self.get_attack_data()]
+            return
+        _, _, dependent_squares, attack_data = frame
+        self.set_attack_data(attack_data)
+        if self.verify_attack_data:
+            self.calculate_attack_data()
+            if attack_data != self.get_attack_data():
+                raise RuntimeError(f"Reused attack data differs from recomputed one: {self.board.load_fen_from_board()}")
+        self.attack_frames[ply] = [self.board.zobrist_key, self.generate_quiets, dependent_squares, attack_data]
+
+    def reuse_attack_data(self, ply: int) -> list:
+        """
+        The position two plies ago had the same side to move, so its attack data still holds if neither of the two moves 
+        since brought an attacker within reach of the king, removed one or changed a square the attack data depends on
+        :return: the frame of two plies ago if its attack data can be reused, else None
+        """
+        frame = self.attack_frames.get(ply - 2)
+        if frame is None:
+            return None
+        zobrist_key, generate_quiets, dependent_squares, _ = frame
+        # The stored frame might belong to a different line of play
+        if zobrist_key != self.board.key_history[-2] or generate_quiets != self.generate_quiets:
+            return None
+        opponent_move, friendly_move = self.board.game_history[-1], self.board.game_history[-2]
+        king_zone = PrecomputingMoves.king_zone[self.moving_king]
+        king_lines = PrecomputingMoves.king_lines[self.moving_king]
+        # None for null moves
+        if opponent_move is not None:
+            moved_from, moved_to, _ = opponent_move
+            piece_type = Piece.get_type_no_check(self.board.squares[moved_to])
+            if piece_type in self.line_attackers and (moved_from in king_lines or moved_to in king_lines):
+                return None
+            if piece_type in self.close_attackers and (moved_from in king_zone or moved_to in king_zone):
+                return None
+        if friendly_move is not None:
+            moved_from, moved_to, captured_piece = friendly_move
+            # King moved
+            if moved_to == self.moving_king:
+                return None
+            if captured_piece:
+                captured_type = Piece.get_type_no_check(captured_piece)
+                if captured_type in self.line_attackers and moved_to in king_lines:
+                    return None
+                if captured_type in self.close_attackers and moved_to in king_zone:
+                    return None
+        # No attackers were added or removed, so the dependent squares are the same as two plies ago
+        if dependent_squares is None:
+            dependent_squares = frame[2] = self.get_dependent_squares()
+        for move in (opponent_move, friendly_move):
+            if move is not None and (move[0] in dependent_squares or move[1] in dependent_squares):
+                return None
+        return frame
+
+    def get_dependent_squares(self) -> set:
+        """
+        :return: set of squares whose occupation the attack data depends on: the moving king's square and moves, the legs
+        of the opponent horses close enough to be considered and all squares of the files and ranks around the king
+        that hold an opponent rook, cannon or king
+        """
+        king_file, king_rank = self.moving_king % 9, self.moving_king // 9
+        dependent_squares = set(PrecomputingMoves.king_mm[self.board.moving_side][self.moving_king])
+        dependent_squares.add(self.moving_king)
+        opponent_pieces = self.board.piece_lists[self.board.opponent_color]
+        for piece_type in self.line_attackers:
+            for square in opponent_pieces[piece_type]:
+                if abs(square % 9 - king_file) < 2:
+                    dependent_squares |= PrecomputingMoves.file_squares[square % 9]
+                if abs(square // 9 - king_rank) < 2:
+                    dependent_squares |= PrecomputingMoves.rank_squares[square // 9]
+        for horse in opponent_pieces[Piece.horse]:
+            if self.board.get_manhattan_dist(horse, self.moving_king) > 4:
+                continue
+            # Squares off the board are never moved to, so going over the edges is fine
+            for offset in self.dir_offsets[:4]:
+                dependent_squares.add(horse + offset)
+        return dependent_squares
 
+    def get_attack_data(self) -> tuple:
+        return (self.attack_map, self.pinned_squares, self.orthogonal_pins, self.horse_pins, self.checks, self.block_check_hash, 
+                self.checking_cannon_square, self.cannon_check_ray, self.double_screens, self.cause_cannon_defect)
 
-    @classmethod
-    def get_legal_moves(cls, square):
-        moves_from_square = list(filter(lambda move: move[0] == square, cls.moves))
+    def set_attack_data(self, attack_data: tuple) -> None:
+        (self.attack_map, self.pinned_squares, self.orthogonal_pins, self.horse_pins, self.checks, self.block_check_hash, 
+         self.checking_cannon_square, self.cannon_check_ray, self.double_screens, self.cause_cannon_defect) = attack_data
+
+    def calculate_attack_data(self) -> None:
+        """
+        Calculates the attack data for the current position from scratch
+        """
+        self.init_attack_data()
+        self.exclude_king_moves()
+        self.flying_general()
+        self.calculate_horse_attack_data()
+        self.confine_movement()
+        # print("CHECK: ", self.checks)
+        # print("SQUARES BLOCKING CHECK: ", self.block_check_hash) 
+
+
+    def get_legal_moves(self, square):
+        moves_from_square = list(filter(lambda move: move[0] == square, self.moves))
         return moves_from_square
 
-    @classmethod
-    def get_legal_targets(cls, square, board: Board=None):
-        if board: cls.load_moves(board) # Updates cls.moves
-        moves_from_square = cls.get_legal_moves(square)
+    def get_legal_targets(self, square, board: Board=None):
+        """
+        :param board: if given, the targets are tested one by one with Legality instead of
+        generating all moves, otherwise they are taken from the last load_moves call
+        :return: list of the squares the piece on square can legally move to
+        """
+        if board: return Legality.get_legal_targets(board, square)
+        moves_from_square = self.get_legal_moves(square)
         targets = list(map(lambda move: move[1], moves_from_square))
-        return targets
\ No newline at end of file
+        return targets
+
+
+# Generator shared by the UI, the game loops and the single threaded searches
+LegalMoveGenerator = MoveGenerator()
@@ -18,10 +18,18 @@ class PrecomputingMoves:
         # Precalculating move maps
         cls.king_mm = cls.get_king_move_map()
         cls.orthogonal_mm = cls.get_orthogonal_move_map()
+        # Rook and cannon slides along ranks and files, indexed by the position on the line and the line's occupancy
+        cls.rank_slides = cls.get_line_slides(9, 1, ((1, 1), (3, -1)))
+        cls.file_slides = cls.get_line_slides(10, 9, ((0, -1), (2, 1)))
         cls.horse_mm = cls.get_horse_move_map()
         cls.advisor_mm = cls.get_advisor_move_map()
         cls.elephant_mm = cls.get_elephant_move_map()
         cls.pawn_mm = cls.get_pawn_move_map()
+        # Squares the attack data around a king depends on, indexed by the king's square
+        cls.king_zone = cls.get_king_zone_map()
+        cls.king_lines = cls.get_king_lines_map()
+        cls.file_squares = [frozenset(range(file, 90, 9)) for file in range(9)]
+        cls.rank_squares = [frozenset(range(rank * 9, rank * 9 + 9)) for rank in range(10)]
 
         cls.action_space = len(cls.action_space_vector)
         cls.action_space_range = range(cls.action_space)
@@ -72,6 +80,28 @@ class PrecomputingMoves:
         cls.dir_offsets.extend(horse_offsets)
         return horse_offsets
 
+    @staticmethod
+    def get_king_zone_map() -> list:
+        """
+        :return: a list of frozensets, one for every king square, containing the squares within a manhattan 
+        distance of 4, which hold all horses and pawns that could attack the king or its moves
+        """
+        return [frozenset(square for square in range(90) if Board.get_manhattan_dist(square, king_square) < 5) 
+                for king_square in range(90)]
+
+    @staticmethod
+    def get_king_lines_map() -> list:
+        """
+        :return: a list of frozensets, one for every king square, containing the squares on the 
+        three files and ranks around the king, along which rooks, cannons and kings attack the king or its moves
+        """
+        king_lines = []
+        for king_square in range(90):
+            king_file, king_rank = Board.get_file_and_rank(king_square)
+            king_lines.append(frozenset(square for square in range(90) 
+                              if abs(square % 9 - king_file) < 2 or abs(square // 9 - king_rank) < 2))
+        return king_lines
+
     @staticmethod
     def get_king_move_map() -> list:
         """
@@ -130,6 +160,39 @@ class PrecomputingMoves:
                     cls.action_space_vector.append((square, target_square))
         return target_squares
 
+    @staticmethod
+    def get_line_slides(length: int, offset: int, directions: tuple) -> list:
+        """
+        :param length: number of squares on the line, 9 for ranks and 10 for files
+        :param offset: offset between neighbouring squares on the line, 1 for ranks and 9 for files
+        :param directions: tuple of (direction index, step along the line) for both directions
+        :return: a list containing a list for every position on the line, indexed by the line's occupancy mask. Each
+        entry holds a tuple (direction index, offsets of the empty squares, offset of the first piece, offset of the
+        second piece) for both directions, the piece offsets being None if there's no such piece. 
+        The first piece blocks a rook or screens a cannon, which can capture the second one
+        """
+        slides = []
+        for position in range(length):
+            slides.append([None] * (1 << length))
+            for occupancy in range(1 << length):
+                # The sliding piece itself occupies its position
+                if not occupancy >> position & 1:
+                    continue
+                entry = []
+                for dir_idx, step in directions:
+                    empty_offsets, piece_offsets = [], []
+                    current = position + step
+                    while 0 <= current < length and len(piece_offsets) < 2:
+                        if occupancy >> current & 1:
+                            piece_offsets.append((current - position) * offset)
+                        elif not piece_offsets:
+                            empty_offsets.append((current - position) * offset)
+                        current += step
+                    piece_offsets += [None] * (2 - len(piece_offsets))
+                    entry.append((dir_idx, tuple(empty_offsets), *piece_offsets))
+                slides[position][occupancy] = tuple(entry)
+        return slides
+
     @classmethod
     def get_horse_move_map(cls) -> list:
         """
@@ -0,0 +1,273 @@
+import sys
+import threading
+from time import perf_counter
+from core.engine.board import Board
+from core.engine.legality import Legality
+from core.engine.move_generator import MoveGenerator
+from core.utils.position_suite import INITIAL_FEN
+from logging import getLogger
+logger = getLogger(__name__)
+
+class UcciEngine:
+    """
+    Headless engine speaking the UCCI protocol (the Xiangqi flavour of UCI) on stdin and stdout,
+    so the agents can be used by other GUIs and services without pygame. \n
+    Supported commands: ucci (or uci), isready, setoption, ucinewgame, position [fen <fen> | startpos] [moves ...],
+    go [depth | movetime | wtime/btime/winc/binc | time/increment | nodes | infinite], stop, quit.
+    The limits of go can be combined, the search ends at the first one reached. \n
+    Squares are written as file a-i and rank 0-9, counted from red's side, e.g. h2e2.
+    The board is always set up with red at the bottom.
+    """
+    # UCCI FENs write horses as "n" and elephants as "b", the board expects "h" and "e" (see Piece.letters)
+    fen_letters = str.maketrans("nbNB", "heHE")
+    name = "CheapChess"
+    author = "CheapChess authors"
+    # Share of the remaining clock time spent on one move, if no movetime is given
+    moves_to_go = 30
+    # Seconds searched by a go without any limit, which would otherwise search up to Dfs.max_depth
+    default_move_time = 5
+
+    def __init__(self, agent: str="ab", input_stream=sys.stdin, output_stream=sys.stdout) -> None:
+        """
+        :param agent: "ab" for alpha-beta search (Dfs) or "az" for MCTS guided by the network
+        """
+        self.agent = agent
+        self.input_stream = input_stream
+        self.output_stream = output_stream
+        self.board = Board(INITIAL_FEN)
+        self.search_thread = None
+        self.search_class = None
+        self.alpha_zero_agent = None
+        self.output_lock = threading.Lock()
+        self.start_time = 0
+
+    def send(self, line: str) -> None:
+        with self.output_lock:
+            self.output_stream.write(line + "\n")
+            self.output_stream.flush()
+
+    @staticmethod
+    def square_to_ucci(square: int) -> str:
+        file, rank = square % 9, square // 9
+        return "abcdefghi"[file] + str(9 - rank)
+
+    @staticmethod
+    def ucci_to_square(coord: str) -> int:
+        file, rank = "abcdefghi".index(coord[0]), 9 - int(coord[1])
+        return rank * 9 + file
+
+    @classmethod
+    def move_to_ucci(cls, move: tuple) -> str:
+        return cls.square_to_ucci(move[0]) + cls.square_to_ucci(move[1])
+
+    @classmethod
+    def ucci_to_move(cls, move_str: str) -> tuple:
+        return cls.ucci_to_square(move_str[:2]), cls.ucci_to_square(move_str[2:4])
+
+    def run(self) -> None:
+        """
+        Reads and handles commands until ``quit`` or the end of the input
+        """
+        for line in self.input_stream:
+            if not self.handle(line.strip()):
+                break
+        self.stop()
+
+    def handle(self, line: str) -> bool:
+        """
+        :return: False if the engine should quit
+        """
+        if not line:
+            return True
+        command, *args = line.split()
+        match command:
+            case "ucci" | "uci":
+                self.send(f"id name {self.name}")
+                self.send(f"id author {self.author}")
+                self.send("option agent type combo default ab var ab var az")
+                self.send("option usebook type check default true")
+                self.send(f"{command}ok")
+            case "isready":
+                self.send("readyok")
+            case "setoption":
+                self.set_option(args)
+            case "ucinewgame":
+                self.stop()
+                self.search_class = None
+            case "position":
+                self.stop()
+                self.set_position(args)
+            case "go":
+                self.stop()
+                self.go(args)
+            case "stop":
+                self.stop()
+            case "quit":
+                return False
+            case _:
+                logger.warning(f"unknown command '{line}'")
+        return True
+
+    def set_option(self, args: list) -> None:
+        """
+        Handles both ``setoption name agent value az`` (UCI) and ``setoption agent az`` (UCCI),
+        options are agent (ab, az) and usebook (true, false)
+        """
+        args = [arg for arg in args if arg not in ("name", "value")]
+        if len(args) == 2 and args[0].lower() == "agent" and args[1] in ("ab", "az"):
+            self.agent = args[1]
+        elif len(args) == 2 and args[0].lower() == "usebook" and args[1] in ("true", "false"):
+            from core.engine.ai.config import BookConfig
+            BookConfig.use_book = args[1] == "true"
+        else:
+            logger.warning(f"unknown option {' '.join(args)}")
+
+    def set_position(self, args: list) -> None:
+        """
+        :param args: [fen <fen fields> | startpos] [moves <moves>]
+        """
+        moves = []
+        if "moves" in args:
+            moves = args[args.index("moves") + 1:]
+            args = args[:args.index("moves")]
+        if args and args[0] == "fen":
+            fields = args[1:]
+            # UCCI writes the side to move as "r" (red) or "b", the board expects "w" for red
+            if len(fields) > 1 and fields[1] == "r":
+                fields[1] = "w"
+            if fields:
+                fields[0] = fields[0].translate(self.fen_letters)
+            # Missing side to move and move counters
+            fields += ["w", "-", "-", "0", "1"][len(fields) - 1:]
+            fen = " ".join(fields)
+        else:
+            fen = INITIAL_FEN
+        self.board = Board(fen)
+        for move_str in moves:
+            move = self.ucci_to_move(move_str)
+            if not Legality.is_legal(self.board, move):
+                logger.error(f"illegal move {move_str} in position command")
+                break
+            self.board.make_move(move)
+
+    def get_time_limit(self, options: dict) -> float:
+        """
+        :return: seconds to search, None if the search is only limited by depth or stop
+        """
+        if "movetime" in options:
+            return options["movetime"] / 1000
+        own, increment = ("wtime", "winc") if self.board.moving_color else ("btime", "binc")
+        # UCCI only sends the own time
+        own_time = options.get(own, options.get("time"))
+        if own_time is None:
+            return None
+        own_increment = options.get(increment, options.get("increment", 0))
+        return max(own_time / self.moves_to_go + own_increment / 2, 10) / 1000
+
+    def go(self, args: list) -> None:
+        """
+        Starts the search on a background thread, which answers with ``bestmove``
+        """
+        options = {}
+        for i, arg in enumerate(args[:-1]):
+            if args[i + 1].isdigit():
+                options[arg] = int(args[i + 1])
+        infinite = "infinite" in args
+        if not infinite and self.send_book_move():
+            return
+        time_limit = None if infinite else self.get_time_limit(options)
+        depth, nodes = options.get("depth"), options.get("nodes")
+        if not infinite and not (depth or nodes or time_limit):
+            time_limit = self.default_move_time
+        search = self.search_alpha_zero if self.agent == "az" else self.search_alpha_beta
+        self.start_time = perf_counter()
+        self.search_thread = threading.Thread(target=self.run_search, args=(search, depth, time_limit, nodes), daemon=True)
+        self.search_thread.start()
+
+    def send_book_move(self) -> bool:
+        """
+        :return: True if the position is in the opening book and its move was sent, no search is needed then
+        """
+        from core.engine.ai.opening_book import OpeningBook
+        opening_book = OpeningBook.get_default()
+        book_move = opening_book.probe(self.board) if opening_book else None
+        if not book_move:
+            return False
+        self.send(f"info string book move {self.move_to_ucci(book_move)}")
+        self.send_best_move(book_move)
+        return True
+
+    def stop(self) -> None:
+        """
+        Aborts a running search and waits for its ``bestmove``
+        """
+        if not self.search_thread:
+            return
+        # The search resets the flag when it starts, so it's set until the thread is done
+        while self.search_thread.is_alive():
+            if self.search_class:
+                self.search_class.abort_search = True
+            self.search_thread.join(timeout=.05)
+        self.search_thread = None
+
+    def report_iteration(self, depth: int, evaluation: int, nodes: int, principal_variation: list) -> None:
+        elapsed = perf_counter() - self.start_time
+        mate_distance = self.search_class.checkmate_value - abs(evaluation)
+        if mate_distance <= self.search_class.max_depth:
+            score = f"mate {(mate_distance + 1) // 2 * (1 if evaluation > 0 else -1)}"
+        else:
+            score = f"cp {evaluation}"
+        pv = " ".join(self.move_to_ucci(move) for move in principal_variation)
+        self.send(f"info depth {depth} score {score} nodes {nodes} nps {int(nodes / elapsed) if elapsed else 0} "
+                  f"time {int(elapsed * 1000)} pv {pv}")
+
+    def send_best_move(self, move: tuple) -> None:
+        if move is None:
+            # Aborted before the first iteration completed
+            moves = MoveGenerator(self.board).load_moves()
+            move = moves[0] if moves else None
+        self.send(f"bestmove {self.move_to_ucci(move)}" if move else "nobestmove")
+
+    def run_search(self, search, depth: int, time_limit: float, nodes: int) -> None:
+        """
+        Runs the search and answers with its move. If it fails, the error is logged and ``nobestmove`` is sent,
+        so the GUI isn't left waiting
+        :param search: search_alpha_beta or search_alpha_zero
+        """
+        move, failed = None, True
+        try:
+            move = search(depth, time_limit, nodes)
+            failed = False
+        except Exception:
+            logger.exception("search failed")
+        finally:
+            if failed:
+                self.send("nobestmove")
+            else:
+                self.send_best_move(move)
+
+    def search_alpha_beta(self, depth: int, time_limit: float, nodes: int) -> tuple:
+        """
+        Iterative deepening up to depth (Dfs.max_depth if None) until time_limit or the node limit is reached
+        """
+        from core.engine.ai.alphabeta import Dfs
+        if not self.search_class:
+            self.search_class = Dfs.fork()
+            self.search_class.on_iteration = self.report_iteration
+        return self.search_class.search(self.board, algorithm="pvs", time_limit=time_limit, max_depth=depth or Dfs.max_depth,
+                                        node_limit=nodes)
+
+    def search_alpha_zero(self, depth: int, time_limit: float, nodes: int) -> tuple:
+        """
+        MCTS runs a fixed number of simulations (PlayConfig.simulations_per_move), depth, time and nodes aren't used
+        """
+        from core.engine.ai.selfplay_rl import AlphaZeroAgent
+        if not self.alpha_zero_agent:
+            self.alpha_zero_agent = AlphaZeroAgent()
+        move = self.alpha_zero_agent.choose_action(self.board)
+        mcts = self.alpha_zero_agent.mcts
+        elapsed = perf_counter() - self.start_time
+        simulations = mcts.config.simulations_per_move
+        self.send(f"info depth {mcts.max_depth} nodes {simulations} nps {int(simulations / elapsed) if elapsed else 0} "
+                  f"time {int(elapsed * 1000)} pv {self.move_to_ucci(move)}")
+        return move
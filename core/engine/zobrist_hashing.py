@@ -1,57 +1,143 @@
 import numpy as np
+import pickle
 
 class ZobristHashing:
     """
-    A neat way to generate n-bit binaries for a given position, 
-    showing that sometimes benefits of speed outweigh imperfection (rare hash collisions)
+    A neat way to generate n-bit binaries for a given position,
+    showing that sometimes benefits of speed outweigh imperfection (rare hash collisions). \n
+    Keys are unsigned 64-bit integers drawn from a seeded generator, so every process (whatever its start method)
+    and every run computes the same key for the same position, and keys can be shared between processes or stored
+    in files. A table saved with save_table() can be used instead by calling load_table() before creating boards.
     """
-    lowest_value = 0
-    
-    ### Didn't put this in a class function because it would have had to be called in every child process
-    ### leading toa lot of redudancy
-
     # Set the seed to wedding anniversary of my parents for good luck :)
-    # np.random.seed(110697) # Had to take this out for uniqueness of multiprocess training pipeline
-    largest_64 = "1" * 63
-    highest_value = int(largest_64, 2)
-    lowest_value = -highest_value
-    # Create a random value for each square for each piece for each side
+    seed = 110697
+    num_bits = 64
+    largest_64 = 2 ** num_bits - 1
+    # Create a random value for each square for each piece for each color
     num_sides = 2
     num_pieces = 7
     num_squares = 90
 
-    table = np.random.randint(
-        lowest_value, 
-        highest_value, 
-        (num_sides, num_pieces, num_squares),
-        dtype=np.int64
-        )
+    # Kept as python ints, xoring those is faster than xoring numpy scalars
+    table = []
+    # The same keys as uint64 array of shape (15, 90), indexed by color * 7 + piece type and square,
+    # with a last row of zeros for empty squares. Used to hash many positions at once
+    np_table = None
+    empty_index = num_sides * num_pieces
+    # Xored into the key if red is to move, in place of xoring the moving side into the lowest bit
+    side_key = 0
+
+    @classmethod
+    def init_table(cls, seed: int=None) -> None:
+        """
+        Generates the keys from ``seed`` (ZobristHashing.seed by default)
+        """
+        rng = np.random.default_rng(cls.seed if seed is None else seed)
+        keys = rng.integers(0, cls.largest_64, cls.num_sides * cls.num_pieces * cls.num_squares + 1,
+                            dtype=np.uint64, endpoint=True).tolist()
+        cls.set_keys(keys)
+
+    @classmethod
+    def set_keys(cls, keys: list) -> None:
+        """
+        :param keys: flat list of all piece-square keys followed by the side key
+        """
+        cls.side_key = keys[-1]
+        starts = range(0, len(keys) - 1, cls.num_squares)
+        piece_keys = [keys[start:start + cls.num_squares] for start in starts]
+        cls.table = [piece_keys[side * cls.num_pieces:(side + 1) * cls.num_pieces] for side in range(cls.num_sides)]
+        cls.np_table = np.zeros((cls.empty_index + 1, cls.num_squares), dtype=np.uint64)
+        cls.np_table[:cls.empty_index] = np.array(cls.table, dtype=np.uint64).reshape(cls.empty_index, cls.num_squares)
+        assert cls.has_unique_keys(), "zobrist keys have to be distinct and non-zero"
 
-    @staticmethod
-    def get_largest_64_bit():
+    @classmethod
+    def get_keys(cls) -> list:
+        return [key for side in cls.table for piece in side for key in piece] + [cls.side_key]
+
+    @classmethod
+    def has_unique_keys(cls) -> bool:
+        keys = cls.get_keys()
+        return len(set(keys)) == len(keys) and 0 not in keys
+
+    @classmethod
+    def save_table(cls, filepath: str) -> None:
+        with open(filepath, "wb") as f:
+            pickle.Pickler(f).dump(cls.get_keys())
+
+    @classmethod
+    def load_table(cls, filepath: str) -> None:
+        """
+        Replaces the keys by the ones saved in ``filepath``, boards created before keep their old keys
+        """
+        with open(filepath, "rb") as f:
+            cls.set_keys(pickle.Unpickler(f).load())
+
+    @classmethod
+    def get_largest_64_bit(cls):
         """
         :return: does exactly what the name proposes,
         returns the largest 64-Bit number possible
         """
-        # num = "1" * 64
-        num = "1" * 63
-        return int(num, 2)
+        return cls.largest_64
 
     @classmethod
-    def digest(cls, moving_side: int, piece_lists: list):
+    def digest(cls, moving_color: int, piece_lists: list):
         """
         :return: The zobrist key for the current board
         """
         zobrist_key = 0
-        # Loop over every piece side
-        for side, piece_list in enumerate(piece_lists):
+        # Loop over every piece color
+        for color, piece_list in enumerate(piece_lists):
             # Loop over every piece list
             for piece_id, squares in enumerate(piece_list):
                 # Loop over every square
                 for square in squares:
                     # Xor the table value into the key
-                    zobrist_key ^= cls.table[side][piece_id][square]
-        zobrist_key ^= moving_side
+                    zobrist_key ^= cls.table[color][piece_id][square]
+        if moving_color:
+            zobrist_key ^= cls.side_key
 
         return zobrist_key
-            
+
+    @classmethod
+    def digest_squares(cls, piece_indices: np.ndarray, moving_colors: np.ndarray=None) -> np.ndarray:
+        """
+        Hashes a batch of positions with numpy, e.g. to find duplicates in training data or to fill a cache
+        :param piece_indices: integer array of shape (n, 90) or (90,) holding color * 7 + piece type
+        of the piece on every square, 14 (ZobristHashing.empty_index) if it's empty
+        :param moving_colors: array of shape (n,), the side key is xored into the keys where it's 1
+        :return: uint64 array of shape (n,), equal to Board.zobrist_key of the positions
+        """
+        piece_indices = np.asarray(piece_indices).reshape(-1, cls.num_squares)
+        keys = np.bitwise_xor.reduce(cls.np_table[piece_indices, np.arange(cls.num_squares)], axis=1)
+        if moving_colors is not None:
+            keys ^= np.where(np.asarray(moving_colors) != 0, np.uint64(cls.side_key), np.uint64(0))
+        return keys
+
+    @classmethod
+    def digest_bitboards(cls, bitboards: np.ndarray, moving_colors: np.ndarray=None) -> np.ndarray:
+        """
+        :param bitboards: array of shape (n, 2, 7, 90) or (2, 7, 90), non-zero where a piece is.
+        The first axis of the planes is used as color, so the keys equal Board.zobrist_key for bitboards
+        created with ``adjust_perspective=False``, see Board.piecelist_to_bitboard()
+        :return: uint64 array of shape (n,), see digest_squares()
+        """
+        occupied = np.asarray(bitboards).reshape(-1, cls.empty_index, cls.num_squares) != 0
+        piece_indices = np.where(occupied.any(axis=1), occupied.argmax(axis=1), cls.empty_index)
+        return cls.digest_squares(piece_indices, moving_colors)
+
+    @classmethod
+    def digest_boards(cls, boards: list) -> list:
+        """
+        :return: the zobrist keys of all boards as python ints, the same as their zobrist_key
+        """
+        if not boards:
+            return []
+        empty = cls.empty_index
+        piece_indices = np.array([
+            [piece[0] * cls.num_pieces + piece[1] if piece else empty for piece in board.squares] for board in boards
+        ])
+        moving_colors = np.array([board.moving_color for board in boards])
+        return cls.digest_squares(piece_indices, moving_colors).tolist()
+
+ZobristHashing.init_table()
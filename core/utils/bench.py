@@ -0,0 +1,140 @@
+"""
+Reproducible end-to-end speed benchmark over the fixed position suite: perft, alpha-beta search at a fixed depth
+and MCTS at a fixed number of simulations, plus the import time of the modes that shouldn't load tensorflow.
+Node counts don't depend on the machine, so their sum is a signature that changes whenever move generation
+or search behave differently, while the rates measure the speed.
+"""
+from core.engine import Board, MoveGenerator, LegalMoveGenerator
+from core.utils.perft_utility import get_perft_result
+from core.utils.position_suite import SEARCH_POSITIONS
+from time import perf_counter
+import json
+import subprocess
+import sys
+from logging import getLogger
+logger = getLogger(__name__)
+
+class BenchConfig:
+    perft_depth = 3
+    search_depth = 4
+    mcts_simulations = 25
+    positions = SEARCH_POSITIONS
+    # Modules behind the modes that shouldn't need the ML stack
+    import_modules = ["core.engine", "core.engine.ai.alphabeta", "core.utils.perft_utility", "core.engine.ucci"]
+    ml_modules = ["tensorflow", "keras"]
+
+# Run in a fresh interpreter, so nothing is imported already
+IMPORT_TIME_SCRIPT = """
+import json, sys
+from time import perf_counter
+t0 = perf_counter()
+import {module}
+print(json.dumps({{"time": perf_counter() - t0, "ml_modules": [m for m in {ml_modules} if m in sys.modules]}}))
+"""
+
+def bench_imports(modules: list=BenchConfig.import_modules) -> dict:
+    """
+    Measures the time it takes to import each module in a new process
+    :return: hash map of the modules and a hash map with their import time and the ML modules they loaded,
+    None for a module that failed to import
+    """
+    results = {}
+    for module in modules:
+        script = IMPORT_TIME_SCRIPT.format(module=module, ml_modules=BenchConfig.ml_modules)
+        process = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+        if process.returncode:
+            logger.warning(f"importing {module} failed: {process.stderr.strip().splitlines()[-1]}")
+            results[module] = None
+            continue
+        results[module] = json.loads(process.stdout.strip().splitlines()[-1])
+    return results
+
+def bench_perft(depth: int=BenchConfig.perft_depth) -> dict:
+    """
+    :return: hash map with the number of leaf nodes and the time it took over all positions
+    """
+    nodes, time = 0, 0
+    for fen in BenchConfig.positions:
+        board = Board(fen)
+        move_generator = MoveGenerator(board)
+        t0 = perf_counter()
+        nodes += get_perft_result(depth, board, move_generator)[0]
+        time += perf_counter() - t0
+    return {"nodes": nodes, "time": time, "nps": nodes / time}
+
+def bench_search(depth: int=BenchConfig.search_depth) -> dict:
+    """
+    :return: hash map with the number of nodes Dfs visited, the time it took over all positions
+    and the share of beta cutoffs caused by the first move
+    """
+    from core.engine.ai.alphabeta import Dfs
+    search_depth = Dfs.search_depth
+    Dfs.search_depth = depth
+    nodes, time = 0, 0
+    first_move_cutoffs, cutoffs = 0, 0
+    try:
+        for fen in BenchConfig.positions:
+            board = Board(fen)
+            LegalMoveGenerator.init_board(board)
+            t0 = perf_counter()
+            Dfs.search(board, algorithm="pvs")
+            time += perf_counter() - t0
+            nodes += Dfs.nodes
+            first_move_cutoffs += Dfs.stats.cutoffs_by_move_index.get(0, 0)
+            cutoffs += sum(Dfs.stats.cutoffs_by_move_index.values())
+    finally:
+        Dfs.search_depth = search_depth
+    return {"nodes": nodes, "time": time, "nps": nodes / time,
+            "first_move_cutoff_rate": first_move_cutoffs / cutoffs if cutoffs else 0}
+
+def bench_mcts(simulations: int=BenchConfig.mcts_simulations) -> dict:
+    """
+    Runs the simulations with an untrained network, its outputs aren't deterministic so neither is the tree.
+    :return: hash map with the number of simulations and the time they took over all positions,
+    None if tensorflow isn't installed
+    """
+    try:
+        from core.engine.ai.selfplay_rl import CNN, MCTS, PlayConfig
+    except ImportError as e:
+        logger.warning(f"skipping MCTS benchmark: {e}")
+        return None
+    class BenchPlayConfig(PlayConfig):
+        simulations_per_move = simulations
+    nnet = CNN()
+    total_simulations, time = 0, 0
+    for fen in BenchConfig.positions:
+        board = Board(fen)
+        mcts = MCTS(nnet, config=BenchPlayConfig)
+        bitboards = list(board.piecelist_to_bitboard())
+        t0 = perf_counter()
+        mcts.get_visit_counts(board, bitboards=bitboards)
+        time += perf_counter() - t0
+        total_simulations += simulations
+    return {"simulations": total_simulations, "time": time, "sps": total_simulations / time}
+
+def run_bench() -> dict:
+    """
+    Runs all benchmarks and prints a summary
+    :return: hash map of the benchmark results, "signature" being the sum of perft and search nodes
+    """
+    results = {
+        "imports": bench_imports(),
+        "perft": bench_perft(),
+        "search": bench_search(),
+        "mcts": bench_mcts(),
+    }
+    results["signature"] = results["perft"]["nodes"] + results["search"]["nodes"]
+    for module, result in results["imports"].items():
+        if result:
+            loaded = f" || loads {', '.join(result['ml_modules'])}" if result["ml_modules"] else ""
+            print(f"import {module}: {result['time']:.3f}s{loaded}")
+    print(f"perft depth {BenchConfig.perft_depth}: {results['perft']['nodes']} nodes "
+          f"|| {results['perft']['time']:.2f}s || {results['perft']['nps']:.0f} nps")
+    print(f"search depth {BenchConfig.search_depth}: {results['search']['nodes']} nodes "
+          f"|| {results['search']['time']:.2f}s || {results['search']['nps']:.0f} nps "
+          f"|| first move cutoffs: {results['search']['first_move_cutoff_rate']:.1%}")
+    if results["mcts"]:
+        print(f"mcts: {results['mcts']['simulations']} simulations "
+              f"|| {results['mcts']['time']:.2f}s || {results['mcts']['sps']:.1f} simulations/s")
+    print(f"signature: {results['signature']}")
+    return results
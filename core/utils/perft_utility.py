@@ -1,5 +1,9 @@
-from core.engine import LegalMoveGenerator, Board
+from core.engine import LegalMoveGenerator, MoveGenerator, Board
+from core.engine.ai.config import BaseConfig
+from core.utils.position_suite import PERFT_RESULTS
+from concurrent.futures import ProcessPoolExecutor
 from time import perf_counter
+import json
 from logging import getLogger
 logger = getLogger(__name__)
 
@@ -18,16 +22,53 @@ def start_search(board: Board):
     if iterative:
         depths = range(1, depth + 1)
     for d in depths:
-        get_num_positions(d, board)
+        get_num_positions(d, board, divide=d == depth)
 
-def get_perft_result(depth: int, board: Board):
+class PerftTable:
+    """
+    Bounded cache of perft results keyed by (zobrist key, depth), so transposed positions are only counted once.
+    Backed by a fixed size list indexed by the key, newer entries replace older ones on index collisions.
+    The depth is part of the key, which also pins the side to move, as perft always starts from the same root
+    """
+    def __init__(self, size: int=2 ** 20) -> None:
+        self.size = size
+        self.table = [None] * size
+        self.probes = 0
+        self.hits = 0
+
+    def get_index(self, key: int, depth: int) -> int:
+        return int(key + depth) % self.size
+
+    def probe(self, key: int, depth: int):
+        """
+        :return: tuple (number of positions, traversed nodes) if stored, else None
+        """
+        self.probes += 1
+        entry = self.table[self.get_index(key, depth)]
+        if entry and entry[0] == key and entry[1] == depth:
+            self.hits += 1
+            return entry[2]
+        return None
+
+    def store(self, key: int, depth: int, result: tuple) -> None:
+        self.table[self.get_index(key, depth)] = (key, depth, result)
+
+    def get_hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes else 0
+
+def get_perft_result(depth: int, board: Board, move_generator: MoveGenerator=LegalMoveGenerator, table: PerftTable=None):
     """
     A performance test for move generation algorithms by calculating the number
     of board configurations found for a given number of moves in the future
+    :param table: optional cache for the results of transposed positions, leaves aren't cached
     :return: The branching factor b to the power of depth d, in other words:
     The total number of possible positions found looking depth moves ahead
     """
-    moves = LegalMoveGenerator.load_moves()
+    if table and depth > 1:
+        result = table.probe(board.zobrist_key, depth)
+        if result:
+            return result
+    moves = move_generator.load_moves(board)
     traversed_nodes = len(moves)
     num_positions = 0
     if not depth - 1:
@@ -35,28 +76,142 @@ def get_perft_result(depth: int, board: Board):
         return num_positions, traversed_nodes
     for move in moves:
         board.make_move(move, search_state=True)
-        num_pos, traversed_n = get_perft_result(depth - 1, board)
+        num_pos, traversed_n = get_perft_result(depth - 1, board, move_generator, table)
         num_positions += num_pos
         traversed_nodes += traversed_n
         board.reverse_move(search_state=True)
+    if table:
+        table.store(board.zobrist_key, depth, (num_positions, traversed_nodes))
     return num_positions, traversed_nodes
 
-def multiprocess_perft(depth: int, board: Board):
-    moves = LegalMoveGenerator.load_moves()
-    num_positions = 0
-    if not depth - 1:
-        num_positions += len(moves)
-        return num_positions
-    for move in moves:
-        board.make_move(move, search_state=True)
-        num_positions += get_perft_result(depth - 1, board)
-        board.reverse_move(search_state=True)
-    return num_positions
+# Cache of the current worker process, kept across the root moves it's given
+worker_table = None
 
-def get_num_positions(depth: int, board: Board):
+def perft_root_move(fen: str, play_as_red: bool, move: tuple, depth: int, hash_size: int=0):
+    """
+    Runs in a child process, which sets up its own board and move generator
+    :param hash_size: number of PerftTable entries of the worker, 0 disables caching
+    :return: tuple (move, number of positions found depth - 1 moves after making it, traversed nodes, 
+    table probes, table hits)
+    """
+    global worker_table
+    if hash_size and (not worker_table or worker_table.size != hash_size):
+        worker_table = PerftTable(hash_size)
+    table = worker_table if hash_size else None
+    probes, hits = (table.probes, table.hits) if table else (0, 0)
+    board = Board(fen, play_as_red)
+    move_generator = MoveGenerator(board)
+    board.make_move(move, search_state=True)
+    if depth == 1:
+        return move, 1, 0, 0, 0
+    num_positions, traversed_nodes = get_perft_result(depth - 1, board, move_generator, table)
+    if table:
+        probes, hits = table.probes - probes, table.hits - hits
+    return move, num_positions, traversed_nodes, probes, hits
+
+def multiprocess_perft(depth: int, board: Board, processes: int=None, hash_size: int=0):
+    """
+    Splits the root moves across a process pool
+    :param processes: maximum number of processes, defaults to BaseConfig.max_processes
+    :param hash_size: number of PerftTable entries per process, 0 disables caching
+    :return: tuple (number of positions, traversed nodes, hash map of root moves and their number of positions,
+    table hit rate)
+    """
+    moves = MoveGenerator(board).load_moves()
+    fen, play_as_red = board.load_fen_from_board(), not board.is_red_up
+    divide = {}
+    traversed_nodes = len(moves)
+    probes = hits = 0
+    with ProcessPoolExecutor(max_workers=processes or BaseConfig.max_processes) as executor:
+        futures = [executor.submit(perft_root_move, fen, play_as_red, move, depth, hash_size) for move in moves]
+        for future in futures:
+            move, num_positions, traversed_n, move_probes, move_hits = future.result()
+            divide[move] = num_positions
+            traversed_nodes += traversed_n
+            probes += move_probes
+            hits += move_hits
+    return sum(divide.values()), traversed_nodes, divide, hits / probes if probes else 0
+
+def get_num_positions(depth: int, board: Board, divide: bool=False, processes: int=None, hash_size: int=0):
+    """
+    Runs a parallel perft, logs its speed and checks it against PERFT_RESULTS if the position is listed
+    :param divide: log the number of positions found after every root move
+    :return: hash map with the results, see run_perft()
+    """
+    result = run_perft(board, depth, processes, hash_size)
+    if divide:
+        for move, num_positions in sorted(result["divide"].items()):
+            logger.info(f"{board.get_move_notation(move)} {move}: {num_positions}")
+    logger.info(f"depth: {depth} || num_leafs={result['nodes']} || traversed={result['traversed']} "
+                f"|| time: {round(result['time'], 2)} || nps: {round(result['nps'])} || hash hits: {result['hash_hit_rate']:.1%} || expected: {result['expected']}")
+    if result["expected"] is not None and not result["passed"]:
+        logger.error(f"perft mismatch at depth {depth}: {result['nodes']} instead of {result['expected']}")
+    return result
+
+def run_perft(board: Board, depth: int, processes: int=None, hash_size: int=0):
+    """
+    :return: hash map containing the fen, depth, number of positions (nodes), traversed nodes, time in seconds,
+    leaf nodes per second, the divide counts, the perft table hit rate, the expected result (None if the position 
+    isn't in PERFT_RESULTS) and whether it was met
+    """
+    fen = board.load_fen_from_board()
     p_t = perf_counter()
-    num_leafs, traversed = get_perft_result(depth, board)
+    num_leafs, traversed, divide, hash_hit_rate = multiprocess_perft(depth, board, processes, hash_size)
     time = perf_counter() - p_t
-    logger.info(f"depth: {depth} || {num_leafs=} || {traversed=} || time: {round(time, 2)}")
+    expected = get_expected_result(fen, depth)
+    return {
+        "fen": fen,
+        "depth": depth,
+        "nodes": num_leafs,
+        "traversed": traversed,
+        "time": time,
+        "nps": num_leafs / time if time else 0,
+        "divide": divide,
+        "hash_hit_rate": hash_hit_rate,
+        "expected": expected,
+        "passed": expected is None or expected == num_leafs,
+    }
 
-    
\ No newline at end of file
+def get_expected_result(fen: str, depth: int):
+    """
+    :return: the known number of positions for the fen at depth, None if unknown.
+    Move counters aren't compared, as they don't influence the result
+    """
+    position = fen.split(" ")[:2]
+    for reference_fen, results in PERFT_RESULTS.items():
+        if reference_fen.split(" ")[:2] == position and depth <= len(results):
+            return results[depth - 1]
+    return None
+
+def run_perft_suite(max_depth: int, processes: int=None, hash_size: int=0):
+    """
+    Verifies the move generator against every position of PERFT_RESULTS up to max_depth
+    :return: list of result hash maps, see run_perft()
+    """
+    results = []
+    for fen, reference in PERFT_RESULTS.items():
+        board = Board(fen)
+        for depth in range(1, min(max_depth, len(reference)) + 1):
+            results.append(get_num_positions(depth, board, processes=processes, hash_size=hash_size))
+    failed = sum(not result["passed"] for result in results)
+    logger.info(f"perft suite: {len(results) - failed}/{len(results)} passed")
+    return results
+
+def run_batch_perft(config) -> int:
+    """
+    Non-interactive perft for ``main.py --perft DEPTH``, printing a JSON list with the results
+    for every depth from 1 to DEPTH to stdout (see run_perft(), without the divide counts)
+    :param config: parsed command line arguments, see manager.py
+    :return: exit code, 1 if a result didn't match the known one
+    """
+    from core.utils import BoardUtility
+    fen = config.fen or BoardUtility.get_inital_fen(not config.play_as_black, not config.move_second)
+    board = Board(fen, not config.play_as_black)
+    processes = config.processes or config.cores
+    results = []
+    for depth in range(1, config.perft_depth + 1):
+        result = run_perft(board, depth, processes, config.hash_size)
+        del result["divide"]
+        results.append(result)
+    print(json.dumps(results, indent=2))
+    return int(not all(result["passed"] for result in results))
@@ -0,0 +1,32 @@
+"""
+Fixed Xiangqi positions shared by the benchmarks, so their results stay comparable over time.
+Red (upper case) is at the bottom in all of them.
+"""
+
+INITIAL_FEN = "rheakaehr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RHEAKAEHR w - - 0 1"
+
+SEARCH_POSITIONS = [
+    INITIAL_FEN,
+    "r1ea1a3/4kh3/2h1e4/pHp1p1p1p/4c4/6P2/P1P2R2P/1CcC5/9/2EAKAE2 w - - 0 1",
+    "1ceak4/9/h2a5/2p1p3p/5cp2/2h2H3/6PCP/3AE4/2C6/3A1K1H1 w - - 0 1",
+    "5a3/3k5/3aR4/9/5r3/5h3/9/3A1A3/5K3/2EC2E2 w - - 0 1",
+    "CRH1k1e2/3ca4/4ea3/9/2hr5/9/9/4E4/4A4/4KA3 w - - 0 1",
+    "R1H1k1e2/9/3aea3/9/2hr5/2E6/9/4E4/4A4/4KA3 w - - 0 1",
+]
+
+# Black's cannon captures the checking horse with its own king as screen, a move that is legal
+# although the square lies behind the king on the cannon's check ray
+CANNON_BEHIND_KING_FEN = "1hea1ah2/r1Hk2cC1/3C5/p7p/2p1pP3/P8/2P2R2P/9/9/2EAKcE2 b - - 5 20"
+
+# Known numbers of positions reachable after 1, 2, ... moves (perft), used to verify the move generator.
+# The initial position's counts are the published ones, the others were cross-checked against a
+# naive generator that tests every pseudo-legal move for checks after making it
+PERFT_RESULTS = {
+    INITIAL_FEN: [44, 1920, 79666, 3290240, 133312995],
+    SEARCH_POSITIONS[1]: [38, 1128, 43929, 1339047],
+    SEARCH_POSITIONS[2]: [7, 281, 8620, 326201],
+    SEARCH_POSITIONS[3]: [25, 424, 9850, 202884],
+    SEARCH_POSITIONS[4]: [28, 516, 14808, 395483],
+    SEARCH_POSITIONS[5]: [21, 364, 7626, 162837, 3500505],
+    CANNON_BEHIND_KING_FEN: [11, 555, 15920, 761936],
+}
@@ -1,12 +1,18 @@
 
 def apply_config(config):
-    from core.engine.ai.config import BaseConfig
+    from core.engine.ai.config import BaseConfig, BookConfig
     from core.engine.clock import Clock
 
     BaseConfig.max_processes = config.cores
+    BookConfig.use_book = not config.no_book
     Clock.init(config.time * 60)
+    # The network config loads tensorflow, so it's only imported if needed
+    if config.fast_model:
+        from core.engine.ai.selfplay_rl import ModelConfig
+        ModelConfig.play_model = "fast"
 
-    if not config.no_ui:
+    # Batch perft runs don't need a window
+    if not config.no_ui and not config.perft_depth and not config.run_bench and not config.run_ucci and not config.build_book and not config.build_tablebases and not config.export_lite and not config.distill:
         from core.utils import silence_function
         with silence_function():
             import pygame
@@ -19,9 +25,43 @@ def main():
     from manager import config
     # Not in manager.py so that ``python3 main.py -h`` terminates faster as all modules below aren't imported 
     apply_config(config) 
+    
+    if config.perft_depth:
+        import sys
+        from core.utils.perft_utility import run_batch_perft
+        sys.exit(run_batch_perft(config))
+
+    if config.run_ucci:
+        from core.engine.ucci import UcciEngine
+        UcciEngine(agent=config.agent).run()
+        return
+
+    if config.run_bench:
+        from core.utils.bench import run_bench
+        run_bench()
+        return
+
+    if config.build_book:
+        from core.engine.ai.opening_book import build_opening_book
+        build_opening_book(config.build_book)
+        return
+
+    if config.build_tablebases:
+        from core.engine.ai.tablebase import build_tablebases
+        build_tablebases()
+        return
+
+    if config.export_lite:
+        from core.engine.ai.selfplay_rl.lite_model import export_lite_model
+        export_lite_model(None if config.export_lite == "float32" else config.export_lite)
+        return
+
+    if config.distill:
+        from core.engine.ai.selfplay_rl.distillation import run_distillation
+        run_distillation()
+        return
 
     from core.engine import Board, LegalMoveGenerator
-    from core.engine.ai.selfplay_rl import Pipeline
     from core.utils.perft_utility import start_search
     from core.utils import BoardUtility
     if not config.no_ui:
@@ -45,12 +85,14 @@ def main():
         start_search(board)
 
     if config.run_pipeline:
+        # Loads tensorflow, which the other modes don't need
+        from core.engine.ai.selfplay_rl import Pipeline
         pl = Pipeline(board)
         pl.start_pipeline()
 
     if config.no_ui:
         return
-    ui = UI(board, agent=config.agent)
+    ui = UI(board, agent=config.agent, ponder=config.ponder)
     ui.run()
 
 if __name__ == "__main__":
@@ -10,9 +10,9 @@ def init_parser():
                                     description=program_descr,
                                     epilog="Have fun ;)")
 
-    parser.add_argument("agent", type=str, nargs="?", default="ab", choices=["ab", "az", "abz"],
+    parser.add_argument("agent", type=str, nargs="?", default="ab", choices=["ab", "az", "abz", "hab"],
                         help="AI-agent playing in interactive environment \
-                            (ab: Alpha-Beta, az: AlphaZero, abz: Alpha-Beta-Zero) \
+                            (ab: Alpha-Beta, az: AlphaZero, abz: Alpha-Beta-Zero, hab: Alpha-Beta with network evaluation) \
                             (default: ab)")
     parser.add_argument("cores", type=int, nargs="?", default=mp.cpu_count(),
                         help="maximum number of processors to use for pipeline \
@@ -22,14 +22,39 @@ def init_parser():
 
     parser.add_argument("--chinese", dest="chinese_style", action="store_true", 
                         help="rendering chinese style UI")
-    parser.add_argument("--perft", dest="run_perft", action="store_true",
-                        help="run performance tests for move generation speed and accuracy")
+    parser.add_argument("--perft", dest="perft_depth", type=int, nargs="?", const=0, default=None, metavar="DEPTH",
+                        help="run performance tests for move generation speed and accuracy, \
+                            given a depth it runs non-interactively and prints JSON results for depths 1 to DEPTH")
+    parser.add_argument("--fen", type=str, default=None,
+                        help="position for --perft (default: initial position)")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="number of processes for --perft (default: cores)")
+    parser.add_argument("--hash", dest="hash_size", type=int, default=0,
+                        help="number of perft hash table entries per process, 0 disables it (default: 0)")
+    parser.add_argument("--ucci", dest="run_ucci", action="store_true",
+                        help="run as headless engine speaking the UCCI protocol on stdin/stdout with the selected agent (ab, az)")
+    parser.add_argument("--bench", dest="run_bench", action="store_true",
+                        help="run the speed benchmark over a fixed position suite and print a node count signature")
+    parser.add_argument("--build-book", dest="build_book", type=str, default=None, choices=["search", "selfplay"],
+                        help="build the opening book from alpha-beta searches of the opening or from the saved self-play games")
+    parser.add_argument("--no-book", dest="no_book", action="store_true",
+                        help="don't play moves from the opening book")
+    parser.add_argument("--build-tablebases", dest="build_tablebases", action="store_true",
+                        help="generate the endgame tablebases of the material configurations in TablebaseConfig")
+    parser.add_argument("--export-lite", dest="export_lite", type=str, default=None, choices=["int8", "float16", "float32"],
+                        help="export the current model to TensorFlow Lite with the given quantization and compare it to the keras model")
+    parser.add_argument("--distill", dest="distill", action="store_true",
+                        help="train the fast network on the current network's outputs and play them against each other")
+    parser.add_argument("--fast", dest="fast_model", action="store_true",
+                        help="let the AlphaZero agent play with the fast network (az)")
     parser.add_argument("--pipeline", dest="run_pipeline", action="store_true",
                         help="run the self-play and training pipeline (to evaluate, see --eval)")
     parser.add_argument("--eval", dest="evaluate", action="store_true",
                         help="add evaluation to the pipeline")
     parser.add_argument("--nui", dest="no_ui", action="store_true",
                         help="no UI")
+    parser.add_argument("--ponder", dest="ponder", action="store_true",
+                        help="let the AI keep searching while it's your turn (ab, az)")
     parser.add_argument("--black",  dest="play_as_black", action="store_true",
                         help="play black")
     parser.add_argument("--second",  dest="move_second", action="store_true",
@@ -39,6 +64,7 @@ def init_parser():
 def get_config():
     parser = init_parser()
     args = parser.parse_args()
+    args.run_perft = args.perft_depth is not None
     return args
 
 config = get_config()
\ No newline at end of file
@@ -0,0 +1,61 @@
+"""
+Compares the depth alpha-beta search reaches within a fixed time on the position suite
+with the selective pruning techniques in SearchConfig switched on and off.
+Run from the repository root: python3 visualizations/selective_search.py [seconds per position]
+"""
+import sys
+import os
+root = os.environ.get("CHEAPCHESS", os.getcwd())
+sys.path.append(root)
+
+import matplotlib as mpl
+import matplotlib.pyplot as plt
+mpl.style.use('bmh')
+
+import logging
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+from core.engine import Board, LegalMoveGenerator
+from core.engine.ai.alphabeta import Dfs, SearchConfig
+from core.utils.position_suite import SEARCH_POSITIONS
+
+techniques = ["null_move_pruning", "late_move_reductions", "futility_pruning"]
+configurations = {
+    "none": [],
+    "null move": ["null_move_pruning"],
+    "lmr": ["late_move_reductions"],
+    "futility": ["futility_pruning"],
+    "all": techniques,
+}
+
+def run_benchmarks(time_limit: float):
+    """
+    :return: hash map of configuration names and lists of (depth reached, nodes searched) per position
+    """
+    results = {}
+    for name, enabled in configurations.items():
+        for technique in techniques:
+            setattr(SearchConfig, technique, technique in enabled)
+        results[name] = []
+        for fen in SEARCH_POSITIONS:
+            board = Board(fen)
+            LegalMoveGenerator.init_board(board)
+            Dfs.search(board, time_limit=time_limit)
+            results[name].append((Dfs.completed_depth, Dfs.nodes))
+        depths, nodes = zip(*results[name])
+        print(f"{name:>10} || depths: {depths} || mean depth: {sum(depths) / len(depths):.2f} || nodes: {sum(nodes)}")
+    return results
+
+def visualize(results: dict):
+    names = list(results)
+    mean_depths = [sum(d for d, _ in results[name]) / len(results[name]) for name in names]
+    plt.figure(figsize=(8, 6))
+    plt.bar(names, mean_depths, color="#2CBDFE")
+    plt.xlabel("Selective pruning")
+    plt.ylabel("Mean depth reached")
+    plt.show()
+
+if __name__ == "__main__":
+    time_limit = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    visualize(run_benchmarks(time_limit))
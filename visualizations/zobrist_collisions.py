@@ -0,0 +1,32 @@
+"""
+Counts zobrist key collisions among the positions of random games and compares them to the number expected
+for uniformly distributed 64-bit keys. Run from the repository root: python3 -m visualizations.zobrist_collisions
+"""
+import random
+from core.engine import Board, MoveGenerator, ZobristHashing
+from core.utils import BoardUtility
+
+def collect_positions(num_games: int=2000, max_plies: int=150, seed: int=0) -> dict:
+    """
+    :return: hash map of every zobrist key found and the set of distinct positions that had it
+    """
+    random.seed(seed)
+    positions = {}
+    for _ in range(num_games):
+        board = Board(BoardUtility.get_inital_fen(True, True))
+        move_generator = MoveGenerator(board)
+        for _ in range(max_plies):
+            positions.setdefault(board.zobrist_key, set()).add((tuple(board.squares), board.moving_color))
+            moves = move_generator.load_moves(board)
+            if not moves:
+                break
+            board.make_move(random.choice(moves), search_state=True)
+    return positions
+
+if __name__ == "__main__":
+    positions = collect_positions()
+    num_positions = sum(len(boards) for boards in positions.values())
+    collisions = num_positions - len(positions)
+    # Birthday bound: n * (n - 1) / 2 pairs, each colliding with probability 2^-64
+    expected = num_positions * (num_positions - 1) / 2 / 2 ** ZobristHashing.num_bits
+    print(f"positions: {num_positions} || keys: {len(positions)} || collisions: {collisions} || expected: {expected:.2e}")